@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from accounts import signups
+
+
+class Command(BaseCommand):
+    help = ('Deletes inactive users whose activation key has expired, and their profiles, '
+            'in small batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Maximum number of users deleted per transaction.')
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        def log(count, total):
+            if options['verbosity'] > 0:
+                self.stdout.write('Deleted {} users, {} so far.'.format(count, total))
+
+        deleted = signups.purge(batch_size=options['batch_size'],
+                                pause=options['pause'], log=log)
+        self.stdout.write('Purged {} expired sign-ups.'.format(deleted))
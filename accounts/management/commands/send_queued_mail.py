@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import outbox
+from gameStore import metrics
+
+
+class Command(BaseCommand):
+    help = 'Sends the queued emails of the outbox in batches, retrying failed ones with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Maximum number of emails sent over one connection.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the outbox instead of exiting once it is empty.')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to wait between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent = outbox.drain(batch_size=options['batch_size'])
+            if options['verbosity'] > 1 or not options['loop']:
+                self.stdout.write('Sent {} emails, {} queued. {}'.format(
+                    sent, outbox.depth(), outbox.stats.snapshot()))
+            if not options['loop']:
+                return
+            # The worker serves no requests, which would write its metrics
+            metrics.registry.flush()
+            time.sleep(options['interval'])
@@ -1,3 +1,36 @@
 from django.db import models
 
-# Create your models here.
+
+class OutboxMessage(models.Model):
+    """
+    An email waiting to be sent by the send_queued_mail command, see
+    accounts.outbox.
+    """
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    # Comma separated addresses
+    recipients = models.TextField()
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    # Set by the worker that is currently sending the message
+    lease = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        index_together = [['status', 'next_attempt_at']]
+
+    def __str__(self):
+        return "{} - {}".format(self.recipients, self.subject)
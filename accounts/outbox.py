@@ -0,0 +1,178 @@
+"""
+Persisted outbox for outgoing email.
+
+Views enqueue messages instead of talking to the mail server, and the
+send_queued_mail command drains the queue in batches, sending every batch
+over one connection of the configured EMAIL_BACKEND. Failed messages are
+retried after MAIL_OUTBOX_RETRY_DELAY seconds, doubled on every attempt,
+until MAIL_OUTBOX_MAX_ATTEMPTS attempts have failed.
+
+Workers claim a batch by writing their own lease token on it, so several
+workers can drain the same queue. A lease runs out after
+MAIL_OUTBOX_LEASE seconds, after which a crashed worker's batch is picked
+up again. Every message is marked sent as soon as it is, and only while
+the worker still holds its lease, and a worker stops sending a batch once
+its lease has run out, so other workers do not send the same message
+again.
+
+The send statistics are exported by gameStore.metrics.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from gameStore import metrics
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxStats(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.send_seconds = 0.0
+        self.queued_seconds = 0.0
+
+    def record_sent(self, send_seconds, queued_seconds):
+        with self._lock:
+            self.sent += 1
+            self.send_seconds += send_seconds
+            self.queued_seconds += queued_seconds
+
+    def record_failed(self):
+        with self._lock:
+            self.failed += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'sent': self.sent,
+                'failed': self.failed,
+                'send_seconds': self.send_seconds,
+                'average_send_seconds': self.send_seconds / self.sent if self.sent else None,
+                'average_queued_seconds': self.queued_seconds / self.sent if self.sent else None,
+            }
+
+
+stats = OutboxStats()
+metrics.register('mail_outbox', stats.snapshot, 'Mail sent by the worker')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(subject, body, from_email, recipients):
+    """
+    Queue an email to be sent by the next drain.
+    """
+    return OutboxMessage.objects.create(subject=subject, body=body, from_email=from_email,
+                                        recipients=','.join(recipients),
+                                        next_attempt_at=timezone.now())
+
+
+def depth():
+    """
+    Number of messages waiting to be sent.
+    """
+    return OutboxMessage.objects.filter(status=OutboxMessage.QUEUED).count()
+
+
+def _claim(batch_size):
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = list(OutboxMessage.objects.filter(status=OutboxMessage.QUEUED, next_attempt_at__lte=now)
+               .order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size])
+    lease_until = now + timedelta(seconds=_setting('MAIL_OUTBOX_LEASE', 300))
+    # Rows another worker claimed in the meantime no longer match
+    OutboxMessage.objects.filter(pk__in=due, status=OutboxMessage.QUEUED,
+                                 next_attempt_at__lte=now).update(lease=token,
+                                                                  next_attempt_at=lease_until)
+    return list(OutboxMessage.objects.filter(lease=token, status=OutboxMessage.QUEUED)
+                .order_by('pk'))
+
+
+def _leased(message):
+    # The message as long as the worker still holds its lease
+    return OutboxMessage.objects.filter(pk=message.pk, lease=message.lease,
+                                        status=OutboxMessage.QUEUED)
+
+
+def _failed(message, error):
+    attempts = message.attempts + 1
+    status = message.status
+    if attempts >= _setting('MAIL_OUTBOX_MAX_ATTEMPTS', 5):
+        status = OutboxMessage.FAILED
+        next_attempt_at = message.next_attempt_at
+        stats.record_failed()
+        logger.error('Giving up on mail %d after %d attempts: %s', message.pk, attempts, error)
+    else:
+        delay = _setting('MAIL_OUTBOX_RETRY_DELAY', 60) * 2 ** (attempts - 1)
+        next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        logger.warning('Sending mail %d failed, retrying in %ds: %s', message.pk, delay, error)
+    _leased(message).update(attempts=attempts, last_error=str(error), lease='', status=status,
+                            next_attempt_at=next_attempt_at)
+
+
+def _sent(message):
+    if not _leased(message).update(status=OutboxMessage.SENT, lease='', sent_at=timezone.now()):
+        logger.warning('Sent mail %d after its lease ran out', message.pk)
+
+
+def _send(messages):
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as error:
+        for message in messages:
+            _failed(message, error)
+        return 0
+
+    sent = 0
+    try:
+        for index, message in enumerate(messages):
+            # The lease ends at next_attempt_at, other workers may have
+            # claimed the rest of the batch since
+            if timezone.now() >= message.next_attempt_at:
+                logger.warning('Lease of %d mails ran out before they were sent',
+                               len(messages) - index)
+                break
+            started = time.time()
+            try:
+                EmailMessage(message.subject, message.body, message.from_email,
+                             message.recipients.split(','), connection=connection).send()
+            except Exception as error:
+                _failed(message, error)
+                continue
+            now = timezone.now()
+            stats.record_sent(time.time() - started, (now - message.created_at).total_seconds())
+            _sent(message)
+            sent += 1
+    finally:
+        connection.close()
+
+    logger.info('Sent %d of %d mails, %d queued', sent, len(messages), depth())
+    return sent
+
+
+def drain(batch_size=100):
+    """
+    Send the due messages in batches of batch_size, each batch over a
+    single connection. Returns the number of messages sent.
+    """
+    total = 0
+    messages = _claim(batch_size)
+    while messages:
+        total += _send(messages)
+        messages = _claim(batch_size)
+    return total
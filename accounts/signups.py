@@ -0,0 +1,52 @@
+"""
+Cleanup of sign-ups that were never activated.
+
+Users whose activation key expired without them activating their account
+are deleted together with their profiles. Deletes run in short
+transactions of a bounded number of users, so auth_user is never locked
+for long.
+"""
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from gameStore.models import UserProfile
+
+
+def expired(batch_size):
+    """
+    Ids of up to batch_size never activated users whose activation key
+    expired more than SIGNUP_PURGE_GRACE_DAYS ago. Users who activated and
+    were deactivated later are kept: their key was cleared on activation,
+    or they have logged in.
+    """
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'SIGNUP_PURGE_GRACE_DAYS', 0))
+    return list(UserProfile.objects.filter(key_expires__lt=cutoff, user__is_active=False,
+                                           user__last_login__isnull=True)
+                .exclude(activation_key='')
+                .order_by('key_expires').values_list('user_id', flat=True)[:batch_size])
+
+
+def purge(batch_size=500, pause=0.0, log=None):
+    """
+    Delete expired sign-ups in batches of at most batch_size users, with an
+    optional pause in between. Returns the number of deleted users.
+    """
+    deleted = 0
+    ids = expired(batch_size)
+    while ids:
+        with transaction.atomic():
+            # Deleting the users cascades to their profiles
+            count = (User.objects.filter(pk__in=ids, is_active=False, last_login__isnull=True)
+                     .delete()[1].get('auth.User', 0))
+        deleted += count
+        if log:
+            log(count, deleted)
+        if pause:
+            time.sleep(pause)
+        ids = expired(batch_size) if len(ids) == batch_size else []
+    return deleted
@@ -1,3 +1,193 @@
-from django.test import TestCase
+from django.test import TestCase, Client, override_settings
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.utils import timezone
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from accounts.models import OutboxMessage
+from gameStore.models import UserProfile
+from accounts import outbox
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+
+class FlakyBackend(EmailBackend):
+    """
+    Locmem backend that fails the sends while failures is positive.
+    """
+    failures = 0
+    connections = 0
+
+    def open(self):
+        FlakyBackend.connections += 1
+        return super(FlakyBackend, self).open()
+
+    def send_messages(self, messages):
+        if FlakyBackend.failures:
+            FlakyBackend.failures -= 1
+            raise IOError('Mail server unavailable')
+        return super(FlakyBackend, self).send_messages(messages)
+
+
+class Crash(BaseException):
+    pass
+
+
+class CrashingBackend(EmailBackend):
+    """
+    Locmem backend that calls the hook before sending every message, to
+    crash the worker or change the outbox under it.
+    """
+    hook = None
+
+    def send_messages(self, messages):
+        CrashingBackend.hook(len(mail.outbox))
+        return super(CrashingBackend, self).send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='accounts.tests.FlakyBackend', MAIL_OUTBOX_RETRY_DELAY=10)
+class OutboxTestCase(TestCase):
+
+    def setUp(self):
+        FlakyBackend.failures = 0
+        FlakyBackend.connections = 0
+
+    def test_registration_queues_mail(self):
+        """
+        Registering should queue the activation email instead of sending it.
+        """
+        response = Client().post('/accounts/register/', {'username': 'player',
+            'password1': 'secret-password', 'password2': 'secret-password',
+            'email': 'player@example.com'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(outbox.depth(), 1)
+
+        self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(mail.outbox[0].to, ['player@example.com'])
+        self.assertEqual(outbox.depth(), 0)
+
+    def test_batches_share_a_connection(self):
+        """
+        Every batch should be sent over a single connection.
+        """
+        for i in range(5):
+            outbox.enqueue('Subject', 'Body {}'.format(i), 'from@example.com', ['to@example.com'])
+
+        self.assertEqual(outbox.drain(batch_size=2), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(FlakyBackend.connections, 3)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.SENT).count(), 5)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.CrashingBackend')
+    def test_sent_mail_is_not_sent_again(self):
+        """
+        A message should be marked sent right after it is, so a worker
+        crashing later in the batch does not get it sent twice.
+        """
+        for i in range(2):
+            outbox.enqueue('Subject', 'Body {}'.format(i), 'from@example.com', ['to@example.com'])
+
+        def crash_on_second(sent):
+            if sent == 1:
+                raise Crash()
+        CrashingBackend.hook = crash_on_second
+        with self.assertRaises(Crash):
+            outbox.drain()
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.SENT).count(), 1)
+
+        # The crashed worker's lease runs out
+        OutboxMessage.objects.filter(status=OutboxMessage.QUEUED).update(
+            next_attempt_at=timezone.now())
+        CrashingBackend.hook = lambda sent: None
+        self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.CrashingBackend')
+    def test_lost_lease_is_not_marked_sent(self):
+        """
+        A message claimed by another worker after the lease ran out should
+        be left to that worker.
+        """
+        message = outbox.enqueue('Subject', 'Body', 'from@example.com', ['to@example.com'])
+        CrashingBackend.hook = lambda sent: OutboxMessage.objects.update(lease='other-worker')
+        outbox.drain()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.lease), (OutboxMessage.QUEUED, 'other-worker'))
+
+    @override_settings(MAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_retries_with_backoff(self):
+        """
+        Failed emails should be retried later and given up after the last
+        attempt.
+        """
+        message = outbox.enqueue('Subject', 'Body', 'from@example.com', ['to@example.com'])
+        FlakyBackend.failures = 1
+        started = timezone.now()
+        self.assertEqual(outbox.drain(), 0)
+
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.QUEUED, 1))
+        self.assertGreaterEqual(message.next_attempt_at, started + timedelta(seconds=10))
+        self.assertEqual(outbox.drain(), 0)
+
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        FlakyBackend.failures = 1
+        self.assertEqual(outbox.drain(), 0)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.FAILED, 2))
+        self.assertIn('unavailable', message.last_error)
+
+
+class SignupPurgeTestCase(TestCase):
+
+    def sign_up(self, username, expires_in, active=False):
+        user = User.objects.create_user(username, is_active=active)
+        UserProfile.objects.create(user=user, activation_key=username,
+                                   key_expires=timezone.now() + expires_in)
+        return user
+
+    def test_purge_expired_signups(self):
+        """
+        Only inactive users with expired activation keys should be deleted.
+        """
+        for i in range(5):
+            self.sign_up('expired{}'.format(i), timedelta(days=-1))
+        self.sign_up('pending', timedelta(days=1))
+        self.sign_up('activated', timedelta(days=-1), active=True)
+        # Activated and later deactivated, by key or after logging in
+        deactivated = self.sign_up('deactivated', timedelta(days=-1))
+        UserProfile.objects.filter(user=deactivated).update(activation_key='')
+        self.sign_up('returning', timedelta(days=-1))
+        User.objects.filter(username='returning').update(last_login=timezone.now())
+
+        output = StringIO()
+        call_command('purge_expired_signups', batch_size=2, pause=0, stdout=output)
+        self.assertIn('Purged 5 expired sign-ups.', output.getvalue())
+        self.assertEqual(output.getvalue().count('Deleted'), 3)
+        self.assertEqual(sorted(User.objects.values_list('username', flat=True)),
+                         ['activated', 'deactivated', 'pending', 'returning'])
+        self.assertEqual(UserProfile.objects.count(), 4)
+
+    def test_deactivated_users_are_kept(self):
+        """
+        A user who activated their account and was deactivated later should
+        not be purged once the key expires.
+        """
+        user = self.sign_up('player', timedelta(days=1))
+        self.assertEqual(Client().get('/accounts/confirm/player/').status_code, 200)
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        UserProfile.objects.filter(user=user).update(key_expires=timezone.now() - timedelta(days=1))
+        call_command('purge_expired_signups', pause=0, stdout=StringIO())
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
+
+    def test_confirm_by_activation_key(self):
+        """
+        Confirming with a valid key should activate the account.
+        """
+        user = self.sign_up('player', timedelta(days=1))
+        response = Client().get('/accounts/confirm/player/')
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.is_active)
+        self.assertEqual(UserProfile.objects.get(user=user).activation_key, '')
@@ -6,7 +6,7 @@ from django.contrib import auth
 from django.template.context_processors import csrf
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import Group
-from django.core.mail import send_mail
+from . import outbox
 import hashlib, random, datetime
 from django.contrib.auth.models import User
 from gameStore.models import UserProfile
@@ -37,7 +37,7 @@ def register(request):
             salt = hashlib.sha1(random_string).hexdigest()[:5]
             salted = (salt + email).encode('utf8')
             activation_key = hashlib.sha1(salted).hexdigest()
-            key_expires = datetime.datetime.today() + datetime.timedelta(2)
+            key_expires = timezone.now() + datetime.timedelta(2)
 
             #Get user by username
             user=User.objects.get(username=username)
@@ -48,16 +48,15 @@ def register(request):
                                       key_expires=key_expires)
             new_profile.save()
 
-            # Send email with activation key
+            # Queue email with activation key for send_queued_mail
             email_subject = 'Account confirmation'
             email_body = "Hey %s, thanks for signing up. To activate your account, click this link within \
             48hours http://127.0.0.1:8000/accounts/confirm/%s" % (username, activation_key)
 
-            send_mail(email_subject,
-                      email_body,
-                      'myemail@example.com',
-                      [email],
-                      fail_silently=False)
+            outbox.enqueue(email_subject,
+                           email_body,
+                           'myemail@example.com',
+                           [email])
 
             return HttpResponseRedirect('../../')
         # Invalid form? - mistakes? Print problems
@@ -85,6 +84,10 @@ def register_confirm(request, activation_key):
     user = user_profile.user
     user.is_active = True
     user.save()
+    # A used key marks the account as activated, so it is never purged as
+    # an expired sign-up
+    user_profile.activation_key = ''
+    user_profile.save(update_fields=['activation_key'])
     return render_to_response('confirm.html')
 
 def user_login(request):
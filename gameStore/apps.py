@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class GameStoreConfig(AppConfig):
+    name = 'gameStore'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,330 @@
+"""
+ASGI config for gameStore project, next to gameStore.wsgi.
+
+The gameplay endpoints (new_score, save_game and load_game) are served by
+async handlers. Request bodies are read and responses written on the event
+loop, and only the session, user and database work runs in a bounded pool
+of ASGI_THREADS threads, so slow clients never hold a thread. Live
+leaderboard streams wait for events on the event loop as well.
+
+Every other request is handed to the WSGI application, static file layer
+included, in a separate pool of ASGI_WSGI_THREADS threads, so the rest of
+the site works unchanged.
+
+Serve with any ASGI 3 server, e.g. ``uvicorn gameStore.asgi:application``.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+import logging
+import os
+import sys
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gameStore.settings")
+
+from gameStore.wsgi import application as wsgi_application
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.views import redirect_to_login
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core import signals
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.urlresolvers import Resolver404, resolve
+from django.http import Http404, HttpResponse
+from django.middleware.csrf import CsrfViewMiddleware
+
+from gameStore import ingest, live, metrics, replicas, state_storage, views
+from gameStore.models import Game
+
+logger = logging.getLogger(__name__)
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def max_body_size():
+    # Form encoding escapes a state to at most three times its size
+    return 3 * state_storage.max_size() + 64 * 1024
+
+
+async def read_body(receive, limit=None):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ClientDisconnected()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit is not None and size > limit:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+def build_environ(scope, body):
+    """
+    WSGI environ of an ASGI HTTP request with an already read body.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI passes the raw path bytes as latin-1
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+def authenticate(request, view):
+    """
+    The session, user and CSRF handling of the middleware, and the checks of
+    the gameplay views. Returns a response if the request is rejected.
+    """
+    SessionMiddleware().process_request(request)
+    AuthenticationMiddleware().process_request(request)
+    response = CsrfViewMiddleware().process_view(request, view, (), {})
+    if response is not None:
+        return response
+    if not request.user.is_authenticated():
+        return redirect_to_login(request.get_full_path())
+    if not request.is_ajax():
+        return HttpResponse(status=400)
+
+
+# The views and their work once authenticated
+GAMEPLAY = {
+    views.new_score: views.record_new_score,
+    views.save_game: views.store_save,
+    views.load_game: views.load_save,
+}
+
+
+class ASGIApplication(object):
+
+    def __init__(self, wsgi=None, executor=None, wsgi_executor=None):
+        self.wsgi = wsgi or wsgi_application
+        self.executor = executor or ThreadPoolExecutor(getattr(settings, 'ASGI_THREADS', 8))
+        self.wsgi_executor = wsgi_executor or ThreadPoolExecutor(
+            getattr(settings, 'ASGI_WSGI_THREADS', 8))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            try:
+                match = resolve(scope['path'])
+            except Resolver404:
+                match = None
+            if match is not None and match.func in GAMEPLAY:
+                await self.gameplay(GAMEPLAY[match.func], match, scope, receive, send)
+            elif match is not None and match.func is views.leaderboard_stream:
+                await self.leaderboard_stream(int(match.kwargs['game_id']), receive, send)
+            else:
+                await self.bridge(scope, receive, send)
+        else:
+            raise ValueError('Unsupported scope type {}'.format(scope['type']))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.run(ingest.queue.flush)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _job(self, function, *args):
+        # Lets Django reset query logs and close old connections of the
+        # thread, as it does around every WSGI request
+        signals.request_started.send(sender=self.__class__)
+        try:
+            return function(*args)
+        finally:
+            signals.request_finished.send(sender=self.__class__)
+
+    async def run(self, function, *args):
+        """
+        Run a function in the gameplay thread pool.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, partial(self._job, function, *args))
+
+    async def gameplay(self, handler, match, scope, receive, send):
+        try:
+            body = await read_body(receive, max_body_size())
+        except BodyTooLarge:
+            await send_response(send, HttpResponse(status=413))
+            return
+        except ClientDisconnected:
+            return
+
+        request = WSGIRequest(build_environ(scope, body))
+
+        def work():
+            measurement = metrics.Measurement()
+            replicas.start()
+            try:
+                return replicas.pin(authenticate(request, match.func) or handler(request))
+            except Http404:
+                return HttpResponse(status=404)
+            except (TypeError, ValueError):
+                return HttpResponse(status=400)
+            except Exception:
+                logger.exception('Gameplay request to %s failed', scope['path'])
+                return HttpResponse(status=500)
+            finally:
+                measurement.finish(match.view_name)
+
+        await send_response(send, await self.run(work), self.executor)
+
+    async def leaderboard_stream(self, game_id, receive, send):
+        """
+        Async version of views.leaderboard_stream, which holds no thread
+        while waiting for events.
+        """
+        if not await self.run(Game.objects.filter(pk=game_id).exists):
+            await send_response(send, HttpResponse(status=404))
+            return
+
+        loop = asyncio.get_event_loop()
+        events = asyncio.Queue()
+
+        def deliver(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        await self.run(live.broadcaster.subscribe, game_id, deliver)
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'Content-Type', b'text/event-stream'),
+                                    (b'Cache-Control', b'no-cache'),
+                                    (b'X-Accel-Buffering', b'no')]})
+            first = 'retry: 2000\n' + live.format_event(await self.run(live.snapshot, game_id))
+            await send({'type': 'http.response.body', 'body': first.encode('utf-8'), 'more_body': True})
+
+            heartbeat = getattr(settings, 'LIVE_HEARTBEAT', 15)
+            deadline = loop.time() + getattr(settings, 'LIVE_STREAM_DURATION', 300)
+            while loop.time() < deadline:
+                event = asyncio.ensure_future(events.get())
+                await asyncio.wait([event, disconnected], return_when=asyncio.FIRST_COMPLETED,
+                                   timeout=min(heartbeat, deadline - loop.time()))
+                if disconnected.done():
+                    event.cancel()
+                    return
+                if event.done():
+                    chunk = live.format_event(event.result())
+                else:
+                    event.cancel()
+                    chunk = ': keepalive\n\n'
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'),
+                            'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            live.broadcaster.unsubscribe(game_id, deliver)
+
+    async def bridge(self, scope, receive, send):
+        """
+        Serve a request with the WSGI application in its thread pool,
+        streaming the response one chunk at a time.
+        """
+        try:
+            body = await read_body(receive, getattr(settings, 'ASGI_MAX_BODY_SIZE', 10 * 1024 * 1024))
+        except BodyTooLarge:
+            await send_response(send, HttpResponse(status=413))
+            return
+        except ClientDisconnected:
+            return
+        environ = build_environ(scope, body)
+        loop = asyncio.get_event_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+
+        def call():
+            result = self.wsgi(environ, start_response)
+            chunks = iter(result)
+            # Applications may only call start_response on the first chunk
+            return result, chunks, next(chunks, None)
+
+        result, chunks, chunk = await loop.run_in_executor(self.wsgi_executor, call)
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'],
+                        'headers': [(name.encode('latin-1'), value.encode('latin-1'))
+                                    for name, value in started['headers']]})
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.wsgi_executor, next, chunks, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.wsgi_executor, result.close)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def send_response(send, response, executor=None):
+    """
+    Send a Django response. The chunks of a streaming response are made in
+    the executor, the loop's default one if not given, as making them may
+    block, e.g. decompressing a save.
+    """
+    headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in response.items()]
+    for cookie in response.cookies.values():
+        headers.append((b'Set-Cookie', cookie.output(header='').strip().encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    if response.streaming:
+        loop = asyncio.get_event_loop()
+        chunks = iter(response)
+        while True:
+            chunk = await loop.run_in_executor(executor, next, chunks, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    else:
+        await send({'type': 'http.response.body', 'body': response.content})
+
+
+live.served_by_asgi = True
+
+application = ASGIApplication()
@@ -0,0 +1,229 @@
+"""
+Fingerprinted, precompressed bundles of the site's CSS and JavaScript.
+
+The build_assets command concatenates the sources of every bundle,
+minifying our own files, and writes the result into STATIC_ROOT under a
+name containing a hash of its content, e.g. gameStore/css/site.1a2b3c4d5e6f.css.
+The names are recorded in a manifest read by the asset template tags.
+Every compressible file in STATIC_ROOT also gets gzip and, when the brotli
+package is installed, brotli variants.
+
+AssetWhiteNoise serves STATIC_ROOT as the only static file layer, picking
+the best precompressed variant the client accepts. Fingerprinted files never
+change under the same name and are served with far-future immutable cache
+headers. Without a manifest the tags link to the individual source files.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.templatetags.staticfiles import static
+from whitenoise.base import MissingFileError, stat_regular_file
+from whitenoise.django import DjangoWhiteNoise
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_NAME = 'assets.json'
+
+# Sources of every bundle, with whether they are ours to minify. Bundles
+# live next to their sources so relative url()s keep working.
+BUNDLES = OrderedDict([
+    ('gameStore/css/site.css', [
+        ('gameStore/css/bootstrap.min.css', False),
+        ('gameStore/css/layout.css', True),
+    ]),
+    ('gameStore/js/site.js', [
+        ('gameStore/js/jquery.js', False),
+        ('gameStore/js/bootstrap.min.js', False),
+        ('gameStore/js/scripts.js', True),
+    ]),
+])
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.html', '.txt',
+                           '.xml', '.map', '.eot', '.otf', '.ttf')
+
+CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.DOTALL)
+CSS_SPACE = re.compile(r'\s+')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+JS_BLOCK_COMMENT = re.compile(r'^\s*/\*(?!!).*?\*/\s*$', re.DOTALL | re.MULTILINE)
+JS_LINE_COMMENT = re.compile(r'^\s*//.*$', re.MULTILINE)
+
+
+def minify_css(text):
+    text = CSS_COMMENT.sub('', text)
+    text = CSS_SPACE.sub(' ', text)
+    text = CSS_PUNCTUATION.sub(r'\1', text)
+    text = text.replace(': ', ':').replace(';}', '}')
+    return text.strip()
+
+
+def minify_js(text):
+    """
+    Conservative minification keeping every statement on its own line, so
+    semicolon insertion works the same as in the source.
+    """
+    text = JS_BLOCK_COMMENT.sub('', text)
+    text = JS_LINE_COMMENT.sub('', text)
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def _read_source(name):
+    path = finders.find(name)
+    if path is None:
+        raise ValueError('Asset source {} not found'.format(name))
+    with open(path, encoding='utf-8') as source:
+        return source.read()
+
+
+def bundle(name):
+    """
+    The concatenated, partly minified content of a bundle.
+    """
+    minify = minify_css if name.endswith('.css') else minify_js
+    parts = []
+    for source, ours in BUNDLES[name]:
+        text = _read_source(source)
+        parts.append(minify(text) if ours else text.strip())
+    # A newline and semicolon keep concatenated scripts apart
+    separator = '\n' if name.endswith('.css') else '\n;\n'
+    return separator.join(part for part in parts if part) + '\n'
+
+
+def hashed_name(name, content):
+    digest = hashlib.md5(content).hexdigest()[:12]
+    root, ext = os.path.splitext(name)
+    return '{}.{}{}'.format(root, digest, ext)
+
+
+def compress(path):
+    """
+    Write gzip and brotli variants of a file next to it, unless they would
+    not be smaller. Returns the number of variants written.
+    """
+    with open(path, 'rb') as source:
+        content = source.read()
+    variants = [('.gz', gzip.compress(content, 9))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content)))
+
+    written = 0
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as variant:
+                variant.write(compressed)
+            written += 1
+    return written
+
+
+def compress_tree(root):
+    written = 0
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                written += compress(os.path.join(directory, filename))
+    return written
+
+
+def build(static_root=None, log=None):
+    """
+    Write the fingerprinted bundles and the manifest into STATIC_ROOT and
+    precompress its files. Returns the manifest.
+    """
+    static_root = static_root or settings.STATIC_ROOT
+    bundles = OrderedDict()
+    for name in BUNDLES:
+        content = bundle(name).encode('utf-8')
+        bundles[name] = hashed_name(name, content)
+        path = os.path.join(static_root, bundles[name])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as output:
+            output.write(content)
+        if log:
+            log('Wrote {} ({} bytes)'.format(bundles[name], len(content)))
+
+    with open(os.path.join(static_root, MANIFEST_NAME), 'w') as output:
+        json.dump({'bundles': bundles}, output, indent=2)
+    variants = compress_tree(static_root)
+    if log:
+        log('Wrote {} compressed variants{}'.format(
+            variants, '' if brotli else ', brotli is not installed'))
+    _manifest.clear()
+    return bundles
+
+
+_manifest = {}
+
+
+def manifest():
+    """
+    The bundles of the last build, as a dict mapping bundle names to
+    fingerprinted names. Reloaded whenever the manifest file changes.
+    """
+    path = os.path.join(settings.STATIC_ROOT or '', MANIFEST_NAME)
+    try:
+        modified = os.stat(path).st_mtime
+    except OSError:
+        return {}
+    if _manifest.get('modified') != modified:
+        with open(path) as source:
+            _manifest.update(bundles=json.load(source)['bundles'], modified=modified)
+    return _manifest['bundles']
+
+
+def urls(name):
+    """
+    URLs to include for a bundle: the fingerprinted bundle if it was built,
+    its sources otherwise.
+    """
+    built = manifest().get(name)
+    if built:
+        return [static(built)]
+    return [static(source) for source, _ in BUNDLES[name]]
+
+
+class AssetWhiteNoise(DjangoWhiteNoise):
+    """
+    DjangoWhiteNoise serving brotli variants and marking fingerprinted
+    bundles immutable.
+    """
+    BROTLI_SUFFIX = '.br'
+    ACCEPT_BROTLI_RE = re.compile(r'\bbr\b')
+
+    def is_immutable_file(self, path, url):
+        name = url[len(self.static_prefix):] if url.startswith(self.static_prefix) else None
+        if name and name in manifest().values():
+            return True
+        return super(AssetWhiteNoise, self).is_immutable_file(path, url)
+
+    def add_cache_headers(self, headers, path, url):
+        super(AssetWhiteNoise, self).add_cache_headers(headers, path, url)
+        if self.is_immutable_file(path, url):
+            headers['Cache-Control'] = 'public, max-age={}, immutable'.format(self.FOREVER)
+
+    def get_static_file(self, path, url):
+        static_file = super(AssetWhiteNoise, self).get_static_file(path, url)
+        static_file.brotli_path = path + self.BROTLI_SUFFIX
+        try:
+            size = stat_regular_file(static_file.brotli_path).st_size
+        except MissingFileError:
+            static_file.brotli_path = None
+        else:
+            static_file.headers['Vary'] = 'Accept-Encoding'
+            static_file.brotli_headers = type(static_file.headers)(static_file.headers.items())
+            static_file.brotli_headers['Content-Encoding'] = 'br'
+            static_file.brotli_headers['Content-Length'] = str(size)
+        return static_file
+
+    def get_path_and_headers(self, static_file, environ):
+        if static_file.brotli_path and self.ACCEPT_BROTLI_RE.search(
+                environ.get('HTTP_ACCEPT_ENCODING', '')):
+            return static_file.brotli_path, static_file.brotli_headers
+        return super(AssetWhiteNoise, self).get_path_and_headers(static_file, environ)
@@ -0,0 +1,275 @@
+"""
+Latency and query benchmarks of every route, run by the benchmark_routes
+command against seeded data (see gameStore.seed).
+
+ROUTES describes how to request each named URL pattern of gameStore.urls
+and accounts.urls: the method, the logged in user, the arguments and the
+expected status. Routes that cannot be requested repeatedly are listed in
+SKIPPED with the reason. A route in neither fails the benchmark, so new
+routes do not go unmeasured.
+
+Requests go through the test client and the full middleware stack, inside
+a transaction rolled back at the end, so routes that write leave no trace.
+Results are compared with the budgets in BUDGETS_PATH, which are checked
+into the repository and re-recorded with benchmark_routes --record when a
+change is meant to make a route slower. The budgets were recorded against
+seed_data --seed 1 at scale 1. Query counts are exact, latencies get
+LATENCY_HEADROOM to absorb noise between runs and machines, and budgets
+are never under MIN_LATENCY_BUDGET, as a single stall of a fast route
+would otherwise be enough to fail it.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.urlresolvers import RegexURLPattern, RegexURLResolver, get_resolver, reverse
+from django.db import connection, reset_queries, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import GameCategory, Save
+from .seed import SEED_PREFIX
+
+BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_budgets.json')
+
+LATENCY_HEADROOM = 4.0
+MIN_LATENCY_BUDGET = 100.0
+
+# Unmeasured requests of a route before the measured ones, filling caches
+WARMUP_REQUESTS = 5
+# Measured requests of a route, enough for the p95 not to be the slowest one
+DEFAULT_REQUESTS = 100
+
+METRICS_TOKEN = 'benchmark'
+
+# Included URL configurations of our own apps, others belong to third parties
+NAMESPACES = ('accounts',)
+
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+def _game(fixtures):
+    return {'game_id': fixtures.game.pk}
+
+
+ROUTES = OrderedDict([
+    ('index', {}),
+    ('browse_games', {}),
+    ('my_games', {'user': 'player'}),
+    ('create_game', {'user': 'developer'}),
+    ('save_game', {'user': 'player', 'method': 'post', 'headers': AJAX,
+                   'data': lambda f: {'game': f.game.name, 'state': '{"level": 3}'}}),
+    ('load_game', {'user': 'player', 'headers': AJAX, 'data': lambda f: {'game': f.game.name}}),
+    ('game_events', {'user': 'player', 'method': 'post', 'headers': AJAX,
+                     'content_type': 'application/json',
+                     'data': lambda f: json.dumps({'game': f.game.name, 'events': [
+                         {'type': 'SCORE', 'score': 10}, {'type': 'SAVE', 'state': '{}'}]})}),
+    ('game', {'user': 'player', 'kwargs': _game}),
+    ('edit_game', {'user': 'developer', 'kwargs': _game}),
+    ('delete_game', {'user': 'developer', 'kwargs': _game}),
+    ('payment_form', {'user': 'player', 'kwargs': _game}),
+    ('payment_redirect', {'user': 'buyer', 'kwargs': _game}),
+    ('browse_game_category', {'kwargs': lambda f: {'category': f.category.name}}),
+    ('game_list', {}),
+    ('search_api', {'data': lambda f: {'q': f.game.name.split()[0]}}),
+    ('search_games', {'data': lambda f: {'q': f.game.name.split()[0]}}),
+    ('high_scores', {}),
+    ('high_scores_for_game', {'kwargs': _game}),
+    ('rank_for_game', {'user': 'player', 'kwargs': _game}),
+    ('leaderboard_stream', {'kwargs': _game}),
+    ('new_score', {'user': 'player', 'method': 'post', 'headers': AJAX,
+                   'data': lambda f: {'game': f.game.name, 'score': 10}}),
+    ('developer_dashboard', {'user': 'developer'}),
+    ('export_transactions', {'user': 'developer', 'kwargs': lambda f: {'export_format': 'csv'}}),
+    ('metrics', {'headers': {'HTTP_AUTHORIZATION': 'Bearer {}'.format(METRICS_TOKEN)}}),
+    ('payment_result', {'data': lambda f: {'result': 'success', 'pid': 0, 'ref': 0,
+                                           'checksum': 'invalid'}}),
+    ('cart', {'user': 'player'}),
+    ('add_to_cart', {'user': 'buyer', 'method': 'post', 'kwargs': _game, 'status': 302}),
+    ('remove_from_cart', {'user': 'buyer', 'method': 'post', 'kwargs': _game, 'status': 302}),
+    ('cart_checkout', {'user': 'player', 'method': 'post', 'status': 302}),
+    ('accounts:register', {}),
+    ('accounts:user_login', {}),
+    ('accounts:user_logout', {'user': 'player', 'relogin': True}),
+])
+
+SKIPPED = {
+    'accounts:register_confirm': 'activates a sign-up once, seeded users have none',
+}
+
+
+class Fixtures(object):
+    """
+    Seeded rows the routes are requested with: a developer and one of
+    their games, a player owning and having saved that game, and a player
+    who does not own it.
+    """
+
+    def __init__(self):
+        saves = Save.objects.filter(user__username__startswith=SEED_PREFIX + 'player-')
+        save = saves.select_related('game', 'user').order_by('pk').first()
+        if save is None:
+            raise ValueError('No seeded data, run the seed_data command first.')
+        self.game = save.game
+        self.category = self.game.categories.order_by('pk').first() or GameCategory.objects.first()
+        self.users = {
+            'player': save.user,
+            'developer': self.game.developer,
+            'buyer': (User.objects.filter(username__startswith=SEED_PREFIX + 'player-')
+                      .exclude(owned_games=self.game).order_by('pk').first()),
+        }
+        if self.users['buyer'] is None:
+            raise ValueError('Every seeded player owns {}, seed more players.'.format(self.game))
+
+
+def route_names(patterns=None, namespace=None):
+    """
+    Names of the URL patterns of the site, namespaced ones included.
+    Included third party URL configurations are left out.
+    """
+    names = []
+    for pattern in patterns if patterns is not None else get_resolver().url_patterns:
+        if isinstance(pattern, RegexURLResolver):
+            if pattern.namespace in NAMESPACES:
+                names.extend(route_names(pattern.url_patterns, pattern.namespace))
+        elif isinstance(pattern, RegexURLPattern) and pattern.name:
+            names.append('{}:{}'.format(namespace, pattern.name) if namespace else pattern.name)
+    return names
+
+
+def uncovered():
+    return [name for name in route_names() if name not in ROUTES and name not in SKIPPED]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _request(client, method, path, spec, fixtures):
+    data = spec['data'](fixtures) if 'data' in spec else {}
+    kwargs = dict(spec.get('headers', {}))
+    if 'content_type' in spec:
+        kwargs['content_type'] = spec['content_type']
+    return getattr(client, method)(path, data, **kwargs)
+
+
+def measure(name, fixtures, requests, statements=None):
+    """
+    Request a route the given number of times after WARMUP_REQUESTS
+    warm-up requests. The SQL of every request is added to the statements
+    list, if given.
+    Returns a dict of the p50 and p95 latency in milliseconds, the most
+    queries of a request and the number of unexpected statuses.
+    """
+    spec = ROUTES[name]
+    path = reverse(name, kwargs=spec['kwargs'](fixtures) if 'kwargs' in spec else None)
+    method = spec.get('method', 'get')
+    client = Client()
+    user = fixtures.users.get(spec.get('user'))
+    latencies, queries, errors = [], [], 0
+
+    for attempt in range(WARMUP_REQUESTS + requests):
+        if user is not None and (attempt == 0 or spec.get('relogin')):
+            client.force_login(user)
+        # The log keeps the last 9000 queries, counting them fails once full
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.time()
+            response = _request(client, method, path, spec, fixtures)
+            if response.streaming:
+                # Closed by the test client once exhausted
+                for _ in response.streaming_content:
+                    pass
+            elapsed = time.time() - started
+        if statements is not None:
+            statements.extend(query['sql'] for query in captured.captured_queries)
+        if attempt < WARMUP_REQUESTS:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(len(captured))
+        errors += response.status_code != spec.get('status', 200)
+
+    return {'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'queries': max(queries), 'errors': errors}
+
+
+@contextmanager
+def session():
+    """
+    Settings and a transaction to request routes in, rolled back at the
+    end. Yields the Fixtures.
+    """
+    # Live streams are served and end right after the current leaderboard.
+    # Work done every so many seconds is done on every request, or not at
+    # all, so the query counts do not depend on which request is measured.
+    with override_settings(ALLOWED_HOSTS=['testserver'], INGEST_FLUSH_INTERVAL=0,
+                           LIVE_POLL_INTERVAL=0, LIVE_STREAM_DURATION=0,
+                           LIVE_UPDATES=True, LIVE_PRUNE_INTERVAL=None,
+                           GAME_RESOLVER_VERSION_CHECK=0, METRICS_TOKEN=METRICS_TOKEN):
+        with transaction.atomic():
+            yield Fixtures()
+            transaction.set_rollback(True)
+
+
+def run(requests=DEFAULT_REQUESTS, names=None, log=None):
+    """
+    Benchmark the given routes, all by default, against the seeded data.
+    Nothing the routes write is kept.
+    """
+    results = OrderedDict()
+    with session() as fixtures:
+        for name in names or ROUTES:
+            results[name] = measure(name, fixtures, requests)
+            if log:
+                log(name, results[name])
+    return results
+
+
+def load_budgets(path=None):
+    try:
+        with open(path or BUDGETS_PATH) as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return {}
+
+
+def budgets_of(results):
+    return OrderedDict((name, {'p95_ms': round(max(result['p95_ms'] * LATENCY_HEADROOM,
+                                                   MIN_LATENCY_BUDGET), 1),
+                               'queries': result['queries']})
+                       for name, result in results.items())
+
+
+def save_budgets(results, path=None):
+    budgets = load_budgets(path)
+    budgets.update(budgets_of(results))
+    with open(path or BUDGETS_PATH, 'w') as output:
+        json.dump(OrderedDict(sorted(budgets.items())), output, indent=2)
+        output.write('\n')
+
+
+def violations(results, budgets):
+    """
+    Descriptions of every result that is over its budget or got an
+    unexpected status.
+    """
+    found = []
+    for name, result in results.items():
+        budget = budgets.get(name)
+        if result['errors']:
+            found.append('{}: {} unexpected statuses'.format(name, result['errors']))
+        if budget is None:
+            found.append('{}: no budget recorded'.format(name))
+            continue
+        if result['queries'] > budget['queries']:
+            found.append('{}: {} queries, budget {}'.format(name, result['queries'],
+                                                            budget['queries']))
+        if result['p95_ms'] > budget['p95_ms']:
+            found.append('{}: p95 {}ms, budget {}ms'.format(name, result['p95_ms'],
+                                                            budget['p95_ms']))
+    return found
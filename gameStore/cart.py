@@ -0,0 +1,37 @@
+"""
+Shopping cart kept in the session as a list of game ids.
+"""
+from .models import Game
+
+SESSION_KEY = '_cart'
+
+
+def game_ids(request):
+    return list(request.session.get(SESSION_KEY, []))
+
+
+def games(request):
+    """
+    The games in the cart, in the order they were added.
+    """
+    ids = game_ids(request)
+    found = Game.objects.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def add(request, game_id):
+    ids = game_ids(request)
+    if game_id not in ids:
+        ids.append(game_id)
+        request.session[SESSION_KEY] = ids
+
+
+def remove(request, game_id):
+    ids = game_ids(request)
+    if game_id in ids:
+        ids.remove(game_id)
+        request.session[SESSION_KEY] = ids
+
+
+def clear(request):
+    request.session.pop(SESSION_KEY, None)
@@ -0,0 +1,10 @@
+"""
+The PostgreSQL backend with pooled connections, see gameStore.db.pool.
+"""
+from django.db.backends.postgresql import base
+
+from gameStore.db.pool import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,26 @@
+"""
+The SQLite backend with pooled connections (see gameStore.db.pool) and
+PRAGMAS from the database settings, applied to every new connection:
+
+    'PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+
+In-memory databases, such as the test database, are never pooled, as
+every connection to them is a database of its own.
+"""
+from django.db.backends.sqlite3 import base
+
+from gameStore.db.pool import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+
+    @property
+    def pooled(self):
+        return (super(DatabaseWrapper, self).pooled and
+                not self.is_in_memory_db(self.settings_dict['NAME']))
+
+    def open_connection(self, conn_params):
+        connection = super(DatabaseWrapper, self).open_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            connection.execute('PRAGMA {} = {}'.format(name, value))
+        return connection
@@ -0,0 +1,269 @@
+"""
+A bounded per-process pool of database connections.
+
+Django opens a connection for every request unless CONN_MAX_AGE keeps it,
+and a kept connection belongs to the one thread that opened it. With the
+pool, a connection Django closes is handed back instead, and the next
+thread that needs one takes it, so a process keeps at most MAX_SIZE open
+connections however many threads it runs.
+
+The pool is switched on per database with a POOL dict in its settings,
+for the backends in gameStore.db.backends:
+
+    'POOL': {
+        'MAX_SIZE': 10,      # open connections of the process at most
+        'TIMEOUT': 10,       # seconds to wait for a free connection
+        'MAX_IDLE': 300,     # seconds an unused connection is kept
+        'MAX_AGE': 3600,     # seconds a connection is reused at most
+        'CHECK_AFTER': 30,   # seconds unused before it is checked on reuse
+    }
+
+A connection that was unused for CHECK_AFTER seconds is checked with a
+query before it is handed out, and replaced if it no longer works.
+Connections are rolled back when they are returned, so no transaction
+outlives a request. A forked process starts with pools of its own.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_IDLE': 300,
+    'MAX_AGE': 3600,
+    'CHECK_AFTER': 30,
+}
+
+
+class PoolExhausted(OperationalError):
+    pass
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        logger.warning('Closing a pooled connection failed', exc_info=True)
+
+
+class ConnectionPool(object):
+    """
+    Idle connections are kept last in, first out, so the ones in use stay
+    warm and the surplus ones age out after max_idle seconds.
+    """
+
+    def __init__(self, max_size=10, timeout=10, max_idle=300, max_age=3600, check_after=30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self.check_after = check_after
+        self._condition = threading.Condition()
+        # (connection, opened, returned) of the unused connections
+        self._idle = []
+        self._opened_at = {}
+        self.size = 0
+        self.opened = 0
+        self.reused = 0
+
+    def _expired(self, opened, returned, now):
+        return ((self.max_age is not None and now - opened >= self.max_age) or
+                (self.max_idle is not None and now - returned >= self.max_idle))
+
+    def _prune(self, now):
+        # The oldest unused connections are first
+        while self._idle and self._expired(self._idle[0][1], self._idle[0][2], now):
+            self._forget(self._idle.pop(0)[0])
+
+    def _forget(self, connection):
+        # Called with the condition held
+        self._opened_at.pop(connection, None)
+        self.size -= 1
+        self._condition.notify()
+        _close(connection)
+
+    def _take(self, deadline):
+        """
+        An idle connection, or None once a slot for a new one is reserved.
+        """
+        with self._condition:
+            while True:
+                now = time.time()
+                self._prune(now)
+                while self._idle:
+                    taken = self._idle.pop()
+                    if not self._expired(taken[1], taken[2], now):
+                        return taken
+                    self._forget(taken[0])
+                if self.size < self.max_size:
+                    self.size += 1
+                    return None
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise PoolExhausted('No free database connection within {} seconds, all {} '
+                                        'are in use'.format(self.timeout, self.max_size))
+                self._condition.wait(remaining)
+
+    def acquire(self, connect, check=None):
+        """
+        A connection from the pool, opened with connect() if none is free.
+        check(connection) tells whether a connection unused for check_after
+        seconds still works. Waits up to timeout seconds for a connection
+        to be released when all max_size are in use.
+        """
+        deadline = time.time() + self.timeout
+        while True:
+            taken = self._take(deadline)
+            if taken is None:
+                break
+            connection, _, returned = taken
+            if check is None or time.time() - returned < self.check_after or check(connection):
+                with self._condition:
+                    self.reused += 1
+                return connection
+            logger.info('Replacing a pooled connection that failed its health check')
+            with self._condition:
+                self._forget(connection)
+
+        try:
+            connection = connect()
+        except Exception:
+            with self._condition:
+                self.size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opened_at[connection] = time.time()
+            self.opened += 1
+        return connection
+
+    def release(self, connection, reusable=True):
+        """
+        Give back a connection taken with acquire(). Connections that are not
+        reusable are closed.
+        """
+        now = time.time()
+        with self._condition:
+            opened = self._opened_at.get(connection)
+            if opened is None:
+                # Not from this pool, e.g. opened before a fork
+                _close(connection)
+                return
+            if not reusable or self._expired(opened, now, now):
+                self._forget(connection)
+            else:
+                self._idle.append((connection, opened, now))
+                self._condition.notify()
+            self._prune(now)
+
+    def close_idle(self):
+        with self._condition:
+            while self._idle:
+                self._forget(self._idle.pop()[0])
+
+    def stats(self):
+        with self._condition:
+            return {'size': self.size, 'idle': len(self._idle), 'opened': self.opened,
+                    'reused': self.reused}
+
+
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+
+
+def pool_for(alias, options):
+    """
+    The pool of a database alias in this process, created from the POOL
+    settings of the database on first use.
+    """
+    global _pools, _pools_pid
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            # The connections of the parent process are not ours to use or
+            # close, they share its sockets
+            _pools, _pools_pid = {}, os.getpid()
+        pool = _pools.get(alias)
+        if pool is None:
+            options = dict(DEFAULTS, **options)
+            pool = _pools[alias] = ConnectionPool(
+                max_size=options['MAX_SIZE'], timeout=options['TIMEOUT'],
+                max_idle=options['MAX_IDLE'], max_age=options['MAX_AGE'],
+                check_after=options['CHECK_AFTER'])
+        return pool
+
+
+def discard_pool(alias):
+    with _pools_lock:
+        pool = _pools.pop(alias, None)
+    if pool is not None:
+        pool.close_idle()
+
+
+class PooledConnectionMixin(object):
+    """
+    Takes the connections of a DatabaseWrapper from the pool of its alias
+    and gives them back when Django closes them. Backends open their raw
+    connections in open_connection().
+    """
+
+    @property
+    def pooled(self):
+        return bool(self.settings_dict.get('POOL'))
+
+    @property
+    def pool(self):
+        return pool_for(self.alias, self.settings_dict['POOL']) if self.pooled else None
+
+    def open_connection(self, conn_params):
+        return super(PooledConnectionMixin, self).get_new_connection(conn_params)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return self.open_connection(conn_params)
+        return pool.acquire(lambda: self.open_connection(conn_params), self.ping)
+
+    def ping(self, connection):
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def reset(self, connection):
+        """
+        Roll back what the connection left open. Tells whether it can be
+        reused.
+        """
+        if self.errors_occurred and not self.is_usable():
+            return False
+        if self.get_autocommit():
+            # Nothing left open outside atomic blocks
+            return True
+        try:
+            connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super(PooledConnectionMixin, self)._close()
+        # Closed inside an atomic block, Django keeps the connection object
+        # around, so it must not be handed to anyone else
+        reusable = not self.in_atomic_block and self.reset(self.connection)
+        with self.wrap_database_errors:
+            pool.release(self.connection, reusable)
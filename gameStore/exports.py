@@ -0,0 +1,118 @@
+"""
+Streaming exports of a developer's sales history.
+
+Transactions are read in keyset chunks of (created_at, id), so the export
+of any number of sales holds at most one chunk in memory and every query is
+a range read of the (seller, created_at) index. Each exported row carries
+the cursor of its position, an export cut off half way can be resumed by
+passing the cursor of the last row received.
+"""
+import base64
+import csv
+from datetime import datetime, time, timedelta
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import sales
+
+FIELDS = ['id', 'created_at', 'game_id', 'game', 'price', 'cursor']
+
+
+class InvalidExport(ValueError):
+    pass
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 1000)
+
+
+def encode_cursor(created_at, pk):
+    data = json.dumps([created_at.isoformat(), pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        created_at = parse_datetime(created_at)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidExport(cursor)
+    if created_at is None or not isinstance(pk, int):
+        raise InvalidExport(cursor)
+    return created_at, pk
+
+
+def _day_start(value):
+    try:
+        day = parse_date(value)
+    except ValueError:
+        raise InvalidExport(value)
+    if day is None:
+        raise InvalidExport(value)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rows(seller, since=None, until=None, cursor=None):
+    """
+    The completed sales of a developer as dicts, oldest first. since and
+    until are inclusive YYYY-MM-DD dates, cursor resumes after a row of an
+    earlier export. Raises InvalidExport for malformed arguments before
+    the first query.
+    """
+    transactions = sales.completed_transactions().filter(seller=seller)
+    if since:
+        transactions = transactions.filter(created_at__gte=_day_start(since))
+    if until:
+        transactions = transactions.filter(created_at__lt=_day_start(until) + timedelta(days=1))
+    position = decode_cursor(cursor) if cursor else None
+
+    return _chunks(transactions.order_by('created_at', 'pk'), position)
+
+
+def _chunks(transactions, position):
+    size = chunk_size()
+    while True:
+        chunk = transactions
+        if position:
+            created_at, pk = position
+            chunk = chunk.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+        chunk = list(chunk.values_list('pk', 'created_at', 'game_id', 'game__name', 'price')[:size])
+
+        for pk, created_at, game_id, game_name, price in chunk:
+            yield {'id': pk, 'created_at': created_at.isoformat(), 'game_id': game_id,
+                   'game': game_name, 'price': price,
+                   'cursor': encode_cursor(created_at, pk)}
+        if len(chunk) < size:
+            return
+        position = (chunk[-1][1], chunk[-1][0])
+
+
+class _Line(object):
+    """
+    File-like object handing back what csv.writer writes to it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.DictWriter(_Line(), fieldnames=FIELDS)
+    yield writer.writerow(dict(zip(FIELDS, FIELDS)))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+FORMATS = {
+    'csv': ('text/csv', iter_csv),
+    'jsonl': ('application/x-ndjson', iter_jsonl),
+}
@@ -0,0 +1,196 @@
+"""
+Batched ingestion of gameplay events.
+
+Scores are write-behind: they are buffered in a per-process queue and
+written with bulk_create once the queue reaches INGEST_BATCH_SIZE events or
+its oldest event is INGEST_FLUSH_INTERVAL seconds old. A background timer
+flushes idle queues and the queue is drained when the worker exits cleanly.
+A batch that cannot be written is retried by later flushes, and dropped
+after INGEST_MAX_ATTEMPTS failed flushes. Rows violating a constraint, such
+as scores of a game deleted while they were queued, are dropped right away
+so that they do not hold back the rest of the batch.
+
+Saves are batched per request only. A player loading right after saving has
+to see the save, so they are written before the request that carried them
+returns.
+
+The length of the queue and the flushed and dropped scores are exported by
+gameStore.metrics.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from .models import HighScore
+from . import leaderboard, metrics, ranking, saves
+
+logger = logging.getLogger(__name__)
+
+
+def write_scores(scores):
+    """
+    Store a batch of (game_id, user_id, score) tuples in one transaction.
+    """
+    with transaction.atomic():
+        HighScore.objects.bulk_create([
+            HighScore(game_id=game_id, user_id=user_id, score=score)
+            for game_id, user_id, score in scores])
+        leaderboard.record_scores(scores)
+        ranking.record_scores(scores)
+
+
+def write_saves(batch):
+    """
+    Store a batch of (game_id, user_id, game_state) tuples in one transaction.
+    """
+    saves.store(batch)
+
+
+class ScoreQueue(object):
+    """
+    Thread safe write-behind buffer for scores.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._scores = []
+        self._oldest = None
+        self._timer = None
+        self._failures = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.last_flush_seconds = None
+
+    def __len__(self):
+        return len(self._scores)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'INGEST_BATCH_SIZE', 200)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'INGEST_FLUSH_INTERVAL', 2.0)
+
+    @property
+    def max_attempts(self):
+        return getattr(settings, 'INGEST_MAX_ATTEMPTS', 5)
+
+    def put(self, scores):
+        """
+        Queue (game_id, user_id, score) tuples, flushing if a threshold has
+        been reached. Returns the length of the queue.
+        """
+        with self._lock:
+            if not self._scores:
+                self._oldest = time.time()
+            self._scores.extend(scores)
+            pending = len(self._scores)
+            too_old = (self.flush_interval is not None and
+                       time.time() - self._oldest >= self.flush_interval)
+
+        if pending >= self.batch_size or too_old:
+            try:
+                self.flush()
+            except Exception:
+                # Logged by flush, the scores stay queued for the next one
+                pass
+        elif self.flush_interval:
+            self._schedule()
+        return len(self)
+
+    def flush(self):
+        """
+        Write everything queued so far and return the number of scores
+        written. Scores are put back in the queue if writing fails so that a
+        later flush can retry them, up to INGEST_MAX_ATTEMPTS flushes.
+        """
+        with self._flush_lock:
+            with self._lock:
+                scores, self._scores = self._scores, []
+                self._oldest = None
+            if not scores:
+                return 0
+
+            started = time.time()
+            try:
+                written = self._write(scores)
+            except Exception:
+                self._failures += 1
+                if self._failures >= self.max_attempts:
+                    logger.exception('Dropping %d scores after %d failed flushes',
+                                     len(scores), self._failures)
+                    self._failures = 0
+                    self.dropped += len(scores)
+                    return 0
+                with self._lock:
+                    self._scores[:0] = scores
+                    self._oldest = self._oldest or started
+                logger.exception('Flushing %d scores failed', len(scores))
+                raise
+
+            self._failures = 0
+            self.flushed += written
+            self.last_flush_seconds = time.time() - started
+            logger.debug('Flushed %d scores in %.3fs, %d pending',
+                         written, self.last_flush_seconds, len(self))
+            return written
+
+    def _write(self, scores):
+        try:
+            write_scores(scores)
+            return len(scores)
+        except IntegrityError:
+            logger.warning('Writing %d scores failed, retrying one by one', len(scores),
+                           exc_info=True)
+        written = 0
+        for score in scores:
+            try:
+                write_scores([score])
+            except IntegrityError as error:
+                logger.error('Dropping score %r: %s', score, error)
+                self.dropped += 1
+            else:
+                written += 1
+        return written
+
+    def stats(self):
+        return {'pending': len(self), 'flushed': self.flushed, 'dropped': self.dropped,
+                'last_flush_seconds': self.last_flush_seconds}
+
+    def _schedule(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.flush_interval, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            pass
+        finally:
+            connection.close()
+        if len(self):
+            self._schedule()
+
+
+queue = ScoreQueue()
+metrics.register('ingest', queue.stats, 'Score queue of the worker')
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        queue.flush()
+    except Exception:
+        logger.exception('Could not flush scores on exit')
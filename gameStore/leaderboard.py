@@ -0,0 +1,149 @@
+"""
+Per-game leaderboards.
+
+Every game keeps a bounded top-N list of its best scores in the
+LeaderboardEntry table. The list is updated incrementally whenever new
+scores are recorded, so the high score pages only ever read at most N rows
+per game instead of the whole HighScore table.
+"""
+from collections import defaultdict
+from datetime import timedelta
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Game, HighScore, LeaderboardEntry, LeaderboardEvent
+from . import versions
+
+
+_pruned = {'at': 0.0}
+_prune_lock = threading.Lock()
+
+
+def get_size():
+    return getattr(settings, 'LEADERBOARD_SIZE', 25)
+
+
+def record_score(game, user, score):
+    """
+    Offer a single new score to the leaderboard of the given game.
+    """
+    record_scores([(game.pk, user.pk, score)])
+
+
+def record_scores(scores):
+    """
+    Offer a batch of (game_id, user_id, score) tuples to the leaderboards.
+    Only scores that make it into the top-N of their game are stored, and
+    the list is trimmed back to N rows afterwards.
+    """
+    size = get_size()
+    scores_by_game = defaultdict(list)
+    for game_id, user_id, score in scores:
+        scores_by_game[game_id].append((user_id, int(score)))
+
+    changed = []
+    with transaction.atomic():
+        for game_id, candidates in scores_by_game.items():
+            entries = LeaderboardEntry.objects.filter(game_id=game_id)
+            lowest = entries.order_by('-score', 'pk').values_list('score', flat=True)[size - 1:size]
+            if lowest:
+                # Ties do not push out older entries
+                candidates = [c for c in candidates if c[1] > lowest[0]]
+            if not candidates:
+                continue
+
+            candidates.sort(key=lambda c: -c[1])
+            LeaderboardEntry.objects.bulk_create([
+                LeaderboardEntry(game_id=game_id, user_id=user_id, score=score)
+                for user_id, score in candidates[:size]])
+            _trim(game_id, size)
+            changed.append(game_id)
+
+        if changed:
+            versions.bump(versions.LEADERBOARDS)
+            # Pushed to live clients by gameStore.live
+            LeaderboardEvent.objects.bulk_create([
+                LeaderboardEvent(game_id=game_id, payload=json.dumps(top_rows(game_id)))
+                for game_id in changed])
+        prune_events()
+
+
+def prune_events(force=False):
+    """
+    Delete live events older than LIVE_EVENT_RETENTION seconds, at most
+    every LIVE_PRUNE_INTERVAL seconds unless forced. Done where events are
+    written, so the table stays bounded without live viewers too.
+    """
+    interval = getattr(settings, 'LIVE_PRUNE_INTERVAL', 60)
+    with _prune_lock:
+        now = time.time()
+        if not force and (interval is None or now - _pruned['at'] < interval):
+            return 0
+        _pruned['at'] = now
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'LIVE_EVENT_RETENTION', 3600))
+    deleted, _ = LeaderboardEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def _trim(game_id, size):
+    overflow = list(LeaderboardEntry.objects.filter(game_id=game_id)
+                    .order_by('-score', 'pk').values_list('pk', flat=True)[size:])
+    if overflow:
+        LeaderboardEntry.objects.filter(pk__in=overflow).delete()
+
+
+def top(game):
+    """
+    The top-N entries of a single game, best first.
+    """
+    return (LeaderboardEntry.objects.filter(game=game).select_related('user')
+            .order_by('-score', 'pk'))
+
+
+def top_rows(game_id):
+    """
+    The top-N list of a game as {"rank", "user", "score"} dicts.
+    """
+    entries = (LeaderboardEntry.objects.filter(game_id=game_id).order_by('-score', 'pk')
+               .values_list('user__username', 'score'))
+    return [{'rank': rank, 'user': username, 'score': score}
+            for rank, (username, score) in enumerate(entries, 1)]
+
+
+def tops():
+    """
+    The top-N entries of every game in a single query, as a dict mapping
+    game ids to lists of entries ordered best first.
+    """
+    boards = defaultdict(list)
+    entries = (LeaderboardEntry.objects.select_related('user')
+               .order_by('game', '-score', 'pk'))
+    for entry in entries:
+        boards[entry.game_id].append(entry)
+    return boards
+
+
+def rebuild(games=None):
+    """
+    Recompute the leaderboards of the given games (all games by default)
+    from the HighScore table. Uses the (game, score) index so each game
+    reads at most N rows.
+    """
+    size = get_size()
+    if games is None:
+        games = Game.objects.all()
+
+    with transaction.atomic():
+        for game in games:
+            LeaderboardEntry.objects.filter(game=game).delete()
+            best = (HighScore.objects.filter(game=game).order_by('-score', 'pk')
+                    .values_list('user_id', 'score')[:size])
+            LeaderboardEntry.objects.bulk_create([
+                LeaderboardEntry(game=game, user_id=user_id, score=score)
+                for user_id, score in best])
+        versions.bump(versions.LEADERBOARDS)
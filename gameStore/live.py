@@ -0,0 +1,166 @@
+"""
+Live leaderboard updates pushed as Server-Sent Events.
+
+leaderboard.record_scores writes a LeaderboardEvent row with the new top-N
+list of every game whose leaderboard changed. Each worker process has one
+Broadcaster, whose thread polls the table every LIVE_POLL_INTERVAL seconds
+with a single query however many clients are listening, and hands each new
+event to the subscribers of its game. The table is the only channel between
+workers, so no message broker is needed. record_scores deletes events older
+than LIVE_EVENT_RETENTION seconds.
+
+The poller thread only runs while there are subscribers. A poll interval of
+0 disables it, events are then only delivered by explicit poll() calls.
+
+Under sync WSGI workers an open stream holds a whole worker, so pages only
+subscribe when enabled() says so: by default when gameStore.asgi, which
+waits for events on its event loop, serves the site.
+"""
+from collections import defaultdict
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+
+from . import leaderboard
+from .models import LeaderboardEvent
+
+logger = logging.getLogger(__name__)
+
+# Set by gameStore.asgi
+served_by_asgi = False
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Broadcaster(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._thread = None
+        self.last_id = None
+
+    def subscribe(self, game_id, callback):
+        """
+        Call callback with every new event of the game until unsubscribed.
+        Callbacks run on the poller thread and must not block.
+        """
+        with self._lock:
+            if not self._subscribers:
+                # Nobody was listening, so nothing before now needs delivering
+                self.last_id = LeaderboardEvent.objects.aggregate(last=Max('pk'))['last'] or 0
+            self._subscribers[game_id].add(callback)
+            if self._thread is None and _setting('LIVE_POLL_INTERVAL', 0.5):
+                self._thread = threading.Thread(target=self._run, name='leaderboard-broadcaster')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def unsubscribe(self, game_id, callback):
+        with self._lock:
+            self._subscribers[game_id].discard(callback)
+            if not self._subscribers[game_id]:
+                del self._subscribers[game_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(callbacks) for callbacks in self._subscribers.values())
+
+    def poll(self):
+        """
+        Deliver the events written since the last poll. Returns the number of
+        events read.
+        """
+        with self._lock:
+            last_id = self.last_id or 0
+        events = list(LeaderboardEvent.objects.filter(pk__gt=last_id).order_by('pk')
+                      .values_list('pk', 'game_id', 'payload')[:500])
+        for pk, game_id, payload in events:
+            with self._lock:
+                callbacks = list(self._subscribers.get(game_id, ()))
+            event = {'id': pk, 'game': game_id, 'top': json.loads(payload)}
+            for callback in callbacks:
+                callback(event)
+        if events:
+            with self._lock:
+                self.last_id = max(self.last_id or 0, events[-1][0])
+
+        return len(events)
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                try:
+                    self.poll()
+                except Exception:
+                    logger.exception('Polling leaderboard events failed')
+                time.sleep(_setting('LIVE_POLL_INTERVAL', 0.5))
+        finally:
+            connection.close()
+
+
+broadcaster = Broadcaster()
+
+
+def enabled():
+    """
+    Whether pages should subscribe to live leaderboards, LIVE_UPDATES or
+    else whether the ASGI application serves the streams.
+    """
+    setting = _setting('LIVE_UPDATES', None)
+    return served_by_asgi if setting is None else setting
+
+
+def format_event(event):
+    lines = ['event: leaderboard']
+    if event.get('id'):
+        lines.append('id: {}'.format(event['id']))
+    lines.append('data: {}'.format(json.dumps(event)))
+    return '\n'.join(lines) + '\n\n'
+
+
+def snapshot(game_id):
+    return {'id': None, 'game': game_id, 'top': leaderboard.top_rows(game_id)}
+
+
+def stream(game_id):
+    """
+    Server-Sent Events of a game's leaderboard: the current list, then every
+    change, with comment lines every LIVE_HEARTBEAT seconds to keep the
+    connection open. Ends after LIVE_STREAM_DURATION seconds, browsers
+    reconnect by themselves.
+    """
+    events = queue.Queue()
+    broadcaster.subscribe(game_id, events.put)
+    try:
+        first = 'retry: 2000\n' + format_event(snapshot(game_id))
+        # Waiting for events needs no database connection, unless it holds a
+        # transaction the caller is still in
+        if not connection.in_atomic_block:
+            connection.close()
+        yield first
+        heartbeat = _setting('LIVE_HEARTBEAT', 15)
+        deadline = time.time() + _setting('LIVE_STREAM_DURATION', 300)
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            try:
+                event = events.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                yield ': keepalive\n\n'
+            else:
+                yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(game_id, events.put)
@@ -0,0 +1,130 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.utils.crypto import get_random_string
+
+from gameStore import ingest
+from gameStore.asgi import ASGIApplication, build_environ
+from gameStore.models import Game
+from gameStore.wsgi import application as wsgi_application
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = ('Compares the throughput of concurrent gameplay requests served by sync WSGI '
+            'workers and by the ASGI application, in process against the configured database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Number of clients sending requests at the same time.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Sync WSGI workers, each serving one request at a time.')
+        parser.add_argument('--client-delay', type=float, default=0.02,
+                            help='Seconds each client takes to send its request.')
+        parser.add_argument('--endpoint', choices=['score', 'load'], default='score')
+
+    def handle(self, *args, **options):
+        name = 'benchmark-{}'.format(get_random_string(8))
+        user = User.objects.create_user(name)
+        game = Game.objects.create(name=name, price=0, developer=user,
+                                   URL='http://webcourse.cs.hut.fi/example_game.html')
+        game.users.add(user)
+        client = Client()
+        client.force_login(user)
+        csrf_token = get_random_string(32)
+        cookie = '{}={}; {}={}'.format(settings.SESSION_COOKIE_NAME,
+                                       client.cookies[settings.SESSION_COOKIE_NAME].value,
+                                       settings.CSRF_COOKIE_NAME, csrf_token)
+        if options['endpoint'] == 'score':
+            method, path = 'POST', '/highscores/newScore/'
+            body = urlencode({'game': name, 'score': 1}).encode('ascii')
+            query = b''
+        else:
+            method, path, body = 'GET', '/games/load/', b''
+            query = urlencode({'game': name}).encode('ascii')
+        self.scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+                      'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode('ascii')),
+                                  (b'x-csrftoken', csrf_token.encode('ascii')),
+                                  (b'x-requested-with', b'XMLHttpRequest'),
+                                  (b'content-type', b'application/x-www-form-urlencoded')]}
+        self.body = body
+
+        try:
+            for mode, run in [('wsgi', self.run_wsgi), ('asgi', self.run_asgi)]:
+                started = time.time()
+                latencies, errors = run(options)
+                elapsed = time.time() - started
+                self.stdout.write('{:5} {} requests in {:.2f}s, {:.1f} req/s, p50 {:.1f}ms, '
+                                  'p95 {:.1f}ms, {} errors'.format(
+                                      mode, len(latencies), elapsed, len(latencies) / elapsed,
+                                      percentile(latencies, 0.5) * 1000,
+                                      percentile(latencies, 0.95) * 1000, errors))
+        finally:
+            ingest.queue.flush()
+            game.delete()
+            user.delete()
+
+    def run_wsgi(self, options):
+        workers = threading.Semaphore(options['workers'])
+        delay = options['client_delay']
+
+        def request(_):
+            started = time.time()
+            status = {}
+            environ = build_environ(self.scope, self.body)
+            # A sync worker is busy from reading the request until the
+            # response is written
+            with workers:
+                time.sleep(delay)
+                result = wsgi_application(environ, lambda s, h, e=None: status.update(code=s))
+                b''.join(result)
+                if hasattr(result, 'close'):
+                    result.close()
+            return time.time() - started, not status['code'].startswith('200')
+
+        with ThreadPoolExecutor(options['concurrency']) as clients:
+            results = list(clients.map(request, range(options['requests'])))
+        return [latency for latency, _ in results], sum(error for _, error in results)
+
+    def run_asgi(self, options):
+        application = ASGIApplication()
+        delay = options['client_delay']
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        clients = asyncio.Semaphore(options['concurrency'])
+
+        async def request():
+            async with clients:
+                started = time.time()
+                sent = []
+
+                async def receive():
+                    await asyncio.sleep(delay)
+                    return {'type': 'http.request', 'body': self.body}
+
+                async def send(message):
+                    sent.append(message)
+
+                await application(self.scope, receive, send)
+                return time.time() - started, sent[0]['status'] != 200
+
+        try:
+            results = loop.run_until_complete(asyncio.gather(
+                *[request() for _ in range(options['requests'])], loop=loop))
+        finally:
+            loop.close()
+            application.executor.shutdown()
+            application.wsgi_executor.shutdown()
+        return [latency for latency, _ in results], sum(error for _, error in results)
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+from django.db.utils import ConnectionHandler
+
+from gameStore.db.pool import discard_pool
+
+# Settings of the database in every mode
+MODES = [
+    ('new', {'CONN_MAX_AGE': 0, 'POOL': None}),
+    ('persistent', {'CONN_MAX_AGE': None, 'POOL': None}),
+    ('pool', {'CONN_MAX_AGE': 0}),
+]
+
+
+class Command(BaseCommand):
+    help = ('Compares the time the database work of a request takes when every request opens '
+            'a connection, when each thread keeps one (CONN_MAX_AGE) and when they come from '
+            'the pool of gameStore.db.pool.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Threads serving the requests, like the workers of a server.')
+        parser.add_argument('--query', default='SELECT 1',
+                            help='SQL run by every request.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['database'] not in settings.DATABASES:
+            raise CommandError('Unknown database {}'.format(options['database']))
+        database = settings.DATABASES[options['database']]
+        if not database.get('POOL'):
+            self.stdout.write('The pool is off in the settings, measuring it with the defaults.')
+
+        for mode, overrides in MODES:
+            alias = 'benchmark-{}'.format(mode)
+            config = dict(database, **overrides)
+            if mode == 'pool':
+                config['POOL'] = dict(database.get('POOL') or {}, MAX_SIZE=options['threads'])
+            handler = ConnectionHandler({DEFAULT_DB_ALIAS: {}, alias: config})
+            opened = []
+
+            def count(sender, connection, **kwargs):
+                if connection.alias == alias:
+                    opened.append(connection)
+
+            def request(_):
+                connection = handler[alias]
+                with connection.cursor() as cursor:
+                    cursor.execute(options['query'])
+                    cursor.fetchall()
+                # What Django does when a request finishes
+                connection.close_if_unusable_or_obsolete()
+
+            connection_created.connect(count)
+            try:
+                with ThreadPoolExecutor(options['threads']) as threads:
+                    # Every thread connects before the clock starts
+                    list(threads.map(request, range(options['threads'])))
+                    del opened[:]
+                    pooled = handler[alias].pool
+                    before = pooled.stats()['opened'] if pooled else 0
+                    started = time.time()
+                    list(threads.map(request, range(options['requests'])))
+                    elapsed = time.time() - started
+                    connections = pooled.stats()['opened'] - before if pooled else len(opened)
+            finally:
+                connection_created.disconnect(count)
+                discard_pool(alias)
+
+            self.stdout.write('{:10} {} requests in {:.2f}s, {:.0f}us per request, '
+                              '{} connections opened'.format(
+                                  mode, options['requests'], elapsed,
+                                  elapsed / options['requests'] * 1e6, connections))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gameStore import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Measures the latency and queries of every route against seeded data (see '
+            'seed_data) and fails when a route is over the budgets in {}.'.format(
+                'gameStore/benchmark_budgets.json'))
+
+    def add_arguments(self, parser):
+        parser.add_argument('routes', nargs='*', help='Only benchmark these URL names.')
+        parser.add_argument('--requests', type=int, default=benchmarks.DEFAULT_REQUESTS,
+                            help='Measured requests per route.')
+        parser.add_argument('--budgets', default=benchmarks.BUDGETS_PATH,
+                            help='Budgets file to check against or record to.')
+        parser.add_argument('--record', action='store_true',
+                            help='Save the results as the new budgets instead of checking them.')
+
+    def handle(self, *args, **options):
+        missing = benchmarks.uncovered()
+        if missing:
+            raise CommandError('Routes without a benchmark: {}'.format(', '.join(missing)))
+        unknown = [name for name in options['routes'] if name not in benchmarks.ROUTES]
+        if unknown:
+            raise CommandError('Unknown routes: {}'.format(', '.join(unknown)))
+
+        self.stdout.write('{:32} {:>9} {:>9} {:>8}'.format('route', 'p50 ms', 'p95 ms', 'queries'))
+
+        def log(name, result):
+            self.stdout.write('{:32} {:9.1f} {:9.1f} {:8}'.format(
+                name, result['p50_ms'], result['p95_ms'], result['queries']))
+
+        try:
+            results = benchmarks.run(options['requests'], options['routes'], log=log)
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        if options['record']:
+            benchmarks.save_budgets(results, options['budgets'])
+            self.stdout.write('Recorded budgets of {} routes.'.format(len(results)))
+            return
+        violations = benchmarks.violations(results, benchmarks.load_budgets(options['budgets']))
+        if violations:
+            raise CommandError('Over budget:\n' + '\n'.join(violations))
+        self.stdout.write('All routes within budget.')
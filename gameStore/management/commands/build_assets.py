@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from gameStore import assets
+
+
+class Command(BaseCommand):
+    help = ('Writes fingerprinted CSS and JavaScript bundles and their manifest into '
+            'STATIC_ROOT and precompresses its files. Run after collectstatic.')
+
+    def handle(self, *args, **options):
+        def log(message):
+            if options['verbosity'] > 1:
+                self.stdout.write(message)
+
+        bundles = assets.build(log=log)
+        for name, built in bundles.items():
+            self.stdout.write('{} -> {}'.format(name, built))
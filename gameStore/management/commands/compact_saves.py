@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from gameStore import saves
+
+
+class Command(BaseCommand):
+    help = ('Deletes saves that fall outside SAVE_RETENTION_KEEP_LAST and '
+            'SAVE_RETENTION_DAYS, in small batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Maximum number of saves deleted per transaction.')
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        def log(count):
+            if options['verbosity'] > 1:
+                self.stdout.write('Deleted {} saves.'.format(count))
+
+        deleted = saves.compact(batch_size=options['batch_size'],
+                                pause=options['pause'], log=log)
+        self.stdout.write('Compacted {} saves.'.format(deleted))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from gameStore import payments
+
+
+class Command(BaseCommand):
+    help = ('Expires pending transactions older than PAYMENT_PENDING_TIMEOUT and deletes '
+            'failed and expired ones older than PAYMENT_ABANDONED_RETENTION_DAYS, in small batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Maximum number of transactions changed per transaction.')
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        def log(verb, count):
+            if options['verbosity'] > 1:
+                self.stdout.write('{} {} transactions.'.format(verb, count))
+
+        expired, deleted = payments.reap(batch_size=options['batch_size'],
+                                         pause=options['pause'], log=log)
+        self.stdout.write('Expired {} and deleted {} transactions.'.format(expired, deleted))
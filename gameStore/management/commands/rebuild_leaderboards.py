@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from gameStore import leaderboard
+from gameStore.models import Game
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the materialized top-N leaderboards from the HighScore table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_ids', nargs='*', type=int,
+                            help='Only rebuild the leaderboards of these games.')
+
+    def handle(self, *args, **options):
+        games = Game.objects.all()
+        if options['game_ids']:
+            games = games.filter(pk__in=options['game_ids'])
+
+        leaderboard.rebuild(games)
+        self.stdout.write('Rebuilt leaderboards for {} games.'.format(games.count()))
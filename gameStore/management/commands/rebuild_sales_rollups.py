@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from gameStore import sales
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-game, per-day sales rollups from the completed transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of transactions read per query.')
+
+    def handle(self, *args, **options):
+        rows = sales.rebuild(batch_size=options['batch_size'])
+        self.stdout.write('Rebuilt {} sales rollups.'.format(rows))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from gameStore import search
+from gameStore.models import Game
+
+
+class Command(BaseCommand):
+    help = 'Reindexes every game for full-text search.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of games indexed per transaction.')
+
+    def handle(self, *args, **options):
+        last_pk = 0
+        indexed = 0
+        while True:
+            ids = list(Game.objects.filter(pk__gt=last_pk).order_by('pk')
+                       .values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            search.index_games(Game.objects.filter(pk__in=ids))
+            last_pk = ids[-1]
+            indexed += len(ids)
+        self.stdout.write('Indexed {} games.'.format(indexed))
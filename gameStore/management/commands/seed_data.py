@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+
+from gameStore import seed
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with synthetic users, games, transactions, scores and saves '
+            'for load testing. Scale 1 writes about 150 000 rows, scale 50 millions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiplier of the default row counts.')
+        for name, count in seed.COUNTS.items():
+            parser.add_argument('--{}'.format(name), type=int,
+                                help='Number of {}, {} at scale 1.'.format(name, count))
+        parser.add_argument('--seed', type=int, help='Random seed, for repeatable data.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows written per insert.')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously seeded data first.')
+
+    def handle(self, *args, **options):
+        def log(message):
+            self.stdout.write(message)
+
+        if options['clear']:
+            seed.clear(log=log)
+        elif User.objects.filter(username__startswith=seed.SEED_PREFIX).exists():
+            raise CommandError('The database already has seeded data, use --clear to replace it.')
+
+        counts = seed.counts(options['scale'], **{name: options[name] for name in seed.COUNTS})
+        self.stdout.write('Seeding {}.'.format(', '.join(
+            '{} {}'.format(count, name) for name, count in counts.items())))
+        seed.seed(counts, batch_size=options['batch_size'], seed=options['seed'], log=log)
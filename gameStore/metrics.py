@@ -0,0 +1,385 @@
+"""
+Per-view latency, SQL and template render time histograms.
+
+MetricsMiddleware measures every request and files it under the name of
+the URL pattern it resolved to. For each view it records the wall time, the
+number of SQL queries and their total time, and the time spent rendering
+templates. Queries are counted through Django's debug cursor, switched on
+for the length of the request even with DEBUG off (this Django version has
+no execute wrappers). Render time is measured by the InstrumentedTemplates
+backend.
+
+The histograms of a process are kept in memory and written every
+METRICS_FLUSH_INTERVAL seconds to a file of its own in METRICS_DIR. The
+metrics view merges the files of all workers into one Prometheus text
+exposition, so it does not matter which worker serves the scrape. The
+files of exited workers are merged into EXITED_NAME on every scrape and
+removed, so their counts are kept without a file per worker ever started.
+Workers are told apart by pid, so METRICS_DIR must not be shared between
+machines.
+
+Other modules export the statistics they keep in memory with register().
+They are written to the same files and exposed as gauges labelled with the
+worker, gamestore_<source>_<statistic>{worker="..."}, for running workers
+only.
+"""
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils.crypto import get_random_string
+
+logger = logging.getLogger(__name__)
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = OrderedDict([
+    ('gamestore_request_seconds', ('Wall time of requests in seconds.', TIME_BUCKETS)),
+    ('gamestore_request_queries', ('SQL queries per request.', COUNT_BUCKETS)),
+    ('gamestore_request_query_seconds', ('Time spent in SQL queries per request in seconds.',
+                                         TIME_BUCKETS)),
+    ('gamestore_request_template_seconds', ('Time spent rendering templates per request in '
+                                            'seconds.', TIME_BUCKETS)),
+])
+
+UNRESOLVED = '<unresolved>'
+
+# Key of the registered statistics in the files of the workers
+STATS_KEY = 'stats'
+
+# Registered statistics, see register()
+SOURCES = OrderedDict()
+
+# Histograms of the exited workers, and the lock of the directory while
+# they are merged into it
+EXITED_NAME = 'exited.json'
+LOCK_NAME = '.lock'
+
+_local = threading.local()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def register(source, stats, description):
+    """
+    Export the numbers in the dict returned by stats(), other values are
+    left out.
+    """
+    SOURCES[source] = (description, stats)
+
+
+def current_stats():
+    """
+    The registered statistics of this process.
+    """
+    current = OrderedDict()
+    for source, (_, stats) in SOURCES.items():
+        try:
+            values = stats()
+        except Exception:
+            logger.exception('Reading the %s statistics failed', source)
+            continue
+        current[source] = OrderedDict(
+            (key, value) for key, value in sorted(values.items())
+            if isinstance(value, (int, float)) and not isinstance(value, bool))
+    return current
+
+
+class Registry(object):
+    """
+    The histograms of this process. A histogram is a list of the counts of
+    every bucket, the +Inf bucket included, followed by the sum and the
+    count of the observed values.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        # Tells apart processes that got the same pid
+        self.name = '{}-{}'.format(self.pid, get_random_string(8))
+        self._histograms = {}
+        self._flushed = time.time()
+
+    def observe(self, view, values):
+        """
+        Add a value of every metric, given as a dict, to the view's histograms.
+        """
+        with self._lock:
+            if os.getpid() != self.pid:
+                # Forked worker, the counts belong to the parent
+                self._reset()
+            for metric, value in values.items():
+                buckets = METRICS[metric][1]
+                histogram = self._histograms.setdefault(metric, {}).get(view)
+                if histogram is None:
+                    histogram = self._histograms[metric][view] = [0] * (len(buckets) + 3)
+                histogram[bisect_left(buckets, value)] += 1
+                histogram[-2] += value
+                histogram[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {metric: {view: list(histogram) for view, histogram in views.items()}
+                    for metric, views in self._histograms.items()}
+
+    def flush(self, force=False):
+        """
+        Write the histograms to this process' file in METRICS_DIR, at most
+        every METRICS_FLUSH_INTERVAL seconds unless forced.
+        """
+        directory = _setting('METRICS_DIR', None)
+        if not directory:
+            return
+        with self._lock:
+            now = time.time()
+            if not force and now - self._flushed < _setting('METRICS_FLUSH_INTERVAL', 5):
+                return
+            self._flushed = now
+        data = self.snapshot()
+        data[STATS_KEY] = current_stats()
+        try:
+            _write(directory, self.name + '.json', data)
+        except OSError:
+            logger.exception('Writing metrics to %s failed', directory)
+
+
+registry = Registry()
+
+
+def _write(directory, name, data):
+    os.makedirs(directory, exist_ok=True)
+    descriptor, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(descriptor, 'w') as output:
+        json.dump(data, output)
+    os.replace(path, os.path.join(directory, name))
+
+
+def _read(directory, name):
+    """
+    The histograms in a file of the directory, or None if it cannot be read.
+    """
+    try:
+        with open(os.path.join(directory, name)) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        logger.warning('Skipping unreadable metrics file %s', name)
+        return None
+
+
+def _exited(name):
+    """
+    Whether a file was written by a worker that is no longer running.
+    """
+    try:
+        pid = int(name.split('-', 1)[0])
+    except ValueError:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        # Running, as another user
+        pass
+    return False
+
+
+@contextmanager
+def _locked(directory):
+    """
+    Holds the lock of the directory, so a scrape does not read the files
+    another one is folding.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_NAME), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def fold_exited(directory):
+    """
+    Merge the files of exited workers into EXITED_NAME and remove them.
+    Call with the directory locked. Returns the number of files removed.
+    """
+    names = [name for name in os.listdir(directory) if name.endswith('.json') and _exited(name)]
+    if not names:
+        return 0
+    merged = {}
+    for name in [EXITED_NAME] + names:
+        if os.path.exists(os.path.join(directory, name)):
+            merge(merged, _read(directory, name) or {})
+    _write(directory, EXITED_NAME, merged)
+    for name in names:
+        os.remove(os.path.join(directory, name))
+    return len(names)
+
+
+def merge(into, data):
+    for metric, views in data.items():
+        if metric not in METRICS:
+            continue
+        merged = into.setdefault(metric, {})
+        for view, histogram in views.items():
+            if view in merged and len(merged[view]) == len(histogram):
+                merged[view] = [a + b for a, b in zip(merged[view], histogram)]
+            else:
+                merged[view] = list(histogram)
+    return into
+
+
+def collect():
+    """
+    The histograms of every worker merged together.
+    """
+    registry.flush(force=True)
+    directory = _setting('METRICS_DIR', None)
+    if not directory:
+        merged = registry.snapshot()
+        merged[STATS_KEY] = {registry.name: current_stats()}
+        return merged
+    merged = {STATS_KEY: {}}
+    try:
+        with _locked(directory):
+            fold_exited(directory)
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.json'):
+                    continue
+                data = _read(directory, name) or {}
+                merge(merged, data)
+                if name != EXITED_NAME and data.get(STATS_KEY):
+                    merged[STATS_KEY][name[:-len('.json')]] = data[STATS_KEY]
+    except OSError:
+        logger.exception('Reading metrics from %s failed', directory)
+    return merged
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(data):
+    """
+    Histograms in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric, (description, buckets) in METRICS.items():
+        lines.append('# HELP {} {}'.format(metric, description))
+        lines.append('# TYPE {} histogram'.format(metric))
+        for view, histogram in sorted(data.get(metric, {}).items()):
+            view = _label(view)
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), histogram):
+                cumulative += count
+                lines.append('{}_bucket{{view="{}",le="{}"}} {}'.format(
+                    metric, view, _number(bound) if bound != '+Inf' else bound, cumulative))
+            lines.append('{}_sum{{view="{}"}} {}'.format(metric, view, _number(histogram[-2])))
+            lines.append('{}_count{{view="{}"}} {}'.format(metric, view, histogram[-1]))
+    workers = data.get(STATS_KEY, {})
+    for source, (description, _) in SOURCES.items():
+        keys = sorted(set(key for stats in workers.values() for key in stats.get(source, {})))
+        for key in keys:
+            metric = 'gamestore_{}_{}'.format(source, key)
+            lines.append('# HELP {} {}: {}.'.format(metric, description, key.replace('_', ' ')))
+            lines.append('# TYPE {} gauge'.format(metric))
+            for worker, stats in sorted(workers.items()):
+                if key in stats.get(source, {}):
+                    lines.append('{}{{worker="{}"}} {}'.format(
+                        metric, _label(worker), _number(stats[source][key])))
+    return '\n'.join(lines) + '\n'
+
+
+class Measurement(object):
+    """
+    Measures the request handled by the current thread from creation until
+    finish().
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        _local.template_seconds = 0.0
+        self.connections = []
+        for connection in connections.all():
+            self.connections.append((connection, connection.force_debug_cursor,
+                                     len(connection.queries_log)))
+            connection.force_debug_cursor = True
+
+    def finish(self, view):
+        elapsed = time.time() - self.started
+        queries = 0
+        query_seconds = 0.0
+        for connection, forced, start in self.connections:
+            connection.force_debug_cursor = forced
+            logged = list(connection.queries_log)[start:]
+            queries += len(logged)
+            query_seconds += sum(float(query['time']) for query in logged)
+        registry.observe(view or UNRESOLVED, {
+            'gamestore_request_seconds': elapsed,
+            'gamestore_request_queries': queries,
+            'gamestore_request_query_seconds': query_seconds,
+            'gamestore_request_template_seconds': _local.template_seconds,
+        })
+        registry.flush()
+
+
+class MetricsMiddleware(object):
+    """
+    Should come first, to measure the other middleware too.
+    """
+
+    def process_request(self, request):
+        request._metrics = Measurement()
+
+    def process_response(self, request, response):
+        measurement = getattr(request, '_metrics', None)
+        if measurement is not None:
+            match = getattr(request, 'resolver_match', None)
+            measurement.finish(match.view_name if match else None)
+        return response
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        started = time.time()
+        try:
+            return super(TimedTemplate, self).render(context, request)
+        finally:
+            _local.template_seconds = getattr(_local, 'template_seconds', 0.0) + time.time() - started
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """
+    The Django template backend, adding the render time of the templates
+    to the measured request.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super(InstrumentedTemplates, self).from_string(template_code).template,
+                             self)
+
+    def get_template(self, *args, **kwargs):
+        return TimedTemplate(super(InstrumentedTemplates, self).get_template(*args, **kwargs).template,
+                             self)
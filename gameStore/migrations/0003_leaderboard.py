@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 19:02
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_leaderboards(apps, schema_editor):
+    Game = apps.get_model('gameStore', 'Game')
+    HighScore = apps.get_model('gameStore', 'HighScore')
+    LeaderboardEntry = apps.get_model('gameStore', 'LeaderboardEntry')
+    size = getattr(settings, 'LEADERBOARD_SIZE', 25)
+
+    for game in Game.objects.all():
+        best = (HighScore.objects.filter(game=game).order_by('-score', 'pk')
+                .values_list('user_id', 'score')[:size])
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(game=game, user_id=user_id, score=score)
+            for user_id, score in best])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gameStore', '0002_auto_20160227_1243'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('score', models.IntegerField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='gameStore.Game')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='highscore',
+            index_together=set([('game', 'score')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='leaderboardentry',
+            index_together=set([('game', 'score')]),
+        ),
+        migrations.RunPython(build_leaderboards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 19:03
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def collect_best_scores(apps, schema_editor):
+    HighScore = apps.get_model('gameStore', 'HighScore')
+    BestScore = apps.get_model('gameStore', 'BestScore')
+
+    best = (HighScore.objects.values('game_id', 'user_id')
+            .annotate(best=models.Max('score')).order_by())
+    BestScore.objects.bulk_create([
+        BestScore(game_id=row['game_id'], user_id=row['user_id'], score=row['best'])
+        for row in best.iterator()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gameStore', '0003_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BestScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('score', models.IntegerField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_scores', to='gameStore.Game')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='bestscore',
+            unique_together=set([('user', 'game')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='bestscore',
+            index_together=set([('game', 'score', 'user')]),
+        ),
+        migrations.RunPython(collect_best_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 19:05
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_save_slots(apps, schema_editor):
+    Save = apps.get_model('gameStore', 'Save')
+    SaveSlot = apps.get_model('gameStore', 'SaveSlot')
+
+    slots = {}
+    for save in Save.objects.order_by('created_at', 'pk').iterator():
+        slots[(save.user_id, save.game_id)] = save.game_state
+    SaveSlot.objects.bulk_create([
+        SaveSlot(user_id=user_id, game_id=game_id, game_state=game_state)
+        for (user_id, game_id), game_state in slots.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gameStore', '0004_best_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaveSlot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('game_state', models.CharField(max_length=255)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='save_slots', to='gameStore.Game')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='save_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='save',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='save',
+            index_together=set([('user', 'game', 'created_at')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='saveslot',
+            unique_together=set([('user', 'game')]),
+        ),
+        migrations.RunPython(fill_save_slots, migrations.RunPython.noop),
+    ]
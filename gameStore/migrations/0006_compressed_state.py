@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import zlib
+
+from django.db import migrations, models
+
+
+def frame(game_state):
+    # Same format as gameStore.state_storage.encode
+    raw = game_state.encode('utf-8')
+    compressed = zlib.compress(raw, 6)
+    if len(compressed) < len(raw):
+        return b'Z' + compressed
+    return b'R' + raw
+
+
+def compress_states(apps, schema_editor):
+    for name in ['Save', 'SaveSlot']:
+        model = apps.get_model('gameStore', name)
+        for pk, game_state in model.objects.values_list('pk', 'game_state').iterator():
+            model.objects.filter(pk=pk).update(state=frame(game_state))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameStore', '0005_save_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='save',
+            name='state',
+            field=models.BinaryField(default=b'R'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='saveslot',
+            name='state',
+            field=models.BinaryField(default=b'R'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(compress_states, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='save',
+            name='game_state',
+        ),
+        migrations.RemoveField(
+            model_name='saveslot',
+            name='game_state',
+        ),
+    ]
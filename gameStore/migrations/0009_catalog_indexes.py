@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 19:13
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameStore', '0008_page_cache_table'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='game',
+            index_together=set([('price', 'id'), ('created', 'id')]),
+        ),
+        # Category listings start from the category side of the join table
+        migrations.RunSQL(
+            ['CREATE INDEX "gameStore_game_categories_category_game" '
+             'ON "gameStore_game_categories" ("gamecategory_id", "game_id")'],
+            ['DROP INDEX "gameStore_game_categories_category_game"'],
+        ),
+    ]
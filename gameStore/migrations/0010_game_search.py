@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# The search table of gameStore.search as it was created, kept here so later
+# changes to that module do not change what this migration does
+CREATE = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS gamestore_game_search USING fts5('
+        'name, categories, description, tokenize="unicode61")',
+    ],
+    'postgresql': [
+        'CREATE TABLE IF NOT EXISTS gamestore_game_search ('
+        'game_id integer PRIMARY KEY, document tsvector NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS gamestore_game_search_document ON gamestore_game_search '
+        'USING GIN (document)',
+    ],
+}
+
+INSERT = {
+    'sqlite': 'INSERT INTO gamestore_game_search (rowid, name, categories, description) '
+              'VALUES (%s, %s, %s, %s)',
+    'postgresql': "INSERT INTO gamestore_game_search (game_id, document) VALUES (%s, "
+                  "setweight(to_tsvector('simple', %s), 'A') || "
+                  "setweight(to_tsvector('simple', %s), 'B') || "
+                  "setweight(to_tsvector('simple', %s), 'C'))",
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    # Other databases search without an index
+    if vendor not in CREATE:
+        return
+    for statement in CREATE[vendor]:
+        schema_editor.execute(statement)
+
+    Game = apps.get_model('gameStore', 'Game')
+    with schema_editor.connection.cursor() as cursor:
+        for game in Game.objects.prefetch_related('categories').iterator():
+            categories = ' '.join(category.name for category in game.categories.all())
+            cursor.execute(INSERT[vendor], [game.pk, game.name, categories, game.description])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE:
+        schema_editor.execute('DROP TABLE IF EXISTS gamestore_game_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameStore', '0009_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
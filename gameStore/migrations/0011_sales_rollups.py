@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 19:16
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def collect_sales(apps, schema_editor):
+    Transaction = apps.get_model('gameStore', 'Transaction')
+    SalesRollup = apps.get_model('gameStore', 'SalesRollup')
+
+    totals = {}
+    completed = (Transaction.objects.filter(game__users=models.F('payer'))
+                 .values_list('game_id', 'seller_id', 'created_at', 'price'))
+    for game_id, seller_id, created_at, price in completed.iterator():
+        key = (game_id, timezone.localtime(created_at).date())
+        count, revenue, _ = totals.get(key, (0, 0, seller_id))
+        totals[key] = (count + 1, revenue + price, seller_id)
+    SalesRollup.objects.bulk_create([
+        SalesRollup(game_id=game_id, day=day, seller_id=seller_id, count=count, revenue=revenue)
+        for (game_id, day), (count, revenue, seller_id) in totals.items()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gameStore', '0010_game_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('revenue', models.IntegerField(default=0)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='gameStore.Game')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='salesrollup',
+            unique_together=set([('game', 'day')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='salesrollup',
+            index_together=set([('seller', 'day')]),
+        ),
+        migrations.RunPython(collect_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 19:18
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def mark_paid(apps, schema_editor):
+    # Failed payments used to be deleted, so a transaction whose payer owns
+    # the game is a paid one and the rest are checkouts left pending
+    Transaction = apps.get_model('gameStore', 'Transaction')
+    Transaction.objects.filter(game__users=models.F('payer')).update(status='paid')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameStore', '0012_transaction_seller_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed'), ('expired', 'Expired')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_paid, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='transaction',
+            index_together=set([('seller', 'created_at', 'id'), ('status', 'created_at'), ('payer', 'game', 'status')]),
+        ),
+    ]
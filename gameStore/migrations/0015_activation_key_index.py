@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 19:21
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameStore', '0014_cart_checkout'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='activation_key',
+            field=models.CharField(db_index=True, max_length=40),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='key_expires',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# SQLite lost the indexes of these join tables when 0002 rebuilt the game
+# table. Other databases still have them.
+INDEXES = [
+    ('gameStore_game_categories', 'gameStore_game_categories_game_category',
+     ['game_id', 'gamecategory_id']),
+    ('gameStore_game_users', 'gameStore_game_users_game_user', ['game_id', 'user_id']),
+]
+
+
+def _has_index(schema_editor, table, column):
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection.get_constraints(cursor, table)
+    return any(constraint['columns'] and constraint['columns'][0] == column and
+               (constraint['index'] or constraint['unique'])
+               for constraint in constraints.values())
+
+
+def add_indexes(apps, schema_editor):
+    quote = schema_editor.quote_name
+    for table, name, columns in INDEXES:
+        if not _has_index(schema_editor, table, columns[0]):
+            schema_editor.execute('CREATE INDEX {} ON {} ({})'.format(
+                quote(name), quote(table), ', '.join(quote(column) for column in columns)))
+
+
+def remove_indexes(apps, schema_editor):
+    for table, name, columns in INDEXES:
+        with schema_editor.connection.cursor() as cursor:
+            constraints = schema_editor.connection.introspection.get_constraints(cursor, table)
+        if name in constraints:
+            schema_editor.execute('DROP INDEX {}'.format(schema_editor.quote_name(name)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameStore', '0016_leaderboard_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def clear_activation_keys(apps, schema_editor):
+    # Activation clears the key since accounts.signups started purging by
+    # it. Users activated before then still have theirs, and would be
+    # purged once deactivated if they never logged in.
+    UserProfile = apps.get_model('gameStore', 'UserProfile')
+    UserProfile.objects.filter(user__is_active=True).exclude(activation_key='').update(
+        activation_key='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameStore', '0017_game_m2m_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_activation_keys, migrations.RunPython.noop),
+    ]
@@ -5,8 +5,9 @@ import logging
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, related_name='user_profile')
-    activation_key = models.CharField(max_length=40)
-    key_expires = models.DateTimeField()
+    activation_key = models.CharField(max_length=40, db_index=True)
+    # Expired profiles of inactive users are purged, see accounts.signups
+    key_expires = models.DateTimeField(db_index=True)
 
 
 class GameCategory(models.Model):
@@ -17,7 +18,7 @@ class GameCategory(models.Model):
 
 
 class Game(models.Model):
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, db_index=True)
     price = models.IntegerField()
     URL = models.URLField()
     image = models.URLField(default='http://placehold.it/150x80?text=IMAGE')
@@ -28,26 +29,84 @@ class Game(models.Model):
     developer = models.ForeignKey('auth.User', related_name="developed_games")
     users = models.ManyToManyField(User, related_name="owned_games", default=None, blank=True)
 
+    class Meta:
+        # Sort keys of gameStore.pagination
+        index_together = [['created', 'id'], ['price', 'id']]
+
     def __str__(self):
         return self.name
 
 
+class CacheVersion(models.Model):
+    """
+    Version stamps shared by all worker processes. Bumping a version tells
+    every process to drop its cached copies of the named data, see
+    gameStore.versions.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    version = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "{} - {}".format(self.name, self.version)
+
+
 class Save(models.Model):
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     user = models.ForeignKey(User, related_name="saves", on_delete=models.CASCADE)
     game = models.ForeignKey(Game, related_name="saves", on_delete=models.CASCADE)
-    game_state = models.CharField(max_length=255)
+    # Framed and compressed by gameStore.state_storage
+    state = models.BinaryField()
+
+    class Meta:
+        index_together = [['user', 'game', 'created_at']]
+
+
+class SaveSlot(models.Model):
+    """
+    The latest saved state of a user in a game. Older states are kept as
+    Save rows until gameStore.saves compacts them away.
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+    user = models.ForeignKey(User, related_name="save_slots", on_delete=models.CASCADE)
+    game = models.ForeignKey(Game, related_name="save_slots", on_delete=models.CASCADE)
+    state = models.BinaryField()
+
+    class Meta:
+        unique_together = [['user', 'game']]
 
 
 class Transaction(models.Model):
+    PENDING = 'pending'
+    PAID = 'paid'
+    FAILED = 'failed'
+    EXPIRED = 'expired'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (PAID, 'Paid'),
+        (FAILED, 'Failed'),
+        (EXPIRED, 'Expired'),
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
     price = models.IntegerField()
-    game = models.ForeignKey(Game)
+    # Cart checkouts are paid through a parent transaction without a game
+    # or seller, with one line item per game
+    parent = models.ForeignKey('self', related_name="items", null=True, blank=True, on_delete=models.CASCADE)
+    game = models.ForeignKey(Game, null=True, blank=True)
     payer = models.ForeignKey(User, related_name="bought_transactions", on_delete=models.CASCADE)
-    seller = models.ForeignKey(User, related_name="sold_transactions", on_delete=models.CASCADE)
+    seller = models.ForeignKey(User, related_name="sold_transactions", null=True, blank=True, on_delete=models.CASCADE)
 
     class Meta:
         get_latest_by = 'created_at'
+        index_together = [
+            # Keyset order of gameStore.exports
+            ['seller', 'created_at', 'id'],
+            # Reaping, see gameStore.payments
+            ['status', 'created_at'],
+            # Checkouts in progress
+            ['payer', 'game', 'status'],
+        ]
 
     def calculate_payment_checksum(self):
         checksum_string = "pid={}&sid={}&amount={}&token={}".format(self.pk,
@@ -59,10 +118,82 @@ class Transaction(models.Model):
         return m.hexdigest()
 
 
+class SalesRollup(models.Model):
+    """
+    Number and revenue of the sales of a game on one day. Maintained by
+    gameStore.sales as purchases complete.
+    """
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+    revenue = models.IntegerField(default=0)
+    game = models.ForeignKey(Game, related_name="sales", on_delete=models.CASCADE)
+    seller = models.ForeignKey(User, related_name="sales", on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = [['game', 'day']]
+        index_together = [['seller', 'day']]
+
+    def __str__(self):
+        return "{} - {}".format(self.game_id, self.day)
+
+
 class HighScore(models.Model):
     score = models.IntegerField()
     user = models.ForeignKey(User, related_name="scores", on_delete=models.CASCADE)
     game = models.ForeignKey(Game, related_name="scores", on_delete=models.CASCADE)
 
+    class Meta:
+        index_together = [['game', 'score']]
+
     def __str__(self):
         return self.game.name
+
+
+class BestScore(models.Model):
+    """
+    Best score of each user per game. Ranks are counted over this table
+    through the (game, score, user) index, see gameStore.ranking.
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+    score = models.IntegerField()
+    user = models.ForeignKey(User, related_name="best_scores", on_delete=models.CASCADE)
+    game = models.ForeignKey(Game, related_name="best_scores", on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = [['user', 'game']]
+        index_together = [['game', 'score', 'user']]
+
+    def __str__(self):
+        return "{} - {}".format(self.game_id, self.score)
+
+
+class LeaderboardEntry(models.Model):
+    """
+    One row of a game's materialized top-N list. Maintained by
+    gameStore.leaderboard, never written directly by the views.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    score = models.IntegerField()
+    user = models.ForeignKey(User, related_name="leaderboard_entries", on_delete=models.CASCADE)
+    game = models.ForeignKey(Game, related_name="leaderboard_entries", on_delete=models.CASCADE)
+
+    class Meta:
+        index_together = [['game', 'score']]
+
+    def __str__(self):
+        return "{} - {}".format(self.game_id, self.score)
+
+
+class LeaderboardEvent(models.Model):
+    """
+    The new top-N list of a game after it changed. Read by the broadcaster
+    of every worker process to push updates to live clients, see
+    gameStore.live.
+    """
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    game = models.ForeignKey(Game, related_name="leaderboard_events", on_delete=models.CASCADE)
+    # JSON list of {"rank", "user", "score"} objects
+    payload = models.TextField()
+
+    def __str__(self):
+        return "{} - {}".format(self.game_id, self.created_at)
@@ -0,0 +1,103 @@
+"""
+Games owned and developed by the current user.
+
+Both sets are loaded with one query each and cached in the session for
+OWNERSHIP_SESSION_TTL seconds, so listings can flag any number of games
+without a query per game. Views that change ownership update the cached
+sets through grant() and add_developed().
+"""
+import time
+
+from django.conf import settings
+from django.db import router
+
+from .models import Game
+
+SESSION_KEY = '_ownership'
+
+
+class Ownership(object):
+
+    def __init__(self, owned=(), developed=()):
+        self.owned = set(owned)
+        self.developed = set(developed)
+
+    def owns(self, game_id):
+        return game_id in self.owned
+
+    def develops(self, game_id):
+        return game_id in self.developed
+
+    def annotate(self, games):
+        """
+        Set owned and developed flags on the given games and return them as
+        a list.
+        """
+        games = list(games)
+        for game in games:
+            game.owned = game.pk in self.owned
+            game.developed = game.pk in self.developed
+        return games
+
+    @classmethod
+    def load(cls, user):
+        # Both sets are read from the same database, so they agree
+        alias = router.db_for_read(Game)
+        return cls(user.owned_games.using(alias).values_list('pk', flat=True),
+                   user.developed_games.using(alias).values_list('pk', flat=True))
+
+
+def _ttl():
+    return getattr(settings, 'OWNERSHIP_SESSION_TTL', 300)
+
+
+def _store(request, ownership):
+    request._ownership = ownership
+    request.session[SESSION_KEY] = {
+        'user': request.user.pk,
+        'loaded': time.time(),
+        'owned': sorted(ownership.owned),
+        'developed': sorted(ownership.developed),
+    }
+
+
+def for_request(request):
+    """
+    Ownership of the current user, from the request, the session or the
+    database in that order.
+    """
+    if hasattr(request, '_ownership'):
+        return request._ownership
+    if not request.user.is_authenticated():
+        request._ownership = Ownership()
+        return request._ownership
+
+    cached = request.session.get(SESSION_KEY)
+    if (cached and cached['user'] == request.user.pk and
+            time.time() - cached['loaded'] < _ttl()):
+        request._ownership = Ownership(cached['owned'], cached['developed'])
+        return request._ownership
+
+    ownership = Ownership.load(request.user)
+    _store(request, ownership)
+    return ownership
+
+
+def grant(request, game_ids):
+    """
+    Record games bought by the current user.
+    """
+    if request.user.is_authenticated():
+        ownership = for_request(request)
+        ownership.owned.update(game_ids)
+        _store(request, ownership)
+
+
+def add_developed(request, game_id):
+    """
+    Record a game created by the current user.
+    """
+    if request.user.is_authenticated():
+        ownership = for_request(request)
+        ownership.developed.add(game_id)
+        _store(request, ownership)
@@ -0,0 +1,78 @@
+"""
+Full page cache for the catalog pages seen by anonymous visitors.
+
+Cached pages are keyed by the versions of the data they show (see
+gameStore.versions), so a page is never served after the data behind it
+has changed: the next request simply misses and renders the new version.
+
+When a page is missing, only the request that manages to take the rebuild
+lock renders it. Concurrent requests for the same page wait up to
+PAGE_CACHE_WAIT seconds for the rebuilt page and only then render it
+themselves, without caching.
+"""
+from functools import wraps
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from . import versions
+
+POLL_INTERVAL = 0.05
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def _key(request, version):
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    return 'page:{}:{}'.format(path, '.'.join(str(v) for v in version))
+
+
+def _from_cache(cached):
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def cache_anonymous_page(*version_names):
+    """
+    Cache the GET responses of a view for anonymous users until any of the
+    named versions moves on.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated():
+                return view(request, *args, **kwargs)
+
+            cache = _cache()
+            key = _key(request, versions.get_many(version_names))
+            cached = cache.get(key)
+            if cached is not None:
+                return _from_cache(cached)
+
+            lock = key + ':lock'
+            if not cache.add(lock, 1, getattr(settings, 'PAGE_CACHE_LOCK_TIMEOUT', 10)):
+                deadline = time.time() + getattr(settings, 'PAGE_CACHE_WAIT', 2.0)
+                while time.time() < deadline:
+                    time.sleep(POLL_INTERVAL)
+                    cached = cache.get(key)
+                    if cached is not None:
+                        return _from_cache(cached)
+                return view(request, *args, **kwargs)
+
+            try:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, (response.content, response['Content-Type']),
+                              getattr(settings, 'PAGE_CACHE_TIMEOUT', 600))
+            finally:
+                cache.delete(lock)
+            return response
+        return wrapped
+    return decorator
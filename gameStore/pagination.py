@@ -0,0 +1,122 @@
+"""
+Keyset pagination for game listings.
+
+Pages are addressed by an opaque cursor holding the sort key of the last
+game on the previous page, so fetching any page is an index range read of
+one page of rows no matter how deep into the listing it is. Every ordering
+ends in the primary key to make the sort keys unique.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+ORDERINGS = {
+    'recent': ('-created', '-pk'),
+    'price': ('price', 'pk'),
+}
+DEFAULT_ORDERING = 'recent'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage(object):
+
+    def __init__(self, items, ordering, next_cursor):
+        self.items = items
+        self.ordering = ordering
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def page_size():
+    return getattr(settings, 'CATALOG_PAGE_SIZE', 24)
+
+
+def _field(order):
+    return order.lstrip('-')
+
+
+def _dump(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _load(field, value):
+    """
+    The sort key value of a cursor, or None if it is not valid for the field.
+    """
+    if field == 'created':
+        try:
+            return parse_datetime(value) if isinstance(value, str) else None
+        except ValueError:
+            return None
+    # The other sort keys, price and pk, are integers
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def encode_cursor(game, ordering):
+    values = [_dump(getattr(game, _field(order))) for order in ORDERINGS[ordering]]
+    data = json.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(ORDERINGS[ordering]):
+        raise InvalidCursor(cursor)
+    for index, order in enumerate(ORDERINGS[ordering]):
+        values[index] = _load(_field(order), values[index])
+        if values[index] is None:
+            raise InvalidCursor(cursor)
+    return values
+
+
+def _lookup(order):
+    return '{}__{}'.format(_field(order), 'lt' if order.startswith('-') else 'gt')
+
+
+def _after(ordering, values):
+    """
+    Filter selecting the rows that come after the given sort key.
+    """
+    key, tie_breaker = ORDERINGS[ordering]
+    key_value, tie_breaker_value = values
+    return (Q(**{_lookup(key): key_value}) |
+            Q(**{_field(key): key_value, _lookup(tie_breaker): tie_breaker_value}))
+
+
+def paginate(queryset, ordering=None, cursor=None, size=None):
+    """
+    One page of the queryset in the given ordering, starting after the
+    cursor. The categories of the games are fetched with one extra query.
+    Raises InvalidCursor for unknown orderings and malformed cursors.
+    """
+    ordering = ordering or DEFAULT_ORDERING
+    if ordering not in ORDERINGS:
+        raise InvalidCursor(ordering)
+    size = size or page_size()
+
+    queryset = queryset.order_by(*ORDERINGS[ordering])
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, ordering)))
+
+    items = list(queryset.prefetch_related('categories')[:size + 1])
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = encode_cursor(items[-1], ordering)
+    return KeysetPage(items, ordering, next_cursor)
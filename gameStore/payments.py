@@ -0,0 +1,133 @@
+"""
+Lifecycle of purchase transactions.
+
+A checkout creates a pending transaction, reused by repeated checkouts of
+the same game by the same user. Cart checkouts create a parent transaction
+with a line item per game, all of which share the status of the parent. The payment service result moves it to
+paid or failed exactly once, and pending transactions nobody completes
+expire after PAYMENT_PENDING_TIMEOUT seconds. Failed and expired
+transactions are deleted after PAYMENT_ABANDONED_RETENTION_DAYS.
+"""
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Game, Transaction
+
+
+def pending_timeout():
+    return timedelta(seconds=getattr(settings, 'PAYMENT_PENDING_TIMEOUT', 3600))
+
+
+def checkout(payer, game):
+    """
+    The pending transaction of the payer for the game, created if there is
+    none that is still fresh. Its price follows the current game price.
+    """
+    pending = (Transaction.objects.filter(payer=payer, game=game, status=Transaction.PENDING,
+                                          parent__isnull=True,
+                                          created_at__gte=timezone.now() - pending_timeout())
+               .order_by('-created_at').first())
+    if pending is None:
+        return Transaction.objects.create(game=game, price=game.price,
+                                          payer=payer, seller=game.developer)
+    if pending.price != game.price:
+        pending.price = game.price
+        pending.save(update_fields=['price'])
+    return pending
+
+
+def checkout_cart(payer, games):
+    """
+    A pending parent transaction for buying all the given games in one
+    payment, with a line item per game.
+    """
+    with transaction.atomic():
+        parent = Transaction.objects.create(payer=payer, price=sum(game.price for game in games))
+        Transaction.objects.bulk_create([
+            Transaction(parent=parent, game=game, price=game.price,
+                        payer=payer, seller_id=game.developer_id)
+            for game in games])
+    return parent
+
+
+def purchases(parent):
+    """
+    The transactions granting games for a paid transaction: the line items
+    of a cart checkout, or the transaction itself.
+    """
+    if parent.game_id is not None:
+        return [parent]
+    return list(parent.items.all())
+
+
+def grant_games(payer_id, game_ids):
+    """
+    Add the games to the payer's owned games with one bulk insert, skipping
+    games the payer already owns.
+    """
+    Ownership = Game.users.through
+    owned = set(Ownership.objects.filter(user_id=payer_id, game_id__in=game_ids)
+                .values_list('game_id', flat=True))
+    Ownership.objects.bulk_create([Ownership(user_id=payer_id, game_id=game_id)
+                                   for game_id in set(game_ids) - owned])
+
+
+def complete(pk, status):
+    """
+    Move a pending transaction to paid or failed. Returns whether this call
+    made the change, so repeated results are handled only once. A payment
+    that goes through after its checkout expired is still accepted.
+    """
+    sources = [Transaction.PENDING]
+    if status == Transaction.PAID:
+        sources.append(Transaction.EXPIRED)
+    with transaction.atomic():
+        if not Transaction.objects.filter(pk=pk, status__in=sources).update(status=status):
+            return False
+        Transaction.objects.filter(parent_id=pk).update(status=status)
+    return True
+
+
+def _stale_pending(batch_size):
+    cutoff = timezone.now() - pending_timeout()
+    return list(Transaction.objects.filter(status=Transaction.PENDING, created_at__lt=cutoff)
+                .order_by('created_at').values_list('pk', flat=True)[:batch_size])
+
+
+def _abandoned(batch_size):
+    days = getattr(settings, 'PAYMENT_ABANDONED_RETENTION_DAYS', 30)
+    cutoff = timezone.now() - timedelta(days=days)
+    return list(Transaction.objects
+                .filter(status__in=[Transaction.FAILED, Transaction.EXPIRED], created_at__lt=cutoff)
+                .order_by('created_at').values_list('pk', flat=True)[:batch_size])
+
+
+def reap(batch_size=500, pause=0.0, log=None):
+    """
+    Expire stale pending transactions and delete old failed and expired
+    ones, in short transactions of at most batch_size rows with an optional
+    pause in between. Returns the numbers of expired and deleted rows.
+    """
+    def run(select, apply, verb):
+        count = 0
+        ids = select(batch_size)
+        while ids:
+            with transaction.atomic():
+                done = apply(Transaction.objects.filter(pk__in=ids))
+            count += done
+            if log:
+                log(verb, done)
+            if pause:
+                time.sleep(pause)
+            ids = select(batch_size) if len(ids) == batch_size else []
+        return count
+
+    expired = run(_stale_pending,
+                  lambda rows: rows.filter(status=Transaction.PENDING).update(status=Transaction.EXPIRED),
+                  'Expired')
+    deleted = run(_abandoned, lambda rows: rows.delete()[0], 'Deleted')
+    return expired, deleted
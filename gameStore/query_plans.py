@@ -0,0 +1,150 @@
+"""
+Query plan checks of the queries the views issue.
+
+capture() requests every route of gameStore.benchmarks against seeded data
+and collects the SQL it runs. check() has the database explain each
+SELECT, UPDATE and DELETE and reports full table scans and sorts that no
+index provides, the plans that get slower as the tables grow.
+
+SQLite plans come from EXPLAIN QUERY PLAN: a SCAN of a table without an
+index and a USE TEMP B-TREE step are reported. PostgreSQL plans come from
+EXPLAIN with sequential scans and sorts disabled, so that a Seq Scan or a
+Sort node only remains where no index can replace it, however small the
+seeded tables are.
+
+Scans and sorts that are expected are listed in ALLOWED.
+"""
+from collections import OrderedDict
+import json
+import re
+
+from django.db import connection, transaction
+
+from . import benchmarks
+
+FULL_SCAN = 'Full scan'
+SORT = 'Unindexed sort'
+
+# Findings that are expected, as (problem, table, route) keys with the
+# reason. A route of None allows the finding in every route. Sorts are
+# attributed to the table the plan starts from.
+ALLOWED = {
+    (FULL_SCAN, 'gameStore_gamecategory', None): 'every category is listed on the catalog pages',
+    (FULL_SCAN, 'gameStore_cacheversion', None): 'a handful of version stamps',
+    (FULL_SCAN, 'gameStore_game', 'high_scores'): 'lists every game, cached for anonymous users',
+    (SORT, 'gameStore_game_categories', 'browse_game_category'):
+        'the games of a category are ordered by columns of the game table, cached for '
+        'anonymous users',
+    (SORT, 'gameStore_salesrollup', 'developer_dashboard'):
+        'per-game totals of one seller ordered by revenue',
+    (SORT, 'gamestore_game_search', None): 'matches are ordered by relevance',
+}
+
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+SQLITE_TABLE = re.compile(r'^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS \w+)?(.*)$')
+SQLITE_INDEXED = ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY KEY',
+                  'VIRTUAL TABLE')
+
+
+class Finding(object):
+
+    def __init__(self, problem, table, sql, routes):
+        self.problem = problem
+        self.table = table
+        self.sql = sql
+        self.routes = routes
+
+    def __str__(self):
+        return '{} of {} in {}: {}'.format(self.problem, self.table or 'the result',
+                                           ', '.join(sorted(self.routes)), self.sql)
+
+
+def capture(requests=1):
+    """
+    The SQL run by every benchmarked route, as a dict mapping statements to
+    the routes that run them.
+    """
+    statements = OrderedDict()
+    with benchmarks.session() as fixtures:
+        for name in benchmarks.ROUTES:
+            queries = []
+            benchmarks.measure(name, fixtures, requests, queries)
+            for sql in queries:
+                statements.setdefault(sql, set()).add(name)
+    return statements
+
+
+def _sqlite_problems(cursor, sql):
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+    table = None
+    for row in cursor.fetchall():
+        detail = row[-1]
+        scanned = SQLITE_TABLE.match(detail)
+        if scanned and table is None:
+            table = scanned.group(2)
+        # Sorting the rows the index yields with equal leading keys, e.g. a
+        # tie-breaker in the opposite direction, stays cheap
+        if detail.startswith(('USE TEMP B-TREE FOR ORDER BY', 'USE TEMP B-TREE FOR GROUP BY',
+                              'USE TEMP B-TREE FOR DISTINCT')):
+            yield SORT, table
+        elif scanned and scanned.group(1) == 'SCAN' and not any(
+                marker in scanned.group(3) for marker in SQLITE_INDEXED):
+            yield FULL_SCAN, scanned.group(2)
+
+
+def _postgresql_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        for node in _postgresql_nodes(child):
+            yield node
+
+
+def _postgresql_problems(cursor, sql):
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(_postgresql_nodes(plan[0]['Plan']))
+    tables = [node['Relation Name'] for node in reversed(nodes) if 'Relation Name' in node]
+    for node in nodes:
+        if node['Node Type'] == 'Seq Scan':
+            yield FULL_SCAN, node['Relation Name']
+        elif node['Node Type'] == 'Sort':
+            yield SORT, tables[-1] if tables else None
+
+
+EXPLAINERS = {
+    'sqlite': _sqlite_problems,
+    'postgresql': _postgresql_problems,
+}
+
+
+def _allowed(problem, table, routes):
+    return ((problem, table, None) in ALLOWED or
+            all((problem, table, route) in ALLOWED for route in routes))
+
+
+def check(statements):
+    """
+    Findings of the captured statements, one per problem and statement.
+    """
+    explain = EXPLAINERS.get(connection.vendor)
+    if explain is None:
+        raise ValueError('Query plans of {} are not supported'.format(connection.vendor))
+    findings = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+        for sql, routes in statements.items():
+            if not sql.lstrip().upper().startswith(EXPLAINED):
+                continue
+            seen = set()
+            for problem, table in explain(cursor, sql):
+                if _allowed(problem, table, routes) or (problem, table) in seen:
+                    continue
+                seen.add((problem, table))
+                findings.append(Finding(problem, table, sql, routes))
+        transaction.set_rollback(True)
+    return findings
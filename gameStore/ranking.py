@@ -0,0 +1,124 @@
+"""
+Player ranks.
+
+The BestScore table keeps the best score of every user per game. Players are
+ordered by score descending, ties broken by user id, and every query here
+reads a range of the (game, score, user) index instead of the scores table.
+The windows read only the rows they show, but a rank counts the index
+entries of every player above, so it costs more the lower the player is,
+up to the number of players of the game.
+
+Ranks are competition ranks: players with equal scores share a rank and the
+next distinct score skips ahead accordingly.
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import BestScore
+
+
+def record_score(game, user, score):
+    """
+    Offer a single new score as the user's best score for the game.
+    """
+    record_scores([(game.pk, user.pk, score)])
+
+
+def record_scores(scores):
+    """
+    Offer a batch of (game_id, user_id, score) tuples. Only the best score
+    of each (game, user) pair is kept.
+    """
+    best = defaultdict(lambda: None)
+    for game_id, user_id, score in scores:
+        score = int(score)
+        key = (game_id, user_id)
+        if best[key] is None or score > best[key]:
+            best[key] = score
+
+    for (game_id, user_id), score in best.items():
+        improved = BestScore.objects.filter(game_id=game_id, user_id=user_id,
+                                            score__lt=score).update(score=score)
+        if not improved:
+            BestScore.objects.get_or_create(game_id=game_id, user_id=user_id,
+                                            defaults={'score': score})
+
+
+def _above(best):
+    return (Q(score__gt=best.score) |
+            Q(score=best.score, user_id__lt=best.user_id))
+
+
+def _below(best):
+    return (Q(score__lt=best.score) |
+            Q(score=best.score, user_id__gt=best.user_id))
+
+
+def rank_of(best):
+    """
+    Competition rank of a BestScore row within its game, counted from the
+    index entries of the better scores.
+    """
+    return BestScore.objects.filter(game_id=best.game_id, score__gt=best.score).count() + 1
+
+
+def _best(scores):
+    # (game, user) is unique, an ordering to pick the first row would only
+    # add a sort
+    rows = list(scores[:1])
+    return rows[0] if rows else None
+
+
+def rank(game, user):
+    """
+    Rank and best score of the user in the game as a (rank, score) tuple,
+    or None if the user has no score in the game.
+    """
+    best = _best(BestScore.objects.filter(game=game, user=user))
+    if best is None:
+        return None
+    return rank_of(best), best.score
+
+
+def window_around(best, radius):
+    """
+    The BestScore rows within radius places of the given row, best first,
+    as a list of (rank, row) tuples.
+    """
+    scores = BestScore.objects.filter(game_id=best.game_id).select_related('user')
+    above = list(scores.filter(_above(best)).order_by('score', '-user_id')[:radius])
+    below = list(scores.filter(_below(best)).order_by('-score', 'user_id')[:radius])
+    rows = list(reversed(above)) + [best] + below
+
+    # Only the first row needs a count, the rest follow from their position
+    first = rows[0]
+    position = scores.filter(_above(first)).count() + 1
+    current_rank = rank_of(first)
+    window = []
+    for offset, row in enumerate(rows):
+        if offset and row.score != rows[offset - 1].score:
+            current_rank = position + offset
+        window.append((current_rank, row))
+    return window
+
+
+def window_around_user(game, user, radius):
+    best = _best(BestScore.objects.filter(game=game, user=user).select_related('user'))
+    if best is None:
+        return []
+    return window_around(best, radius)
+
+
+def window_around_rank(game, position, radius):
+    """
+    The window around the player at the given position of the ordering.
+    Seeking to the position walks that many entries of the index, so this
+    is meant for the first few pages of the ranking.
+    """
+    scores = BestScore.objects.filter(game=game).select_related('user')
+    position = max(position, 1)
+    best = list(scores.order_by('-score', 'user_id')[position - 1:position])
+    if not best:
+        return []
+    return window_around(best[0], radius)
@@ -0,0 +1,115 @@
+"""
+Read replicas of the default database.
+
+Views decorated with replica_reads read from one of the aliases listed in
+DATABASE_REPLICAS, picked at random for each request. Everything else,
+writes included, uses the default database. Sessions and the database
+cache always use the default database too, as they are read right after
+being written.
+
+A replica may lag behind, so a client that wrote anything reads from the
+default database for the next REPLICA_STICKY_SECONDS: the ReplicaRouter
+notes every write of a request, and ReplicaMiddleware then sets the
+PIN_COOKIE on the response. The same request reads from the default
+database from its first write on.
+
+To try it locally with two SQLite files, copy db.sqlite3 and point
+SQLITE_REPLICA at the copy. Copying it again catches the replica up.
+"""
+from functools import wraps
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'gamestore_primary'
+
+# Apps whose tables are always read from the default database
+PRIMARY_ONLY = ('sessions', 'django_cache')
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+_local = threading.local()
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def start():
+    """
+    Forget the writes of the previous request of the thread.
+    """
+    _local.wrote = False
+    _local.replica = None
+
+
+def written():
+    """
+    Note a write of the current request. Called by the router, and by
+    views whose writes happen later in the background.
+    """
+    _local.wrote = True
+
+
+def pin(response):
+    """
+    Make the client read from the default database for a while if the
+    current request wrote anything.
+    """
+    if getattr(_local, 'wrote', False) and replicas():
+        response.set_cookie(PIN_COOKIE, '1', httponly=True,
+                            max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+    return response
+
+
+def pinned(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+def replica_reads(view):
+    """
+    Let a read-only view read from a replica, unless the client has
+    written recently.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        aliases = replicas()
+        if not aliases or request.method not in SAFE_METHODS or pinned(request):
+            return view(request, *args, **kwargs)
+        _local.replica = random.choice(aliases)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.replica = None
+    return wrapped
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        if (model._meta.app_label in PRIMARY_ONLY or getattr(_local, 'wrote', False) or
+                getattr(_local, 'replica', None) is None):
+            return DEFAULT_DB_ALIAS
+        return _local.replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_ONLY:
+            written()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = [DEFAULT_DB_ALIAS] + replicas()
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware(object):
+
+    def process_request(self, request):
+        start()
+
+    def process_response(self, request, response):
+        return pin(response)
@@ -0,0 +1,109 @@
+"""
+In-process cache of game metadata for the gameplay endpoints.
+
+The gameplay messages identify games by name, so every score, save and load
+used to look the game up by name. The resolver keeps the most recently used
+games in an LRU cache keyed by name and URL.
+
+Edits in this process clear the cache through model signals. Other
+processes notice the change through the catalog version stamp, which is
+checked at most every GAME_RESOLVER_VERSION_CHECK seconds.
+"""
+from collections import OrderedDict, namedtuple
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Game
+from . import metrics, versions
+
+VERSION_NAME = versions.CATALOG
+
+CachedGame = namedtuple('CachedGame', ['pk', 'name', 'URL', 'price', 'developer_id', 'categories'])
+
+
+class GameResolver(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._checked = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self):
+        return getattr(settings, 'GAME_RESOLVER_SIZE', 512)
+
+    @property
+    def check_interval(self):
+        return getattr(settings, 'GAME_RESOLVER_VERSION_CHECK', 1.0)
+
+    def by_name(self, name):
+        """
+        The game with the given name, or None. If several games share the
+        name the oldest one is used.
+        """
+        return self._resolve(('name', name), {'name': name})
+
+    def by_url(self, url):
+        """
+        The game with the given URL, or None.
+        """
+        return self._resolve(('URL', url), {'URL': url})
+
+    def _resolve(self, key, lookup):
+        self._check_version()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        game = (Game.objects.filter(**lookup).order_by('pk')
+                .prefetch_related('categories').first())
+        if game is None:
+            return None
+
+        cached = CachedGame(game.pk, game.name, game.URL, game.price, game.developer_id,
+                            tuple(category.name for category in game.categories.all()))
+        with self._lock:
+            self._entries[key] = cached
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return cached
+
+    def _check_version(self):
+        now = time.time()
+        if now - self._checked < self.check_interval:
+            return
+        version = versions.get(VERSION_NAME)
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._checked = now
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._checked = 0
+
+    def invalidate(self):
+        """
+        Drop the cache of this process and tell the other processes to drop
+        theirs.
+        """
+        self.clear()
+        versions.bump(VERSION_NAME)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+games = GameResolver()
+metrics.register('game_resolver', games.stats, 'Game metadata cache of the worker')
@@ -0,0 +1,38 @@
+"""
+Roles of the current user, resolved at most once per request.
+
+RolesMiddleware sets request.roles to a lazy Roles set of the user's group
+names. Anonymous users never cause a query.
+"""
+from django.utils.functional import SimpleLazyObject
+
+DEVELOPER = 'Developer'
+
+
+class Roles(frozenset):
+
+    @property
+    def is_developer(self):
+        return DEVELOPER in self
+
+    @classmethod
+    def for_user(cls, user):
+        if not user.is_authenticated():
+            return cls()
+        return cls(user.groups.values_list('name', flat=True))
+
+
+class RolesMiddleware(object):
+    """
+    Must come after AuthenticationMiddleware.
+    """
+
+    def process_request(self, request):
+        request.roles = SimpleLazyObject(lambda: Roles.for_user(request.user))
+
+
+def roles(request):
+    """
+    Context processor exposing request.roles to templates as roles.
+    """
+    return {'roles': getattr(request, 'roles', Roles())}
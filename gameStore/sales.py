@@ -0,0 +1,100 @@
+"""
+Per-game, per-day sales rollups for the developer dashboard.
+
+Every completed purchase increments the SalesRollup row of its game and
+day, so the dashboard reads one row per game and day instead of every
+transaction a developer has ever had.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import SalesRollup, Transaction
+
+
+def _day(moment):
+    return timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+
+
+def record_sale(sale):
+    """
+    Add a completed transaction to the rollup of its game and day.
+    """
+    day = _day(sale.created_at)
+    rollups = SalesRollup.objects.filter(game_id=sale.game_id, day=day)
+    increment = {'count': F('count') + 1, 'revenue': F('revenue') + sale.price}
+    if rollups.update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            SalesRollup.objects.create(game_id=sale.game_id, seller_id=sale.seller_id,
+                                       day=day, count=1, revenue=sale.price)
+    except IntegrityError:
+        # Another purchase of the game created the row first
+        rollups.update(**increment)
+
+
+def completed_transactions():
+    # Parents of cart checkouts are counted through their line items
+    return Transaction.objects.filter(status=Transaction.PAID, game__isnull=False)
+
+
+def rebuild(batch_size=1000):
+    """
+    Recompute all rollups from the completed transactions.
+    """
+    totals = {}
+    last_pk = 0
+    while True:
+        batch = list(completed_transactions().filter(pk__gt=last_pk).order_by('pk')
+                     .values_list('pk', 'game_id', 'seller_id', 'created_at', 'price')[:batch_size])
+        if not batch:
+            break
+        for pk, game_id, seller_id, created_at, price in batch:
+            key = (game_id, _day(created_at))
+            count, revenue, _ = totals.get(key, (0, 0, seller_id))
+            totals[key] = (count + 1, revenue + price, seller_id)
+        last_pk = batch[-1][0]
+
+    with transaction.atomic():
+        SalesRollup.objects.all().delete()
+        SalesRollup.objects.bulk_create([
+            SalesRollup(game_id=game_id, day=day, seller_id=seller_id,
+                        count=count, revenue=revenue)
+            for (game_id, day), (count, revenue, seller_id) in totals.items()])
+    return len(totals)
+
+
+def totals(seller):
+    """
+    Number of sales and total revenue of a developer.
+    """
+    result = SalesRollup.objects.filter(seller=seller).aggregate(count=Sum('count'),
+                                                                 revenue=Sum('revenue'))
+    return {'count': result['count'] or 0, 'revenue': result['revenue'] or 0}
+
+
+def by_game(seller):
+    """
+    Sales and revenue of each of the developer's games, best selling first.
+    """
+    return (SalesRollup.objects.filter(seller=seller).values('game_id', 'game__name')
+            .annotate(count=Sum('count'), revenue=Sum('revenue')).order_by('-revenue', 'game_id'))
+
+
+def daily(seller, days=30):
+    """
+    Sales and revenue of the developer on each of the last days, oldest
+    first, with zeros for days without sales.
+    """
+    today = _day(timezone.now())
+    first = today - timedelta(days=days - 1)
+    rows = (SalesRollup.objects.filter(seller=seller, day__gte=first).values('day')
+            .annotate(count=Sum('count'), revenue=Sum('revenue')))
+    by_day = {row['day']: row for row in rows}
+    return [{'day': day,
+             'count': by_day[day]['count'] if day in by_day else 0,
+             'revenue': by_day[day]['revenue'] if day in by_day else 0}
+            for day in (first + timedelta(days=offset) for offset in range(days))]
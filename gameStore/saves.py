@@ -0,0 +1,152 @@
+"""
+Saved game states.
+
+Every save is appended to the Save table and also written to the user's
+SaveSlot for the game, so loading the latest state is a single unique key
+lookup. States are stored compressed, see gameStore.state_storage.
+Older Save rows are pruned according to the retention settings:
+
+SAVE_RETENTION_KEEP_LAST keeps only the newest K saves of each user per game.
+SAVE_RETENTION_DAYS drops saves older than N days.
+
+Either policy is disabled by setting it to None. The state in the slot is
+never pruned.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Save, SaveSlot
+from . import state_storage
+
+
+def store(saves):
+    """
+    Store a batch of (game_id, user_id, game_state) tuples in one transaction
+    and point the slots of the affected users at the newest states.
+    """
+    encoded = [(game_id, user_id, state_storage.encode(game_state))
+               for game_id, user_id, game_state in saves]
+    latest = {}
+    for game_id, user_id, state in encoded:
+        latest[(game_id, user_id)] = state
+
+    with transaction.atomic():
+        Save.objects.bulk_create([
+            Save(game_id=game_id, user_id=user_id, state=state)
+            for game_id, user_id, state in encoded])
+        for (game_id, user_id), state in latest.items():
+            _update_slot(game_id, user_id, state)
+
+
+def _update_slot(game_id, user_id, state):
+    updated = SaveSlot.objects.filter(game_id=game_id, user_id=user_id).update(
+        state=state, updated_at=timezone.now())
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            SaveSlot.objects.create(game_id=game_id, user_id=user_id, state=state)
+    except IntegrityError:
+        # Another request created the slot in between
+        SaveSlot.objects.filter(game_id=game_id, user_id=user_id).update(
+            state=state, updated_at=timezone.now())
+
+
+def latest_blob(user, game):
+    """
+    The latest stored state of the user in the game in its stored,
+    compressed form, or None.
+    """
+    return (SaveSlot.objects.filter(user_id=user.pk, game_id=game.pk)
+            .values_list('state', flat=True).first())
+
+
+def latest_state(user, game):
+    """
+    The latest saved state of the user in the game, or None.
+    """
+    blob = latest_blob(user, game)
+    if blob is None:
+        return None
+    return state_storage.decode(blob)
+
+
+def expired_by_age(batch_size):
+    """
+    Ids of at most batch_size saves older than SAVE_RETENTION_DAYS.
+    """
+    days = getattr(settings, 'SAVE_RETENTION_DAYS', None)
+    if days is None:
+        return []
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    return list(Save.objects.filter(created_at__lt=cutoff).order_by('created_at')
+                .values_list('pk', flat=True)[:batch_size])
+
+
+def expired_by_count(user_id, game_id, batch_size):
+    """
+    Ids of at most batch_size saves of a user in a game that fall outside
+    the newest SAVE_RETENTION_KEEP_LAST ones.
+    """
+    keep = getattr(settings, 'SAVE_RETENTION_KEEP_LAST', None)
+    if keep is None:
+        return []
+    return list(Save.objects.filter(user_id=user_id, game_id=game_id)
+                .order_by('-created_at', '-pk')
+                .values_list('pk', flat=True)[keep:keep + batch_size])
+
+
+def _delete(ids):
+    with transaction.atomic():
+        return Save.objects.filter(pk__in=ids).delete()[0]
+
+
+def compact(batch_size=500, pause=0.0, log=None):
+    """
+    Delete the saves that fall outside the retention policy. Rows are
+    deleted in short transactions of at most batch_size rows, with an
+    optional pause in between, so writers are never blocked for long.
+    Returns the number of deleted saves.
+    """
+    deleted = 0
+
+    def delete_batch(ids):
+        count = _delete(ids)
+        if log:
+            log(count)
+        if pause:
+            time.sleep(pause)
+        return count
+
+    ids = expired_by_age(batch_size)
+    while ids:
+        deleted += delete_batch(ids)
+        ids = expired_by_age(batch_size)
+
+    # Walk the slots with a keyset so every (user, game) pair is seen once
+    last_pk = 0
+    while True:
+        slots = list(SaveSlot.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .values_list('pk', 'user_id', 'game_id')[:batch_size])
+        if not slots:
+            break
+        last_pk = slots[-1][0]
+
+        ids = []
+        for pk, user_id, game_id in slots:
+            expired = expired_by_count(user_id, game_id, batch_size)
+            while len(expired) == batch_size:
+                deleted += delete_batch(expired)
+                expired = expired_by_count(user_id, game_id, batch_size)
+            ids.extend(expired)
+            if len(ids) >= batch_size:
+                deleted += delete_batch(ids)
+                ids = []
+        if ids:
+            deleted += delete_batch(ids)
+
+    return deleted
@@ -0,0 +1,134 @@
+"""
+Full-text search over game names, descriptions and category names.
+
+Games are indexed in a separate search table maintained by signal receivers
+whenever a game, its categories or a category change:
+
+SQLite uses an FTS5 virtual table with the game id as rowid, ranked with
+bm25. PostgreSQL uses a table of weighted tsvector documents with a GIN
+index, ranked with ts_rank. Other databases fall back to icontains lookups.
+
+Every word of a query has to match, the last characters of a word may be
+left out (prefix matching). Matches in the name weigh the most, then
+categories, then the description.
+"""
+import re
+
+from django.db import connection, connections, router, transaction
+from django.db.models import Q
+
+from .models import Game
+
+TABLE = 'gamestore_game_search'
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def terms(query):
+    return [term.lower() for term in WORD.findall(query or '')][:10]
+
+
+class SQLiteSearch(object):
+
+    def index(self, cursor, game_id, name, categories, description):
+        cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(TABLE), [game_id])
+        cursor.execute('INSERT INTO {} (rowid, name, categories, description) '
+                       'VALUES (%s, %s, %s, %s)'.format(TABLE),
+                       [game_id, name, categories, description])
+
+    def remove(self, cursor, game_id):
+        cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(TABLE), [game_id])
+
+    def search(self, cursor, words, limit):
+        match = ' '.join('"{}"*'.format(word) for word in words)
+        cursor.execute('SELECT rowid FROM {0} WHERE {0} MATCH %s '
+                       'ORDER BY bm25({0}, 10.0, 5.0, 1.0) LIMIT %s'.format(TABLE),
+                       [match, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLSearch(object):
+
+    def index(self, cursor, game_id, name, categories, description):
+        cursor.execute('DELETE FROM {} WHERE game_id = %s'.format(TABLE), [game_id])
+        cursor.execute(
+            "INSERT INTO {} (game_id, document) VALUES (%s, "
+            "setweight(to_tsvector('simple', %s), 'A') || "
+            "setweight(to_tsvector('simple', %s), 'B') || "
+            "setweight(to_tsvector('simple', %s), 'C'))".format(TABLE),
+            [game_id, name, categories, description])
+
+    def remove(self, cursor, game_id):
+        cursor.execute('DELETE FROM {} WHERE game_id = %s'.format(TABLE), [game_id])
+
+    def search(self, cursor, words, limit):
+        query = ' & '.join('{}:*'.format(word) for word in words)
+        cursor.execute(
+            "SELECT game_id FROM {}, to_tsquery('simple', %s) query "
+            "WHERE document @@ query ORDER BY ts_rank(document, query) DESC, game_id "
+            "LIMIT %s".format(TABLE), [query, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class FallbackSearch(object):
+    """
+    Unindexed search for databases without a full-text backend.
+    """
+
+    def index(self, cursor, game_id, name, categories, description):
+        pass
+
+    def remove(self, cursor, game_id):
+        pass
+
+    def search(self, cursor, words, limit):
+        games = Game.objects.all()
+        for word in words:
+            games = games.filter(Q(name__icontains=word) | Q(description__icontains=word) |
+                                 Q(categories__name__icontains=word))
+        return list(games.distinct().order_by('name').values_list('pk', flat=True)[:limit])
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearch(),
+    'postgresql': PostgreSQLSearch(),
+}
+
+
+def backend(vendor=None):
+    return BACKENDS.get(vendor or connection.vendor, FallbackSearch())
+
+
+def index_games(games):
+    """
+    Add a queryset of games to the search index, replacing their old entries.
+    """
+    search_backend = backend()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for game in games.prefetch_related('categories'):
+            categories = ' '.join(category.name for category in game.categories.all())
+            search_backend.index(cursor, game.pk, game.name, categories, game.description)
+
+
+def index_game(game):
+    index_games(Game.objects.filter(pk=game.pk))
+
+
+def remove_game(game_id):
+    with connection.cursor() as cursor:
+        backend().remove(cursor, game_id)
+
+
+def search(query, limit=20):
+    """
+    Games matching the query, best match first.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    # A replica in the views reading from one
+    database = connections[router.db_for_read(Game)]
+    with database.cursor() as cursor:
+        ids = backend(database.vendor).search(cursor, words, limit)
+    games = Game.objects.in_bulk(ids)
+    return [games[pk] for pk in ids if pk in games]
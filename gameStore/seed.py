@@ -0,0 +1,258 @@
+"""
+Synthetic data for load testing, written by the seed_data command.
+
+Generates developers and players, games spread over categories, paid and
+abandoned transactions with the ownerships they grant, high scores and
+saves, all at a chosen scale. Rows are written with bulk inserts and their
+timestamps are spread over the past SEED_DAYS days. The derived tables (best
+scores, leaderboards, save slots, sales rollups and the search index) are
+rebuilt afterwards, as the bulk inserts skip the code maintaining them.
+
+Seeded users are named with SEED_PREFIX, which is how clear() finds the
+seeded data again.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+import json
+import random
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import leaderboard, roles, sales, search, state_storage, versions
+from .models import (BestScore, Game, GameCategory, HighScore, LeaderboardEntry,
+                     LeaderboardEvent, SalesRollup, Save, SaveSlot, Transaction)
+
+SEED_PREFIX = 'seed-'
+SEED_DAYS = 365
+
+# Row counts at scale 1, about 150 000 rows. Scale 50 writes millions.
+COUNTS = OrderedDict([
+    ('developers', 20),
+    ('players', 1000),
+    ('games', 200),
+    ('transactions', 20000),
+    ('scores', 100000),
+    ('saves', 10000),
+])
+
+CATEGORIES = ['action', 'adventure', 'arcade', 'casual', 'horror', 'platformer',
+              'puzzle', 'racing', 'rhythm', 'sandbox', 'shooter', 'simulation',
+              'sports', 'stealth', 'strategy']
+ADJECTIVES = ['Ancient', 'Crimson', 'Endless', 'Frozen', 'Galactic', 'Hidden',
+              'Iron', 'Lost', 'Neon', 'Silent', 'Tiny', 'Wild']
+NOUNS = ['Castle', 'Dungeon', 'Empire', 'Garden', 'Harbor', 'Kingdom', 'Legend',
+         'Maze', 'Orbit', 'Quest', 'Rally', 'Tower']
+
+# Share of the transactions that were paid, the rest failed or expired
+PAID_SHARE = 0.8
+
+
+def counts(scale=1.0, **overrides):
+    """
+    Row counts of every kind at the given scale, with explicit overrides.
+    """
+    result = OrderedDict((name, max(1, int(count * scale))) for name, count in COUNTS.items())
+    result.update((name, value) for name, value in overrides.items() if value is not None)
+    return result
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """
+    Let bulk inserts set auto_now_add fields, so seeded rows can be dated
+    in the past.
+    """
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+def _field(model, name):
+    return model._meta.get_field(name)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Seeder(object):
+
+    def __init__(self, counts, batch_size=5000, seed=None, log=None):
+        self.counts = counts
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def moment(self):
+        return self.now - timedelta(seconds=self.random.randint(0, SEED_DAYS * 24 * 3600))
+
+    def insert(self, model, rows):
+        written = 0
+        for batch in _batches(rows, self.batch_size):
+            model.objects.bulk_create(batch)
+            written += len(batch)
+        self.log('Wrote {} {} rows'.format(written, model.__name__))
+        return written
+
+    def run(self):
+        with transaction.atomic(), explicit_dates(_field(Game, 'created'),
+                                                  _field(Transaction, 'created_at'),
+                                                  _field(Save, 'created_at')):
+            self.users()
+            self.games()
+            self.transactions()
+            self.scores()
+            self.saves()
+        self.derived()
+
+    def users(self):
+        developers = self.counts['developers']
+        players = self.counts['players']
+        # One unusable password for every user keeps seeding fast
+        template = User()
+        template.set_unusable_password()
+        password = template.password
+        self.insert(User, (
+            User(username='{}developer-{}'.format(SEED_PREFIX, n), password=password,
+                 email='developer-{}@example.com'.format(n))
+            for n in range(developers)))
+        self.insert(User, (
+            User(username='{}player-{}'.format(SEED_PREFIX, n), password=password,
+                 email='player-{}@example.com'.format(n))
+            for n in range(players)))
+        self.developer_ids = list(User.objects.filter(
+            username__startswith=SEED_PREFIX + 'developer-').values_list('pk', flat=True))
+        self.player_ids = list(User.objects.filter(
+            username__startswith=SEED_PREFIX + 'player-').values_list('pk', flat=True))
+
+        group, _ = Group.objects.get_or_create(name=roles.DEVELOPER)
+        self.insert(User.groups.through, (
+            User.groups.through(user_id=user_id, group_id=group.pk)
+            for user_id in self.developer_ids))
+
+    def games(self):
+        category_ids = [GameCategory.objects.get_or_create(name=name)[0].pk for name in CATEGORIES]
+        first = (Game.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        self.insert(Game, (
+            Game(name='{} {} {}'.format(self.random.choice(ADJECTIVES),
+                                        self.random.choice(NOUNS), first + n),
+                 price=self.random.choice([0, 1, 2, 5, 10, 15, 20, 30, 50]),
+                 URL='http://webcourse.cs.hut.fi/example_game.html',
+                 description='A seeded {} game.'.format(self.random.choice(CATEGORIES)),
+                 developer_id=self.random.choice(self.developer_ids), created=self.moment())
+            for n in range(self.counts['games'])))
+        games = Game.objects.filter(developer_id__in=self.developer_ids)
+        self.games_by_id = dict(games.values_list('pk', 'developer_id'))
+        self.prices = dict(games.values_list('pk', 'price'))
+        self.game_ids = sorted(self.games_by_id)
+
+        self.insert(Game.categories.through, (
+            Game.categories.through(game_id=game_id, gamecategory_id=category_id)
+            for game_id in self.game_ids
+            for category_id in self.random.sample(category_ids, self.random.randint(1, 3))))
+
+    def transactions(self):
+        total = self.counts['transactions']
+        paid = min(max(1, int(total * PAID_SHARE)), len(self.player_ids) * len(self.game_ids))
+        owned = set()
+        while len(owned) < paid:
+            owned.add((self.random.choice(self.player_ids), self.random.choice(self.game_ids)))
+        self.owned = sorted(owned)
+
+        def rows():
+            for player_id, game_id in self.owned:
+                yield Transaction(status=Transaction.PAID, price=self.prices[game_id],
+                                  game_id=game_id, payer_id=player_id,
+                                  seller_id=self.games_by_id[game_id], created_at=self.moment())
+            for _ in range(total - paid):
+                game_id = self.random.choice(self.game_ids)
+                yield Transaction(status=self.random.choice([Transaction.FAILED, Transaction.EXPIRED]),
+                                  price=self.prices[game_id], game_id=game_id,
+                                  payer_id=self.random.choice(self.player_ids),
+                                  seller_id=self.games_by_id[game_id], created_at=self.moment())
+
+        self.insert(Transaction, rows())
+        self.insert(Game.users.through, (
+            Game.users.through(game_id=game_id, user_id=player_id)
+            for player_id, game_id in self.owned))
+
+    def scores(self):
+        self.insert(HighScore, (
+            HighScore(score=int(self.random.paretovariate(1.5) * 100), user_id=player_id,
+                      game_id=game_id)
+            for player_id, game_id in (self.random.choice(self.owned)
+                                       for _ in range(self.counts['scores']))))
+
+    def saves(self):
+        states = [state_storage.encode(json.dumps({'level': level, 'items': ['coin'] * level}))
+                  for level in range(1, 11)]
+        latest = {}
+
+        def rows():
+            created = sorted(self.moment() for _ in range(self.counts['saves']))
+            for created_at in created:
+                player_id, game_id = self.random.choice(self.owned)
+                state = self.random.choice(states)
+                latest[player_id, game_id] = state
+                yield Save(user_id=player_id, game_id=game_id, state=state, created_at=created_at)
+
+        self.insert(Save, rows())
+        self.insert(SaveSlot, (SaveSlot(user_id=user_id, game_id=game_id, state=state)
+                               for (user_id, game_id), state in latest.items()))
+
+    def derived(self):
+        best = (HighScore.objects.filter(game_id__in=self.game_ids)
+                .values('game_id', 'user_id').annotate(best=Max('score')).order_by())
+        self.insert(BestScore, (BestScore(game_id=row['game_id'], user_id=row['user_id'],
+                                          score=row['best'])
+                                for row in best.iterator()))
+        games = Game.objects.filter(pk__in=self.game_ids)
+        leaderboard.rebuild(games)
+        self.log('Rebuilt leaderboards')
+        self.log('Rebuilt {} sales rollups'.format(sales.rebuild()))
+        search.index_games(games)
+        self.log('Indexed {} games for search'.format(len(self.game_ids)))
+        versions.bump(versions.CATALOG)
+        versions.bump(versions.LEADERBOARDS)
+
+
+def seed(counts, batch_size=5000, seed=None, log=None):
+    Seeder(counts, batch_size, seed, log).run()
+
+
+def clear(log=None):
+    """
+    Delete the seeded users and everything that belongs to them.
+    """
+    log = log or (lambda message: None)
+    users = User.objects.filter(username__startswith=SEED_PREFIX)
+    games = Game.objects.filter(developer__in=users)
+    # Tables without dependents are deleted with one query each
+    for model in [HighScore, BestScore, LeaderboardEntry, LeaderboardEvent, Save, SaveSlot,
+                  SalesRollup]:
+        deleted, _ = model.objects.filter(game__in=games).delete()
+        log('Deleted {} {} rows'.format(deleted, model.__name__))
+    Transaction.objects.filter(payer__in=users, parent__isnull=False).delete()
+    Transaction.objects.filter(payer__in=users).delete()
+    for game in games:
+        game.delete()
+    deleted, _ = users.delete()
+    log('Deleted {} remaining rows'.format(deleted))
+    sales.rebuild()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/1.9/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,12 +51,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    'gameStore.metrics.MetricsMiddleware',
+    'gameStore.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
+    'gameStore.roles.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,7 +68,7 @@ ROOT_URLCONF = 'gameStore.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'gameStore.metrics.InstrumentedTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -73,6 +77,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'gameStore.roles.roles',
             ],
         },
     },
@@ -89,13 +94,59 @@ WSGI_APPLICATION = 'gameStore.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/1.9/ref/settings/#databases
 
+# Threads of gameStore.asgi for the database work of the gameplay endpoints
+# and for the requests passed to the WSGI application.
+ASGI_THREADS = 8
+ASGI_WSGI_THREADS = 8
+
+# Connections are taken from a pool of at most MAX_SIZE per process and given
+# back at the end of every request (see gameStore.db.pool); POOL = None opens
+# a connection per request, or keeps one per thread for CONN_MAX_AGE seconds.
+# A thread holds one connection at a time, so MAX_SIZE is the number of
+# threads of a process using the database: those of gameStore.asgi (a sync
+# worker has one), plus the score flush timer and the live leaderboard
+# poller. Live streams hold no connection while they wait. A request finding
+# every connection in use waits up to TIMEOUT seconds for one.
+# SQLite runs in WAL mode, so readers do not block the writer, and waits up
+# to 20 seconds for a lock instead of failing with "database is locked".
+DATABASE_POOL = {
+    'MAX_SIZE': ASGI_THREADS + ASGI_WSGI_THREADS + 2,
+    'TIMEOUT': 10,
+    'MAX_IDLE': 300,
+    'MAX_AGE': 3600,
+    'CHECK_AFTER': 30,
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'gameStore.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'temp_store': 'MEMORY',
+            'cache_size': -16000,
+        },
+        'POOL': DATABASE_POOL,
     }
 }
 
+# Read replicas of the default database, used by the views decorated with
+# gameStore.replicas.replica_reads. A client that wrote anything reads from
+# the default database for the next REPLICA_STICKY_SECONDS, so it sees its
+# own writes. Set SQLITE_REPLICA to a copy of db.sqlite3 to try it locally.
+DATABASE_ROUTERS = ['gameStore.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_STICKY_SECONDS = 10
+
+if os.environ.get('SQLITE_REPLICA'):
+    DATABASES['replica'] = dict(DATABASES['default'], NAME=os.environ['SQLITE_REPLICA'],
+                                TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS = ['replica']
+
 
 
 # Password validation
@@ -145,9 +196,106 @@ LOGOUT_REDIRECT_URL = '/'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Queued emails are sent by the send_queued_mail command. A failed email is
+# retried after MAIL_OUTBOX_RETRY_DELAY seconds, doubled on every attempt.
+MAIL_OUTBOX_MAX_ATTEMPTS = 5
+MAIL_OUTBOX_RETRY_DELAY = 60
+MAIL_OUTBOX_LEASE = 300
+
+# Days an expired sign-up is kept before purge_expired_signups deletes it.
+SIGNUP_PURGE_GRACE_DAYS = 0
+
+# How many top scores are kept per game for the high score listings.
+LEADERBOARD_SIZE = 25
+
+# Scores are written in batches of INGEST_BATCH_SIZE, or once the oldest
+# queued score is INGEST_FLUSH_INTERVAL seconds old. An interval of 0 writes
+# every score right away.
+INGEST_BATCH_SIZE = 200
+INGEST_FLUSH_INTERVAL = 2.0
+INGEST_MAX_EVENTS = 500
+# Failed flushes after which a batch of scores is dropped.
+INGEST_MAX_ATTEMPTS = 5
+
+# Retention of old saves, applied by the compact_saves command. The latest
+# save of every user in every game is always kept.
+SAVE_RETENTION_KEEP_LAST = 10
+SAVE_RETENTION_DAYS = 90
+
+# Largest accepted game state, in bytes before compression.
+SAVE_STATE_MAX_BYTES = 1024 * 1024
+
+# Games cached per process by the gameplay endpoints, and how often in
+# seconds the cache checks whether another process has changed a game.
+GAME_RESOLVER_SIZE = 512
+GAME_RESOLVER_VERSION_CHECK = 1.0
+
+# Seconds the owned and developed games of a user are cached in the session.
+OWNERSHIP_SESSION_TTL = 300
+
+# Anonymous catalog pages are cached in the database so that every worker
+# shares them. PAGE_CACHE_WAIT is how long a request waits for another
+# worker that is already rendering the same page.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'gamestore_page_cache',
+    },
+}
+PAGE_CACHE_ALIAS = 'pages'
+PAGE_CACHE_TIMEOUT = 600
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_WAIT = 2.0
+
+# Games per page of the catalog listings.
+CATALOG_PAGE_SIZE = 24
+
+# Seconds a checkout stays pending before reap_transactions expires it, and
+# days failed and expired transactions are kept before they are deleted.
+PAYMENT_PENDING_TIMEOUT = 3600
+PAYMENT_ABANDONED_RETENTION_DAYS = 30
+
+# Largest request body gameStore.asgi reads for the WSGI application.
+ASGI_MAX_BODY_SIZE = 10 * 1024 * 1024
+
+# Live leaderboards: how often each worker polls for new leaderboard events,
+# how long events are kept, and the heartbeat and length of a stream.
+LIVE_POLL_INTERVAL = 0.5
+LIVE_EVENT_RETENTION = 3600
+LIVE_HEARTBEAT = 15
+LIVE_STREAM_DURATION = 300
+# How often each worker deletes the events older than the retention. None
+# deletes them only through leaderboard.prune_events(force=True).
+LIVE_PRUNE_INTERVAL = 60
+# Whether pages subscribe to live leaderboards. None subscribes only when
+# gameStore.asgi serves the site, as a stream holds a sync WSGI worker.
+LIVE_UPDATES = None
+
+# Transactions read per query by the streaming sales exports.
+EXPORT_CHUNK_SIZE = 1000
+
+# Request metrics: every worker writes its histograms to a file in
+# METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds, and /metrics/
+# merges them. Besides staff users, requests with the header
+# "Authorization: Bearer <METRICS_TOKEN>" may read the metrics.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'gamestore-metrics'))
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 if "DYNO" in os.environ:
     import dj_database_url
-    DATABASES['default'] =  dj_database_url.config()
+    DATABASES['default'] =  dj_database_url.config(engine='gameStore.db.backends.postgresql')
+    DATABASES['default']['POOL'] = DATABASE_POOL
+    # Follower databases, as space separated URLs
+    DATABASE_REPLICAS = []
+    for n, url in enumerate(os.environ.get('REPLICA_DATABASE_URLS', '').split()):
+        alias = 'replica{}'.format(n)
+        DATABASES[alias] = dj_database_url.parse(url, engine='gameStore.db.backends.postgresql')
+        DATABASES[alias].update(POOL=DATABASE_POOL, TEST={'MIRROR': 'default'})
+        DATABASE_REPLICAS.append(alias)
 
     DEBUG = True # False, once service is succesfully deployed
     ALLOWED_HOSTS = ['*']
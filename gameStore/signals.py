@@ -0,0 +1,63 @@
+"""
+Signal receivers keeping the caches and the search index in sync with the
+models. Connected in GameStoreConfig.ready.
+"""
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Game, GameCategory
+from . import resolver, search
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+@receiver(post_save, sender=GameCategory)
+@receiver(post_delete, sender=GameCategory)
+def game_changed(sender, **kwargs):
+    resolver.games.invalidate()
+
+
+@receiver(m2m_changed, sender=Game.categories.through)
+def game_categories_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        resolver.games.invalidate()
+
+
+@receiver(post_save, sender=Game)
+def index_game(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_game(instance)
+
+
+@receiver(post_delete, sender=Game)
+def unindex_game(sender, instance, **kwargs):
+    search.remove_game(instance.pk)
+
+
+@receiver(m2m_changed, sender=Game.categories.through)
+def reindex_game_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.index_game(instance)
+    elif action == 'pre_clear':
+        instance._search_game_ids = list(instance.games.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        search.index_games(Game.objects.filter(pk__in=pk_set))
+    elif action == 'post_clear':
+        search.index_games(Game.objects.filter(pk__in=instance._search_game_ids))
+
+
+@receiver(post_save, sender=GameCategory)
+def reindex_category(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_games(instance.games.all())
+
+
+@receiver(pre_delete, sender=GameCategory)
+def remember_category_games(sender, instance, **kwargs):
+    instance._search_game_ids = list(instance.games.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=GameCategory)
+def reindex_category_games(sender, instance, **kwargs):
+    search.index_games(Game.objects.filter(pk__in=instance._search_game_ids))
@@ -0,0 +1,132 @@
+"""
+Storage format of saved game states.
+
+States are stored in binary fields as a one byte marker followed by the
+payload. b'Z' marks a zlib stream of the UTF-8 encoded state and b'R' the
+plain UTF-8 bytes, used when compressing would not make the state smaller.
+
+The module keeps running totals of the stored sizes and the time spent
+encoding and decoding, available through stats.snapshot() and exported by
+gameStore.metrics.
+"""
+import codecs
+import logging
+import threading
+import time
+import zlib
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+ZLIB = b'Z'
+RAW = b'R'
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StateStats(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.decoded = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.encode_seconds = 0.0
+        self.decode_seconds = 0.0
+
+    def record_encode(self, raw_bytes, stored_bytes, seconds):
+        with self._lock:
+            self.encoded += 1
+            self.raw_bytes += raw_bytes
+            self.stored_bytes += stored_bytes
+            self.encode_seconds += seconds
+
+    def record_decode(self, seconds):
+        with self._lock:
+            self.decoded += 1
+            self.decode_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'encoded': self.encoded,
+                'decoded': self.decoded,
+                'raw_bytes': self.raw_bytes,
+                'stored_bytes': self.stored_bytes,
+                'ratio': self.stored_bytes / self.raw_bytes if self.raw_bytes else None,
+                'encode_seconds': self.encode_seconds,
+                'decode_seconds': self.decode_seconds,
+            }
+
+
+stats = StateStats()
+metrics.register('save_state', stats.snapshot, 'Save state storage of the worker')
+
+
+def max_size():
+    return getattr(settings, 'SAVE_STATE_MAX_BYTES', 1024 * 1024)
+
+
+def too_large(game_state):
+    """
+    Whether the UTF-8 encoded state exceeds SAVE_STATE_MAX_BYTES.
+    """
+    return game_state is None or len(game_state.encode('utf-8')) > max_size()
+
+
+def encode(game_state):
+    """
+    Frame and compress a state string for storage.
+    """
+    started = time.time()
+    raw = game_state.encode('utf-8')
+    compressed = zlib.compress(raw, 6)
+    if len(compressed) < len(raw):
+        blob = ZLIB + compressed
+    else:
+        blob = RAW + raw
+
+    seconds = time.time() - started
+    stats.record_encode(len(raw), len(blob), seconds)
+    logger.debug('Encoded state of %d bytes into %d bytes in %.4fs',
+                 len(raw), len(blob), seconds)
+    return blob
+
+
+def iter_decode(blob, chunk_size=CHUNK_SIZE):
+    """
+    Decode a stored state into an iterator of text chunks, decompressing at
+    most chunk_size bytes at a time.
+    """
+    started = time.time()
+    blob = bytes(blob)
+    marker, payload = blob[:1], memoryview(blob)[1:]
+    decoder = codecs.getincrementaldecoder('utf-8')()
+
+    if marker == ZLIB:
+        decompressor = zlib.decompressobj()
+        for offset in range(0, len(payload), chunk_size):
+            data = decompressor.decompress(bytes(payload[offset:offset + chunk_size]), chunk_size)
+            while data:
+                yield decoder.decode(data)
+                data = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+        yield decoder.decode(decompressor.flush(), final=True)
+    elif marker == RAW:
+        for offset in range(0, len(payload), chunk_size):
+            yield decoder.decode(bytes(payload[offset:offset + chunk_size]))
+        yield decoder.decode(b'', final=True)
+    else:
+        raise ValueError('Unknown state format {!r}'.format(marker))
+
+    stats.record_decode(time.time() - started)
+
+
+def decode(blob):
+    """
+    Decode a stored state into a single string.
+    """
+    return ''.join(iter_decode(blob))
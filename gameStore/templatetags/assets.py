@@ -0,0 +1,24 @@
+from django import template
+from django.utils.html import format_html_join
+
+from gameStore import assets
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle_css(name):
+    """
+    Link tags for a CSS bundle, see gameStore.assets.
+    """
+    return format_html_join('\n', '<link href="{}" rel="stylesheet">',
+                            ((url,) for url in assets.urls(name)))
+
+
+@register.simple_tag
+def bundle_js(name):
+    """
+    Script tags for a JavaScript bundle, see gameStore.assets.
+    """
+    return format_html_join('\n', '<script src="{}"></script>',
+                            ((url,) for url in assets.urls(name)))
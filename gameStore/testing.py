@@ -0,0 +1,15 @@
+"""
+Helpers shared by the tests in gameStore/tests.
+"""
+from concurrent.futures import Executor, Future
+
+
+class InlineExecutor(Executor):
+    """
+    Runs jobs right away in the calling thread, inside the test transaction.
+    """
+
+    def submit(self, function, *args, **kwargs):
+        future = Future()
+        future.set_result(function(*args, **kwargs))
+        return future
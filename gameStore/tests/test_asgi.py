@@ -0,0 +1,122 @@
+from django.test import TestCase, override_settings
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signals
+from django.db import close_old_connections
+from django.middleware.csrf import _get_new_csrf_key
+from urllib.parse import urlencode
+from gameStore.asgi import ASGIApplication
+from gameStore.models import Game, HighScore
+from gameStore.testing import InlineExecutor
+import asyncio
+import json
+
+@override_settings(INGEST_FLUSH_INTERVAL=0)
+class ASGITestCase(TestCase):
+
+    def setUp(self):
+        # Like the test client, keep the test transaction's connection open
+        for signal in (signals.request_started, signals.request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+        self.application = ASGIApplication(executor=InlineExecutor(), wsgi_executor=InlineExecutor())
+        self.player = User.objects.create_user('player', password='password')
+        self.game = Game.objects.create(name='Game', price=5,
+        URL='http://webcourse.cs.hut.fi/example_game.html', developer=self.player)
+        self.game.users.add(self.player)
+
+        self.client.login(username='player', password='password')
+        self.csrf_token = _get_new_csrf_key()
+        self.cookies = 'sessionid={}; csrftoken={}'.format(
+            self.client.cookies[settings.SESSION_COOKIE_NAME].value, self.csrf_token)
+
+    def request(self, method, path, data=None, cookies=True, session=True, ajax=True):
+        body = urlencode(data or {}).encode('ascii') if method == 'POST' else b''
+        headers = [(b'host', b'testserver')]
+        if cookies:
+            cookie = self.cookies if session else 'csrftoken={}'.format(self.csrf_token)
+            headers += [(b'cookie', cookie.encode('ascii')),
+                        (b'x-csrftoken', self.csrf_token.encode('ascii'))]
+        if ajax:
+            headers.append((b'x-requested-with', b'XMLHttpRequest'))
+        if method == 'POST':
+            headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+        scope = {'type': 'http', 'method': method, 'path': path, 'headers': headers,
+                 'query_string': urlencode(data or {}).encode('ascii') if method == 'GET' else b''}
+        # Deliver the body in two parts like a slow client
+        messages = [{'type': 'http.request', 'body': body[:5], 'more_body': True},
+                    {'type': 'http.request', 'body': body[5:]}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.get_event_loop().run_until_complete(self.application(scope, receive, send))
+        status = sent[0]['status']
+        content = b''.join(message.get('body', b'') for message in sent[1:])
+        return status, content
+
+    def test_gameplay_endpoints(self):
+        """
+        Scores and saves should be stored and loaded through the async path.
+        """
+        status, content = self.request('POST', '/highscores/newScore/', {'game': 'Game', 'score': 10})
+        self.assertEqual((status, content), (200, b'Success'))
+        self.assertEqual(HighScore.objects.get().score, 10)
+
+        status, content = self.request('GET', '/games/load/', {'game': 'Game'})
+        self.assertEqual(json.loads(content.decode('utf-8')), {'found': 0})
+
+        status, _ = self.request('POST', '/games/save/', {'game': 'Game', 'state': '{"level": 3}'})
+        self.assertEqual(status, 200)
+        jobs = []
+        submit = self.application.executor.submit
+        self.application.executor.submit = lambda function, *args: (
+            jobs.append(function) or submit(function, *args))
+        status, content = self.request('GET', '/games/load/', {'game': 'Game'})
+        self.assertEqual(json.loads(content.decode('utf-8')), {'found': 1, 'state': '{"level": 3}'})
+        # The saved state is decompressed in the thread pool
+        self.assertIn(next, jobs)
+
+    def test_rejected_requests(self):
+        """
+        The async path should keep the login, CSRF and input checks.
+        """
+        status, _ = self.request('POST', '/highscores/newScore/', {'game': 'Game', 'score': 1},
+                                 cookies=False)
+        self.assertEqual(status, 403)
+        status, _ = self.request('POST', '/highscores/newScore/', {'game': 'Game', 'score': 1},
+                                 session=False)
+        self.assertEqual(status, 302)
+        status, _ = self.request('POST', '/highscores/newScore/', {'game': 'Game', 'score': 1},
+                                 ajax=False)
+        self.assertEqual(status, 400)
+        status, _ = self.request('POST', '/highscores/newScore/', {'game': 'Nope', 'score': 1})
+        self.assertEqual(status, 404)
+        status, _ = self.request('POST', '/highscores/newScore/', {'game': 'Game', 'score': 'x'})
+        self.assertEqual(status, 400)
+        self.assertFalse(HighScore.objects.exists())
+
+    def test_other_views_are_bridged(self):
+        """
+        Non-gameplay views should be served by the WSGI application.
+        """
+        status, content = self.request('GET', '/games/{}/'.format(self.game.pk))
+        self.assertEqual(status, 200)
+        self.assertIn(b'Game', content)
+        status, _ = self.request('GET', '/no-such-page/')
+        self.assertEqual(status, 404)
+
+    @override_settings(ASGI_MAX_BODY_SIZE=100)
+    def test_bridged_body_size_is_limited(self):
+        """
+        Bodies of bridged requests larger than ASGI_MAX_BODY_SIZE should be
+        rejected before they are read in full.
+        Should return HTTP 413 - Payload Too Large.
+        """
+        status, _ = self.request('POST', '/games/create/', {'description': 'x' * 200})
+        self.assertEqual(status, 413)
@@ -0,0 +1,71 @@
+from django.test import TestCase, override_settings
+from django.template import Context, Template
+from gameStore import assets
+import os
+import shutil
+import tempfile
+
+class AssetTestCase(TestCase):
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        self.settings = override_settings(STATIC_ROOT=self.static_root)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.addCleanup(assets._manifest.clear)
+
+    def render(self):
+        return Template("{% load assets %}{% bundle_css 'gameStore/css/site.css' %}"
+                        "{% bundle_js 'gameStore/js/site.js' %}").render(Context())
+
+    def serve(self, url, encoding=''):
+        application = assets.AssetWhiteNoise(lambda environ, start_response: [])
+        response = {}
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+        application({'PATH_INFO': url, 'REQUEST_METHOD': 'HEAD',
+                     'HTTP_ACCEPT_ENCODING': encoding}, start_response)
+        return response
+
+    def test_minify(self):
+        """
+        Comments and whitespace should be stripped, license comments kept.
+        """
+        self.assertEqual(assets.minify_css('/*! MIT */\n/* note */\na ,b {\n  color: red;\n}\n'),
+                         '/*! MIT */ a,b{color:red}')
+        self.assertEqual(assets.minify_js('// note\nvar a = 1\n\n  /* block */\n  a++\n'),
+                         'var a = 1\na++')
+
+    def test_sources_without_build(self):
+        """
+        Without a manifest the sources should be linked one by one.
+        """
+        html = self.render()
+        self.assertIn('/static/gameStore/css/layout.css', html)
+        self.assertIn('/static/gameStore/js/jquery.js', html)
+
+    def test_build_and_serve(self):
+        """
+        Built bundles should be fingerprinted, precompressed and served as
+        immutable files.
+        """
+        bundles = assets.build()
+        css = bundles['gameStore/css/site.css']
+        self.assertRegex(css, r'^gameStore/css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(os.path.join(self.static_root, css + '.gz')))
+        self.assertEqual(assets.build(), bundles)
+
+        html = self.render()
+        self.assertIn('/static/' + css, html)
+        self.assertNotIn('layout.css', html)
+
+        response = self.serve('/static/' + css, 'gzip, deflate')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['headers']['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['headers']['Cache-Control'])
+
+        response = self.serve('/static/assets.json')
+        self.assertNotIn('immutable', response['headers']['Cache-Control'])
+        self.assertNotIn('Content-Encoding', response['headers'])
@@ -0,0 +1,64 @@
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth.models import User
+from gameStore.models import BestScore, Game, HighScore, LeaderboardEntry, SaveSlot, Transaction
+from gameStore import benchmarks, seed
+
+class SeedTestCase(TestCase):
+
+    def setUp(self):
+        self.counts = seed.counts(0.01, developers=2, players=30, games=5, transactions=40)
+        seed.seed(self.counts, seed=1)
+
+    def test_seeded_rows(self):
+        """
+        Seeding should write the requested rows and their derived tables.
+        """
+        self.assertEqual(Game.objects.count(), 5)
+        self.assertEqual(HighScore.objects.count(), self.counts['scores'])
+        self.assertEqual(Transaction.objects.count(), self.counts['transactions'])
+        paid = Transaction.objects.filter(status=Transaction.PAID)
+        self.assertEqual(Game.users.through.objects.count(), paid.count())
+        self.assertEqual(BestScore.objects.count(),
+                         HighScore.objects.values('game', 'user').distinct().count())
+        self.assertTrue(LeaderboardEntry.objects.exists())
+        self.assertTrue(SaveSlot.objects.exists())
+        self.assertLess(Game.objects.earliest('created').created,
+                        Game.objects.latest('created').created)
+
+        seed.clear()
+        self.assertFalse(User.objects.filter(username__startswith=seed.SEED_PREFIX).exists())
+        self.assertFalse(Game.objects.exists())
+
+    def test_every_route_is_benchmarked(self):
+        """
+        Every route should be requested with its expected status, and
+        nothing the routes write should be kept.
+        """
+        self.assertEqual(benchmarks.uncovered(), [])
+        games = Game.objects.count()
+        scores = HighScore.objects.count()
+        results = benchmarks.run(requests=1)
+        self.assertEqual(list(results), list(benchmarks.ROUTES))
+        self.assertEqual([name for name, result in results.items() if result['errors']], [])
+        self.assertEqual((Game.objects.count(), HighScore.objects.count()), (games, scores))
+
+    def test_queries_are_counted_with_a_full_log(self):
+        """
+        Queries should be counted even after the query log is full, as it
+        is after a few thousand requests.
+        """
+        connection.queries_log.extend([{}] * connection.queries_log.maxlen)
+        with benchmarks.session() as fixtures:
+            result = benchmarks.measure('browse_games', fixtures, 1)
+        self.assertGreater(result['queries'], 0)
+
+    def test_budgets(self):
+        """
+        Results over their budget should be reported.
+        """
+        results = {'game': {'p50_ms': 5, 'p95_ms': 9, 'queries': 6, 'errors': 0}}
+        self.assertEqual(benchmarks.violations(results, benchmarks.budgets_of(results)), [])
+        self.assertEqual(benchmarks.violations(results, {'game': {'p95_ms': 100, 'queries': 5}}),
+                         ['game: 6 queries, budget 5'])
+        self.assertEqual(benchmarks.violations(results, {}), ['game: no budget recorded'])
@@ -0,0 +1,85 @@
+from django.test import TestCase, Client
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from gameStore.models import Game, Transaction
+from gameStore import sales
+from hashlib import md5
+
+class CartTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.first_developer = User.objects.create_user('first_developer')
+        self.second_developer = User.objects.create_user('second_developer')
+        self.player = User.objects.create_user('player')
+        self.games = [Game.objects.create(name='Game {}'.format(i), price=5 + i,
+            URL='http://webcourse.cs.hut.fi/example_game.html',
+            developer=self.first_developer if i else self.second_developer)
+            for i in range(3)]
+        self.client.force_login(self.player)
+
+    def pay(self, pid, result='success'):
+        checksum_string = "pid={}&ref={}&result={}&token={}".format(pid,
+            'ref', result, settings.PAYMENT_SERVICE_SECRET_KEY)
+        return self.client.get('/payment/', {'pid': pid, 'ref': 'ref', 'result': result,
+            'checksum': md5(checksum_string.encode("ascii")).hexdigest()})
+
+    def test_cart_checkout(self):
+        """
+        All games in the cart should be bought with one payment.
+        """
+        for game in self.games:
+            self.client.post('/cart/add/{}/'.format(game.pk))
+        self.client.post('/cart/remove/{}/'.format(self.games[2].pk))
+        response = self.client.get('/cart/')
+        self.assertEqual(response.context['total'], 11)
+
+        response = self.client.post('/cart/checkout/')
+        self.assertEqual(response.status_code, 200)
+        parent = Transaction.objects.get(parent__isnull=True)
+        self.assertEqual(response.context['form'].initial['amount'], 11)
+        self.assertEqual(response.context['form'].initial['pid'], parent.pk)
+        self.assertEqual(parent.items.count(), 2)
+        self.assertEqual(self.client.get('/cart/').context['games'], [])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.pay(parent.pk)
+        grants = [query for query in queries.captured_queries
+                  if query['sql'].startswith('INSERT INTO "gameStore_game_users"')]
+        self.assertEqual(len(grants), 1)
+        self.assertTrue(response.context['success'])
+        self.assertEqual(set(self.player.owned_games.values_list('pk', flat=True)),
+                         {self.games[0].pk, self.games[1].pk})
+        self.assertEqual(set(Transaction.objects.values_list('status', flat=True)), {Transaction.PAID})
+        self.assertEqual(sales.totals(self.first_developer), {'count': 1, 'revenue': 6})
+        self.assertEqual(sales.totals(self.second_developer), {'count': 1, 'revenue': 5})
+
+    def test_failed_cart_payment(self):
+        """
+        A failed payment should fail every line item and grant nothing.
+        """
+        self.client.post('/cart/add/{}/'.format(self.games[0].pk))
+        self.client.post('/cart/checkout/')
+        parent = Transaction.objects.get(parent__isnull=True)
+
+        response = self.pay(parent.pk, 'cancel')
+        self.assertFalse(response.context['success'])
+        self.assertEqual(set(Transaction.objects.values_list('status', flat=True)), {Transaction.FAILED})
+        self.assertFalse(self.player.owned_games.exists())
+
+    def test_checkout_skips_games_bought_elsewhere(self):
+        """
+        Games bought in another session should not be charged again, even
+        while this session's cached ownership does not know about them.
+        """
+        for game in self.games[:2]:
+            self.client.post('/cart/add/{}/'.format(game.pk))
+        self.games[0].users.add(self.player)
+
+        response = self.client.post('/cart/checkout/')
+        self.assertEqual(response.context['form'].initial['amount'], 6)
+        parent = Transaction.objects.get(parent__isnull=True)
+        self.assertEqual(list(parent.items.values_list('game_id', flat=True)), [self.games[1].pk])
@@ -0,0 +1,109 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.utils import ConnectionHandler
+from django.test import TestCase
+from gameStore.db.pool import ConnectionPool, PoolExhausted, discard_pool
+import os
+import shutil
+import sqlite3
+import tempfile
+
+class ConnectionPoolTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'pool.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def wrapper(self, alias, **pool):
+        self.addCleanup(discard_pool, alias)
+        handler = ConnectionHandler({DEFAULT_DB_ALIAS: {}, alias: {
+            'ENGINE': 'gameStore.db.backends.sqlite3',
+            'NAME': self.path,
+            'PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+            'POOL': dict({'MAX_SIZE': 1, 'TIMEOUT': 0.05}, **pool),
+        }})
+        return handler[alias]
+
+    def test_connections_are_reused_up_to_the_limit(self):
+        """
+        A released connection should be handed out again, and no more than
+        max_size should be open at once.
+        """
+        pool = ConnectionPool(max_size=2, timeout=0.05)
+        first = pool.acquire(self.connect)
+        pool.release(first)
+        self.assertIs(pool.acquire(self.connect), first)
+        second = pool.acquire(self.connect)
+        self.assertIsNot(second, first)
+        with self.assertRaises(PoolExhausted):
+            pool.acquire(self.connect)
+
+        pool.release(second)
+        self.assertIs(pool.acquire(self.connect), second)
+        self.assertEqual(pool.stats(), {'size': 2, 'idle': 0, 'opened': 2, 'reused': 2})
+
+    def test_broken_and_old_connections_are_replaced(self):
+        """
+        A connection failing its health check, or older than max_age, should
+        be closed and replaced by a new one.
+        """
+        pool = ConnectionPool(max_size=1, check_after=0)
+        first = pool.acquire(self.connect)
+        pool.release(first)
+        second = pool.acquire(self.connect, check=lambda connection: False)
+        self.assertIsNot(second, first)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            first.execute('SELECT 1')
+
+        pool.max_age = 0
+        pool.release(second)
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertIsNot(pool.acquire(self.connect), second)
+
+    def test_backend_pools_connections(self):
+        """
+        The backend should take its connections from the pool, apply the
+        pragmas once and roll back what a closed connection left open.
+        """
+        connection = self.wrapper('pooltest')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('CREATE TABLE item (name TEXT)')
+        raw = connection.connection
+        connection.close()
+        self.assertEqual(connection.pool.stats()['idle'], 1)
+
+        connection.set_autocommit(False)
+        self.assertIs(connection.connection, raw)
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO item VALUES ('lost')")
+        connection.close()
+        connection.ensure_connection()
+        self.assertIs(connection.connection, raw)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM item')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(connection.pool.stats()['opened'], 1)
+        connection.close()
+
+    def test_connection_closed_in_transaction_is_discarded(self):
+        """
+        A connection closed inside an atomic block should not be reused, as
+        Django keeps it until the block exits.
+        """
+        connection = self.wrapper('pooltest-atomic')
+        connection.ensure_connection()
+        raw = connection.connection
+        # What transaction.atomic() does on entering
+        connection.in_atomic_block = True
+        connection.close()
+        self.assertIs(connection.connection, raw)
+        self.assertEqual(connection.pool.stats(), {'size': 0, 'idle': 0, 'opened': 1, 'reused': 0})
+        with self.assertRaises(sqlite3.ProgrammingError):
+            raw.execute('SELECT 1')
@@ -0,0 +1,89 @@
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import Group, User
+from gameStore.models import Game, Transaction
+from gameStore import exports
+from datetime import datetime, timedelta
+from django.utils import timezone
+import csv
+import io
+import json
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        developer_group = Group.objects.create(name='Developer')
+        self.developer = User.objects.create_user('developer')
+        self.developer.groups.add(developer_group)
+        self.other_developer = User.objects.create_user('other_developer')
+        self.other_developer.groups.add(developer_group)
+        self.player = User.objects.create_user('player')
+
+        self.game = Game.objects.create(name='Game', price=10,
+        URL='http://webcourse.cs.hut.fi/example_game.html', developer=self.developer)
+        self.other_game = Game.objects.create(name='Other', price=3,
+        URL='http://webcourse.cs.hut.fi/example_game.html', developer=self.other_developer)
+        self.game.users.add(self.player)
+        self.other_game.users.add(self.player)
+
+        start = timezone.make_aware(datetime(2016, 3, 1, 12))
+        self.sales = []
+        for day in range(5):
+            transaction = Transaction.objects.create(game=self.game, price=10 + day,
+                payer=self.player, seller=self.developer)
+            Transaction.objects.filter(pk=transaction.pk).update(created_at=start + timedelta(days=day),
+                status=Transaction.PAID)
+            self.sales.append(transaction.pk)
+        Transaction.objects.create(game=self.other_game, price=3,
+            payer=self.player, seller=self.other_developer)
+
+    def export(self, export_format, **params):
+        self.client.force_login(self.developer)
+        response = self.client.get('/dashboard/transactions.{}'.format(export_format), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_export(self):
+        """
+        The CSV export should list every sale of the developer in order.
+        """
+        content = self.export('csv')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([int(row['id']) for row in rows], self.sales)
+        self.assertEqual([int(row['price']) for row in rows], [10, 11, 12, 13, 14])
+
+    def test_date_range_and_resume(self):
+        """
+        Exports should honour the date range and resume after a cursor.
+        """
+        lines = self.export('jsonl', since='2016-03-02', until='2016-03-04').splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in rows], self.sales[1:4])
+
+        rows = [json.loads(line) for line in self.export('jsonl', cursor=rows[0]['cursor']).splitlines()]
+        self.assertEqual([row['id'] for row in rows], self.sales[2:])
+
+    def test_invalid_exports(self):
+        """
+        Malformed filters and normal users should be refused.
+        Should return HTTP 400 - Bad Request and 403 - Forbidden.
+        """
+        self.client.force_login(self.developer)
+        response = self.client.get('/dashboard/transactions.csv', {'cursor': 'nonsense'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/dashboard/transactions.csv', {'since': '2016-13-01'})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_login(self.player)
+        response = self.client.get('/dashboard/transactions.csv')
+        self.assertEqual(response.status_code, 403)
+
+    def test_constant_query_size(self):
+        """
+        Every chunk should be fetched with its own bounded query.
+        """
+        rows = exports.rows(self.developer)
+        with self.assertNumQueries(3):
+            self.assertEqual(len(list(rows)), 5)
@@ -0,0 +1,133 @@
+from django.test import TestCase, Client, override_settings
+from gameStore.models import Game, HighScore, Save, BestScore
+from gameStore import ingest
+from django.db import OperationalError
+from django.contrib.auth.models import User
+import json
+
+@override_settings(INGEST_BATCH_SIZE=3, INGEST_FLUSH_INTERVAL=None)
+class IngestTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer = User.objects.create_user('developer')
+        self.player = User.objects.create_user('player')
+        self.game = Game.objects.create(name='Duke Nukem', price=25,
+        URL='http://webcourse.cs.hut.fi/example_game.html',
+        developer=self.developer)
+        self.client.force_login(self.player)
+
+    def tearDown(self):
+        ingest.queue.flush()
+
+    def post_events(self, events):
+        return self.client.post('/games/events/',
+            json.dumps({'game': self.game.name, 'events': events}),
+            content_type='application/json',
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_scores_are_written_behind(self):
+        """
+        Scores should stay queued until the batch size is reached.
+        """
+        response = self.post_events([{'type': 'SCORE', 'score': 1},
+                                     {'type': 'SCORE', 'score': 2}])
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['pending'], 2)
+        self.assertEqual(HighScore.objects.count(), 0)
+
+        self.client.post('/highscores/newScore/', {'game': self.game.name, 'score': 3},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(len(ingest.queue), 0)
+        self.assertEqual(sorted(HighScore.objects.values_list('score', flat=True)), [1, 2, 3])
+        self.assertEqual(BestScore.objects.get(user=self.player, game=self.game).score, 3)
+
+    def test_flush_writes_pending_scores(self):
+        """
+        An explicit flush, as done on worker exit, should write every
+        queued score.
+        """
+        self.post_events([{'type': 'SCORE', 'score': 10}])
+        self.assertEqual(ingest.queue.flush(), 1)
+        self.assertEqual(HighScore.objects.get().score, 10)
+        self.assertEqual(ingest.queue.flush(), 0)
+
+    @override_settings(INGEST_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_through(self):
+        """
+        With a zero flush interval every score is written right away.
+        """
+        self.post_events([{'type': 'SCORE', 'score': 10}])
+        self.assertEqual(HighScore.objects.count(), 1)
+
+    def test_bad_scores_do_not_block_the_queue(self):
+        """
+        A row that violates a constraint should be dropped and the rest of
+        the batch written.
+        """
+        ingest.queue.put([(self.game.pk, self.player.pk, 10), (self.game.pk, self.player.pk, None)])
+        self.assertEqual(ingest.queue.flush(), 1)
+        self.assertEqual(len(ingest.queue), 0)
+        self.assertEqual(list(HighScore.objects.values_list('score', flat=True)), [10])
+
+    @override_settings(INGEST_MAX_ATTEMPTS=2)
+    def test_failing_batches_are_dropped_after_retries(self):
+        """
+        A batch should be retried by later flushes, and dropped after
+        INGEST_MAX_ATTEMPTS failed ones.
+        """
+        def unavailable(scores):
+            raise OperationalError('database is locked')
+        ingest.queue.flush()
+        dropped = ingest.queue.dropped
+        self.addCleanup(setattr, ingest, 'write_scores', ingest.write_scores)
+        ingest.write_scores = unavailable
+
+        # A full batch is flushed by put, whose caller must not fail
+        self.assertEqual(ingest.queue.put([(self.game.pk, self.player.pk, 1)] * 3), 3)
+        self.assertEqual(ingest.queue.flush(), 0)
+        self.assertEqual(len(ingest.queue), 0)
+        self.assertEqual(ingest.queue.stats()['dropped'], dropped + 3)
+
+    def test_saves_are_written_with_the_request(self):
+        """
+        Saves should be stored before the response so they can be loaded.
+        """
+        self.post_events([{'type': 'SAVE', 'state': '{"a": 1}'},
+                          {'type': 'SAVE', 'state': '{"a": 2}'}])
+        self.assertEqual(Save.objects.filter(user=self.player, game=self.game).count(), 2)
+
+    def test_invalid_batch(self):
+        """
+        Malformed batches should be rejected as a whole.
+        Should return HTTP 400 - Bad Request.
+        """
+        response = self.post_events([{'type': 'SCORE', 'score': 'lots'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(ingest.queue), 0)
+
+    @override_settings(INGEST_MAX_EVENTS=2)
+    def test_oversized_batch(self):
+        """
+        Batches with more than INGEST_MAX_EVENTS events should be rejected
+        as a whole.
+        Should return HTTP 413 - Payload Too Large.
+        """
+        response = self.post_events([{'type': 'SCORE', 'score': score} for score in range(3)])
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(len(ingest.queue), 0)
+
+    def test_beacon_batch(self):
+        """
+        Pages being closed should be able to send their last batch as a
+        form, without the AJAX headers.
+        Should return HTTP 200 - OK.
+        """
+        response = self.client.post('/games/events/', {
+            'game': self.game.name,
+            'events': json.dumps([{'type': 'SCORE', 'score': 7}, {'type': 'SAVE', 'state': '{}'}])})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ingest.queue), 1)
+        self.assertEqual(Save.objects.filter(user=self.player).count(), 1)
+        self.assertEqual(self.client.post('/games/events/', {'game': self.game.name}).status_code,
+                         400)
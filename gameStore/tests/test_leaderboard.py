@@ -0,0 +1,91 @@
+from django.test import TestCase, Client, override_settings
+from gameStore.models import Game, HighScore, LeaderboardEntry
+from gameStore import leaderboard
+from django.contrib.auth.models import User
+
+@override_settings(LEADERBOARD_SIZE=3, INGEST_FLUSH_INTERVAL=0)
+class LeaderboardTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer = User.objects.create_user('developer')
+        self.first_player = User.objects.create_user('first_player')
+        self.second_player = User.objects.create_user('second_player')
+
+        self.first_game = Game.objects.create(name='Duke Nukem', price=25,
+        URL='http://webcourse.cs.hut.fi/example_game.html',
+        developer=self.developer)
+        self.second_game = Game.objects.create(name='Doom', price=15,
+        URL='http://webcourse.cs.hut.fi/example_game.html',
+        developer=self.developer)
+
+    def post_score(self, game, score):
+        return self.client.post('/highscores/newScore/',
+            {'game': game.name, 'score': score},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_leaderboard_is_bounded_and_ordered(self):
+        """
+        Only the best LEADERBOARD_SIZE scores of a game should be kept,
+        best first.
+        """
+        self.client.force_login(self.first_player)
+        for score in [10, 50, 20, 40, 30]:
+            self.post_score(self.first_game, score)
+
+        scores = [entry.score for entry in leaderboard.top(self.first_game)]
+        self.assertEqual(scores, [50, 40, 30])
+        self.assertEqual(HighScore.objects.filter(game=self.first_game).count(), 5)
+
+    def test_ties_do_not_replace_older_entries(self):
+        """
+        A score equal to the lowest kept score should not push the older
+        entry out of a full leaderboard.
+        """
+        leaderboard.record_scores([
+            (self.first_game.pk, self.first_player.pk, 30),
+            (self.first_game.pk, self.first_player.pk, 20),
+            (self.first_game.pk, self.first_player.pk, 10)])
+        leaderboard.record_score(self.first_game, self.second_player, 10)
+
+        lowest = list(leaderboard.top(self.first_game))[-1]
+        self.assertEqual(lowest.user, self.first_player)
+        self.assertEqual(LeaderboardEntry.objects.filter(game=self.first_game).count(), 3)
+
+    def test_rebuild_matches_high_scores(self):
+        """
+        Rebuilding should produce the top scores stored in HighScore.
+        """
+        for score in [5, 15, 25, 35]:
+            HighScore.objects.create(score=score, user=self.second_player, game=self.second_game)
+        leaderboard.rebuild()
+
+        scores = [entry.score for entry in leaderboard.top(self.second_game)]
+        self.assertEqual(scores, [35, 25, 15])
+        self.assertEqual(list(leaderboard.top(self.first_game)), [])
+
+    def test_browse_high_scores_groups_by_game(self):
+        """
+        The listing of all high scores should show each game's own top list.
+        Should return HTTP 200 - OK.
+        """
+        leaderboard.record_score(self.first_game, self.first_player, 100)
+        leaderboard.record_score(self.second_game, self.second_player, 7)
+
+        response = self.client.get('/highscores/')
+        self.assertEqual(response.status_code, 200)
+        games = {game.pk: game for game in response.context['games']}
+        self.assertEqual([e.score for e in games[self.first_game.pk].top_scores], [100])
+        self.assertEqual([e.score for e in games[self.second_game.pk].top_scores], [7])
+
+    def test_high_scores_for_game(self):
+        """
+        The high scores of a single game should come from its leaderboard.
+        Should return HTTP 200 - OK.
+        """
+        leaderboard.record_score(self.first_game, self.first_player, 100)
+
+        response = self.client.get('/highscores/{}/'.format(self.first_game.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e.score for e in response.context['high_scores']], [100])
@@ -0,0 +1,146 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core import signals
+from django.db import close_old_connections
+from django.utils import timezone
+from gameStore.models import Game, LeaderboardEvent
+from gameStore import leaderboard, live
+from gameStore.asgi import ASGIApplication
+from gameStore.testing import InlineExecutor
+from datetime import timedelta
+import asyncio
+import json
+
+@override_settings(LEADERBOARD_SIZE=2, LIVE_POLL_INTERVAL=0)
+class LiveLeaderboardTestCase(TestCase):
+
+    def setUp(self):
+        self.player = User.objects.create_user('player')
+        self.first_game = Game.objects.create(name='First', price=5,
+        URL='http://webcourse.cs.hut.fi/example_game.html', developer=self.player)
+        self.second_game = Game.objects.create(name='Second', price=5,
+        URL='http://webcourse.cs.hut.fi/example_game.html', developer=self.player)
+
+    def record(self, game, score):
+        leaderboard.record_scores([(game.pk, self.player.pk, score)])
+
+    def test_events_only_for_top_changes(self):
+        """
+        An event should be written only when a score enters the top list.
+        """
+        self.record(self.first_game, 10)
+        self.record(self.first_game, 20)
+        self.record(self.first_game, 5)
+        payloads = [json.loads(event.payload) for event in LeaderboardEvent.objects.order_by('pk')]
+        self.assertEqual(len(payloads), 2)
+        self.assertEqual(payloads[-1], [{'rank': 1, 'user': 'player', 'score': 20},
+                                        {'rank': 2, 'user': 'player', 'score': 10}])
+
+    def test_old_events_are_pruned_without_subscribers(self):
+        """
+        Recording scores should delete events older than the retention, even
+        when nobody is listening.
+        """
+        self.record(self.first_game, 10)
+        LeaderboardEvent.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        leaderboard._pruned['at'] = 0.0
+        self.record(self.first_game, 20)
+        self.assertEqual(live.broadcaster.subscriber_count(), 0)
+        self.assertEqual(LeaderboardEvent.objects.count(), 1)
+
+    def test_broadcast_to_game_subscribers(self):
+        """
+        One poll should deliver each event to the subscribers of its game.
+        """
+        first, second = [], []
+        for game, events in [(self.first_game, first), (self.second_game, second)]:
+            callback = lambda event, events=events: events.append(event)
+            live.broadcaster.subscribe(game.pk, callback)
+            self.addCleanup(live.broadcaster.unsubscribe, game.pk, callback)
+
+        self.record(self.first_game, 10)
+        with self.assertNumQueries(1):
+            self.assertEqual(live.broadcaster.poll(), 1)
+        self.assertEqual([event['top'][0]['score'] for event in first], [10])
+        self.assertEqual(second, [])
+        self.assertEqual(live.broadcaster.poll(), 0)
+
+    @override_settings(LIVE_UPDATES=True)
+    def test_stream(self):
+        """
+        The stream should start with the current list and push changes.
+        Should return HTTP 200 - OK.
+        """
+        self.record(self.first_game, 10)
+        response = self.client.get('/highscores/{}/live/'.format(self.first_game.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+        self.assertIn(b'"score": 10', next(chunks))
+
+        self.record(self.first_game, 30)
+        live.broadcaster.poll()
+        chunk = next(chunks).decode('utf-8')
+        self.assertTrue(chunk.startswith('event: leaderboard\nid: '))
+        data = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual([row['score'] for row in data['top']], [30, 10])
+
+        response.close()
+        self.assertEqual(live.broadcaster.subscriber_count(), 0)
+
+    def test_pages_subscribe_only_when_enabled(self):
+        """
+        Pages should open a stream only when live updates are on, as under
+        sync WSGI workers every stream holds a worker.
+        """
+        path = '/highscores/{}/'.format(self.first_game.pk)
+        with self.settings(LIVE_UPDATES=False):
+            response = self.client.get(path)
+            self.assertContains(response, '<title> High scores for First</title>')
+            self.assertNotContains(response, 'EventSource(')
+        with self.settings(LIVE_UPDATES=True):
+            self.assertContains(self.client.get(path), 'EventSource(', count=1)
+
+    @override_settings(LIVE_UPDATES=False)
+    def test_stream_when_disabled(self):
+        """
+        Without live updates no stream should be served, so clients cannot
+        hold sync workers open.
+        Should return HTTP 404 - Not Found.
+        """
+        response = self.client.get('/highscores/{}/live/'.format(self.first_game.pk))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(live.broadcaster.subscriber_count(), 0)
+
+    def test_asgi_stream(self):
+        """
+        The async stream should push changes until the client disconnects.
+        """
+        for signal in (signals.request_started, signals.request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+        application = ASGIApplication(executor=InlineExecutor(), wsgi_executor=InlineExecutor())
+        scope = {'type': 'http', 'method': 'GET', 'headers': [],
+                 'path': '/highscores/{}/live/'.format(self.first_game.pk)}
+        disconnect = asyncio.Event()
+        requests = [{'type': 'http.request', 'body': b''}]
+        sent = []
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if len(sent) == 2:
+                self.record(self.first_game, 40)
+                live.broadcaster.poll()
+            elif len(sent) == 3:
+                disconnect.set()
+
+        asyncio.get_event_loop().run_until_complete(application(scope, receive, send))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'"score": 40', sent[2]['body'])
+        self.assertEqual(live.broadcaster.subscriber_count(), 0)
@@ -0,0 +1,113 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from gameStore.models import Game
+from gameStore import metrics
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+class MetricsTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(METRICS_DIR=self.directory, METRICS_TOKEN='secret')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics.registry._reset()
+
+        self.developer = User.objects.create_user('developer')
+        self.game = Game.objects.create(name='Game', price=5,
+        URL='http://webcourse.cs.hut.fi/example_game.html', developer=self.developer)
+
+    def histogram(self, metric, view):
+        return metrics.registry.snapshot()[metric][view]
+
+    def test_views_are_measured(self):
+        """
+        A request should record its time, queries and render time under the
+        name of its view, even with DEBUG off.
+        """
+        self.client.get('/highscores/{}/'.format(self.game.pk))
+        self.client.get('/highscores/{}/'.format(self.game.pk))
+        self.client.get('/no/such/page/')
+
+        self.assertEqual(self.histogram('gamestore_request_seconds', 'high_scores_for_game')[-1], 2)
+        queries = self.histogram('gamestore_request_queries', 'high_scores_for_game')
+        self.assertGreaterEqual(queries[-2], 4)
+        self.assertGreater(self.histogram('gamestore_request_template_seconds',
+                                          'high_scores_for_game')[-2], 0)
+        self.assertEqual(self.histogram('gamestore_request_queries', metrics.UNRESOLVED)[-1], 1)
+
+    def test_endpoint_requires_token(self):
+        """
+        Anonymous requests should be refused.
+        Should return HTTP 403 - Forbidden.
+        """
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    def test_endpoint_merges_workers(self):
+        """
+        The endpoint should add up the histograms written by every worker.
+        Should return HTTP 200 - OK.
+        """
+        self.client.get('/')
+        other = [0] * (len(metrics.TIME_BUCKETS) + 1) + [0.0, 0]
+        other[-3], other[-2], other[-1] = 3, 90.0, 3
+        with open(os.path.join(self.directory, 'other-worker.json'), 'w') as output:
+            json.dump({'gamestore_request_seconds': {'index': other}}, output)
+
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode('utf-8')
+        self.assertIn('# TYPE gamestore_request_seconds histogram', text)
+        self.assertIn('gamestore_request_seconds_count{view="index"} 4', text)
+        self.assertIn('gamestore_request_seconds_bucket{view="index",le="+Inf"} 4', text)
+        self.assertIn('gamestore_request_queries_count{view="index"} 1', text)
+        self.assertEqual(len([name for name in os.listdir(self.directory)
+                              if name.startswith('{}-'.format(os.getpid()))]), 1)
+
+    def test_exited_workers_are_folded(self):
+        """
+        The files of exited workers should be merged into one, keeping
+        their counts.
+        """
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        histogram = [0] * (len(metrics.TIME_BUCKETS) + 1) + [0.0, 0]
+        histogram[0], histogram[-2], histogram[-1] = 2, 0.002, 2
+        for name in ['{}-exited.json'.format(process.pid), metrics.EXITED_NAME]:
+            with open(os.path.join(self.directory, name), 'w') as output:
+                json.dump({'gamestore_request_seconds': {'index': histogram},
+                           metrics.STATS_KEY: {'test': {'items': 1}}}, output)
+
+        for scrape in range(2):
+            data = metrics.collect()
+            self.assertEqual(data['gamestore_request_seconds']['index'][-1], 4)
+        self.assertEqual(sorted(name for name in os.listdir(self.directory)
+                                if name.endswith('.json')),
+                         sorted([metrics.EXITED_NAME, metrics.registry.name + '.json']))
+
+    def test_registered_stats(self):
+        """
+        The statistics of other modules should be exported for every running
+        worker, and the ones of the exited workers left out.
+        """
+        self.addCleanup(metrics.SOURCES.pop, 'test', None)
+        metrics.register('test', lambda: {'items': 3, 'ratio': None, 'seconds': 0.5},
+                         'Test source')
+        with open(os.path.join(self.directory, metrics.EXITED_NAME), 'w') as output:
+            json.dump({metrics.STATS_KEY: {'test': {'items': 2}}}, output)
+
+        text = metrics.render(metrics.collect())
+        worker = 'worker="{}"'.format(metrics.registry.name)
+        self.assertIn('# TYPE gamestore_test_items gauge', text)
+        self.assertIn('gamestore_test_items{{{}}} 3'.format(worker), text)
+        self.assertIn('gamestore_test_seconds{{{}}} 0.5'.format(worker), text)
+        self.assertNotIn('gamestore_test_ratio', text)
+        self.assertEqual(text.count('gamestore_test_items{'), 1)
@@ -0,0 +1,60 @@
+from django.test import TestCase, Client
+from gameStore.models import Game, GameCategory
+from gameStore.ownership import Ownership
+from django.contrib.auth.models import Group, User
+
+class OwnershipTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer = User.objects.create_user('developer')
+        self.developer.groups.add(Group.objects.create(name='Developer'))
+        self.player = User.objects.create_user('player')
+
+        self.category = GameCategory.objects.create(name='action')
+        self.games = []
+        for name in ['Duke Nukem', 'Doom', 'Quake']:
+            game = Game.objects.create(name=name, price=25,
+            URL='http://webcourse.cs.hut.fi/example_game.html',
+            developer=self.developer)
+            game.categories.add(self.category)
+            self.games.append(game)
+        self.player.owned_games.add(self.games[0], self.games[2])
+
+    def test_load_in_one_query(self):
+        """
+        Owned and developed games should be loaded with a query each.
+        """
+        with self.assertNumQueries(2):
+            ownership = Ownership.load(self.player)
+        self.assertEqual(ownership.owned, {self.games[0].pk, self.games[2].pk})
+        self.assertEqual(ownership.developed, set())
+        self.assertEqual(Ownership.load(self.developer).developed, {g.pk for g in self.games})
+
+    def test_category_listing_flags_owned_games(self):
+        """
+        Category listings should flag the games the user owns.
+        Should return HTTP 200 - OK.
+        """
+        self.client.force_login(self.player)
+        response = self.client.get('/games/action/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([game.owned for game in response.context['games']], [True, False, True])
+
+    def test_ownership_is_cached_in_session(self):
+        """
+        Game pages should not query ownership again within the session.
+        """
+        self.client.force_login(self.player)
+        self.client.get('/games/{}/'.format(self.games[1].pk))
+        self.player.owned_games.add(self.games[1])
+
+        response = self.client.get('/games/{}/'.format(self.games[1].pk))
+        self.assertEqual(response.context['bought_game'], False)
+
+        session = self.client.session
+        session['_ownership']['loaded'] = 0
+        session.save()
+        response = self.client.get('/games/{}/'.format(self.games[1].pk))
+        self.assertEqual(response.context['bought_game'], True)
@@ -0,0 +1,78 @@
+from django.test import TestCase, Client, override_settings
+from django.core.cache import caches
+from gameStore.models import Game, GameCategory
+from gameStore import leaderboard, page_cache, versions
+from django.contrib.auth.models import User
+
+@override_settings(PAGE_CACHE_WAIT=0.1)
+class PageCacheTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer = User.objects.create_user('developer')
+        self.category = GameCategory.objects.create(name='action')
+        self.game = Game.objects.create(name='Duke Nukem', price=25,
+        URL='http://webcourse.cs.hut.fi/example_game.html',
+        developer=self.developer)
+        self.game.categories.add(self.category)
+
+    def tearDown(self):
+        caches['pages'].clear()
+
+    def test_anonymous_pages_are_cached(self):
+        """
+        The second anonymous request should be served from the cache.
+        """
+        for url in ['/games/', '/games/action/', '/highscores/']:
+            first = self.client.get(url)
+            self.assertFalse(first.has_header('X-Page-Cache'))
+            with self.assertNumQueries(2):
+                second = self.client.get(url)
+            self.assertEqual(second['X-Page-Cache'], 'hit')
+            self.assertEqual(first.content, second.content)
+
+    def test_catalog_changes_invalidate_pages(self):
+        """
+        Saving a game should make the next request render the new catalog.
+        """
+        self.client.get('/games/')
+        self.game.name = 'Doom'
+        self.game.save()
+
+        response = self.client.get('/games/')
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertIn(b'Doom', response.content)
+
+    def test_new_top_score_invalidates_high_scores(self):
+        """
+        A score entering a leaderboard should invalidate the high score page.
+        """
+        self.client.get('/highscores/')
+        leaderboard.record_score(self.game, self.developer, 1234)
+        response = self.client.get('/highscores/')
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertIn(b'1234', response.content)
+
+    def test_authenticated_pages_are_not_cached(self):
+        """
+        Logged in users see personalised pages which must not be cached.
+        """
+        self.client.force_login(self.developer)
+        self.client.get('/games/')
+        self.assertFalse(self.client.get('/games/').has_header('X-Page-Cache'))
+
+    def test_only_one_request_rebuilds(self):
+        """
+        While another worker holds the rebuild lock the page should be
+        rendered but not stored.
+        """
+        request_path = '/games/'
+        key = page_cache._key(self.client.get(request_path).wsgi_request,
+                              versions.get_many([versions.CATALOG]))
+        caches['pages'].clear()
+        caches['pages'].add(key + ':lock', 1)
+
+        response = self.client.get(request_path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(caches['pages'].get(key), None)
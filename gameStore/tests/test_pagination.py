@@ -0,0 +1,82 @@
+from django.test import TestCase, Client
+from gameStore.models import Game, GameCategory
+from gameStore import pagination
+from django.contrib.auth.models import User
+import base64
+import json
+
+class PaginationTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer = User.objects.create_user('developer')
+        self.category = GameCategory.objects.create(name='action')
+        self.games = []
+        for price in [5, 3, 5, 1, 3, 5, 2]:
+            game = Game.objects.create(name='Game {}'.format(len(self.games)), price=price,
+            URL='http://webcourse.cs.hut.fi/example_game.html',
+            developer=self.developer)
+            self.games.append(game)
+        for game in self.games[:5]:
+            game.categories.add(self.category)
+
+    def walk(self, queryset, ordering, size):
+        pages = []
+        cursor = None
+        while True:
+            page = pagination.paginate(queryset, ordering, cursor, size)
+            pages.append([game.pk for game in page.items])
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_cover_listing_in_order(self):
+        """
+        Walking the cursors should visit every game once, in order.
+        """
+        by_price = sorted(self.games, key=lambda game: (game.price, game.pk))
+        pages = self.walk(Game.objects.all(), 'price', 3)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sum(pages, []), [game.pk for game in by_price])
+
+        recent = sorted(self.games, key=lambda game: (game.created, game.pk), reverse=True)
+        self.assertEqual(sum(self.walk(Game.objects.all(), 'recent', 2), []),
+                         [game.pk for game in recent])
+
+    def test_page_queries_are_constant(self):
+        """
+        A page should cost one query for the games and one for their
+        categories.
+        """
+        cursor = pagination.paginate(Game.objects.all(), 'price', None, 2).next_cursor
+        with self.assertNumQueries(2):
+            page = pagination.paginate(Game.objects.all(), 'price', cursor, 2)
+            [list(game.categories.all()) for game in page.items]
+
+    def test_invalid_cursor(self):
+        """
+        Malformed cursors should be rejected.
+        Should return HTTP 400 - Bad Request.
+        """
+        self.assertEqual(self.client.get('/games/', {'after': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get('/games/', {'order': 'name'}).status_code, 400)
+        for ordering, values in [('price', ['free', 1]), ('price', [1, True]),
+                                 ('recent', ['2016-13-45T00:00:00', 1])]:
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+            response = self.client.get('/games/', {'order': ordering, 'after': cursor})
+            self.assertEqual(response.status_code, 400)
+
+    def test_json_listing(self):
+        """
+        The JSON listing should page through a category.
+        Should return HTTP 200 - OK.
+        """
+        response = self.client.get('/api/games/', {'category': 'action', 'order': 'price'})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([game['price'] for game in data['games']], [1, 3, 3, 5, 5])
+        self.assertEqual(data['games'][0]['categories'], ['action'])
+        # The game itself is only for its buyers and developer
+        self.assertNotIn('URL', data['games'][0])
+        self.assertEqual(data['next'], None)
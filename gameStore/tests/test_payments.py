@@ -0,0 +1,102 @@
+from django.test import TestCase, Client, override_settings
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from gameStore.models import Game, SalesRollup, Transaction
+from gameStore import payments
+from datetime import timedelta
+from hashlib import md5
+from io import StringIO
+
+class PaymentTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer = User.objects.create_user('developer')
+        self.player = User.objects.create_user('player')
+        self.game = Game.objects.create(name='Game', price=10,
+        URL='http://webcourse.cs.hut.fi/example_game.html', developer=self.developer)
+        self.client.force_login(self.player)
+
+    def result(self, transaction, result):
+        checksum_string = "pid={}&ref={}&result={}&token={}".format(transaction.pk,
+            'ref', result, settings.PAYMENT_SERVICE_SECRET_KEY)
+        return self.client.get('/payment/', {'pid': transaction.pk, 'ref': 'ref', 'result': result,
+            'checksum': md5(checksum_string.encode("ascii")).hexdigest()})
+
+    def test_checkout_reuses_pending_transaction(self):
+        """
+        Repeated checkouts of a game should reuse the pending transaction.
+        """
+        for _ in range(3):
+            response = self.client.get('/games/{}/r/'.format(self.game.pk))
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+        Transaction.objects.update(created_at=timezone.now() - timedelta(days=1))
+        self.client.get('/games/{}/r/'.format(self.game.pk))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_results_are_handled_once(self):
+        """
+        A repeated success should not count the sale twice and a failure
+        should keep the transaction as failed.
+        """
+        transaction = Transaction.objects.create(game=self.game, price=10,
+            payer=self.player, seller=self.developer)
+        for _ in range(2):
+            response = self.result(transaction, 'success')
+            self.assertTrue(response.context['success'])
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).status, Transaction.PAID)
+        self.assertEqual(SalesRollup.objects.get().count, 1)
+        self.assertTrue(self.player.owned_games.filter(pk=self.game.pk).exists())
+
+        transaction = Transaction.objects.create(game=self.game, price=10,
+            payer=self.player, seller=self.developer)
+        response = self.result(transaction, 'cancel')
+        self.assertFalse(response.context['success'])
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).status, Transaction.FAILED)
+        response = self.result(transaction, 'success')
+        self.assertFalse(response.context['success'])
+
+    def test_failed_grant_can_be_retried(self):
+        """
+        If granting the game fails, the payment should stay pending so that
+        a repeated result grants it.
+        """
+        transaction = Transaction.objects.create(game=self.game, price=10,
+            payer=self.player, seller=self.developer)
+
+        def broken(payer_id, game_ids):
+            raise RuntimeError('grant failed')
+        self.addCleanup(setattr, payments, 'grant_games', payments.grant_games)
+        grant_games, payments.grant_games = payments.grant_games, broken
+        with self.assertRaises(RuntimeError):
+            self.result(transaction, 'success')
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).status, Transaction.PENDING)
+
+        payments.grant_games = grant_games
+        self.assertTrue(self.result(transaction, 'success').context['success'])
+        self.assertTrue(self.player.owned_games.filter(pk=self.game.pk).exists())
+        self.assertEqual(SalesRollup.objects.get().count, 1)
+
+    @override_settings(PAYMENT_PENDING_TIMEOUT=60, PAYMENT_ABANDONED_RETENTION_DAYS=1)
+    def test_reaping(self):
+        """
+        Stale checkouts should expire and old abandoned ones be deleted.
+        """
+        now = timezone.now()
+        for age, status in [(timedelta(0), Transaction.PENDING),
+                            (timedelta(hours=1), Transaction.PENDING),
+                            (timedelta(hours=2), Transaction.PENDING),
+                            (timedelta(days=2), Transaction.FAILED),
+                            (timedelta(days=2), Transaction.PAID)]:
+            transaction = Transaction.objects.create(game=self.game, price=10,
+                payer=self.player, seller=self.developer)
+            Transaction.objects.filter(pk=transaction.pk).update(created_at=now - age, status=status)
+
+        call_command('reap_transactions', batch_size=1, pause=0, stdout=StringIO())
+        self.assertEqual(sorted(Transaction.objects.values_list('status', flat=True)),
+                         ['expired', 'expired', 'paid', 'pending'])
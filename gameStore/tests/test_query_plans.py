@@ -0,0 +1,34 @@
+from django.test import TestCase
+from gameStore.models import Game, HighScore
+from gameStore import query_plans, seed
+
+class QueryPlanTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed.seed(seed.counts(0.01, developers=2, players=30, games=10, transactions=60), seed=1)
+
+    def test_views_use_indexes(self):
+        """
+        No query of any route should scan or sort a table without an index,
+        other than the findings listed in query_plans.ALLOWED.
+        """
+        statements = query_plans.capture()
+        self.assertGreater(len(statements), 50)
+        self.assertEqual([str(finding) for finding in query_plans.check(statements)], [])
+
+    def test_unindexed_queries_are_found(self):
+        """
+        Filtering or ordering on a column without an index should be reported.
+        """
+        filtered = str(HighScore.objects.filter(score=10).query)
+        ordered = str(Game.objects.filter(developer_id=1).order_by('modified').query)
+        findings = query_plans.check({filtered: {'game'}, ordered: {'game'}})
+        self.assertEqual([(finding.problem, finding.table) for finding in findings],
+                         [(query_plans.FULL_SCAN, 'gameStore_highscore'),
+                          (query_plans.SORT, 'gameStore_game')])
+
+        # Allowed only in the route it is expected in
+        listing = str(Game.objects.all().query)
+        self.assertEqual(query_plans.check({listing: {'high_scores'}}), [])
+        self.assertEqual(len(query_plans.check({listing: {'high_scores', 'game'}})), 1)
@@ -0,0 +1,92 @@
+from django.test import TestCase, Client
+from gameStore.models import Game, BestScore
+from gameStore import ranking
+from django.contrib.auth.models import User
+import json
+
+class RankingTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer = User.objects.create_user('developer')
+        self.game = Game.objects.create(name='Duke Nukem', price=25,
+        URL='http://webcourse.cs.hut.fi/example_game.html',
+        developer=self.developer)
+
+        self.players = [User.objects.create_user('player{}'.format(i)) for i in range(6)]
+        # player3 and player4 share a score
+        for player, score in zip(self.players, [60, 50, 40, 30, 30, 10]):
+            ranking.record_score(self.game, player, score)
+
+    def test_only_best_score_is_kept(self):
+        """
+        Lower scores should not replace a user's best score.
+        """
+        ranking.record_score(self.game, self.players[0], 5)
+        ranking.record_scores([(self.game.pk, self.players[5].pk, 20),
+                               (self.game.pk, self.players[5].pk, 70)])
+
+        self.assertEqual(BestScore.objects.get(game=self.game, user=self.players[0]).score, 60)
+        self.assertEqual(BestScore.objects.get(game=self.game, user=self.players[5]).score, 70)
+        self.assertEqual(BestScore.objects.filter(game=self.game).count(), 6)
+
+    def test_rank_of_user(self):
+        """
+        Players with equal scores should share a rank.
+        """
+        self.assertEqual(ranking.rank(self.game, self.players[0]), (1, 60))
+        self.assertEqual(ranking.rank(self.game, self.players[3]), (4, 30))
+        self.assertEqual(ranking.rank(self.game, self.players[4]), (4, 30))
+        self.assertEqual(ranking.rank(self.game, self.players[5]), (6, 10))
+        self.assertEqual(ranking.rank(self.game, self.developer), None)
+
+    def test_window_around_user(self):
+        """
+        The window should contain the neighbours above and below the user.
+        """
+        window = ranking.window_around_user(self.game, self.players[3], 2)
+        self.assertEqual([(rank, best.user.username) for rank, best in window],
+                         [(2, 'player1'), (3, 'player2'), (4, 'player3'),
+                          (4, 'player4'), (6, 'player5')])
+
+    def test_window_around_rank(self):
+        """
+        The window around the first place should be cut at the top.
+        """
+        window = ranking.window_around_rank(self.game, 1, 1)
+        self.assertEqual([(rank, best.score) for rank, best in window], [(1, 60), (2, 50)])
+        self.assertEqual(ranking.window_around_rank(self.game, 10, 1), [])
+
+    def test_rank_endpoint(self):
+        """
+        The rank endpoint should return the current user's rank as JSON.
+        Should return HTTP 200 - OK.
+        """
+        self.client.force_login(self.players[2])
+        response = self.client.get('/highscores/{}/rank/'.format(self.game.pk), {'radius': 1})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['rank'], 3)
+        self.assertEqual([row['user'] for row in data['window']], ['player1', 'player2', 'player3'])
+
+    def test_rank_endpoint_unauthenticated(self):
+        """
+        Unauthenticated users should be able to look at a given rank.
+        Should return HTTP 200 - OK.
+        """
+        response = self.client.get('/highscores/{}/rank/'.format(self.game.pk), {'rank': 6, 'radius': 1})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['rank'], None)
+        self.assertEqual([row['score'] for row in data['window']], [30, 10])
+
+    def test_rank_endpoint_negative_radius(self):
+        """
+        A negative radius should be treated as zero, showing only the rank.
+        Should return HTTP 200 - OK.
+        """
+        response = self.client.get('/highscores/{}/rank/'.format(self.game.pk), {'rank': 2, 'radius': -1})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([row['score'] for row in data['window']], [50])
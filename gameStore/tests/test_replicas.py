@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+from gameStore.models import Game
+from gameStore.replicas import PIN_COOKIE
+import os
+import shutil
+import tempfile
+
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaTestCase(TestCase):
+    """
+    The test database is the primary, a copy of it in a second SQLite file
+    the replica. Rows written to one are missing from the other, like on a
+    lagging replica.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        path = os.path.join(cls.directory, 'replica.sqlite3')
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [path])
+        connections.databases['replica'] = dict(connection.settings_dict, NAME=path, POOL=None)
+        super(ReplicaTestCase, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(ReplicaTestCase, cls).tearDownClass()
+        connections['replica'].close()
+        del connections._connections.replica
+        del connections.databases['replica']
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        self.developer = User.objects.create_user('developer', password='password')
+        self.player = User.objects.create_user('player', password='password')
+        self.game = Game.objects.create(name='Primary Quest', price=0, developer=self.developer,
+                                        URL='http://webcourse.cs.hut.fi/example_game.html')
+        self.game.users.add(self.player)
+        for user in [self.developer, self.player]:
+            user.save(using='replica')
+        self.addCleanup(User.objects.using('replica').all().delete)
+        Game.objects.using('replica').create(pk=self.game.pk, name='Replica Quest', price=0,
+                                             developer_id=self.developer.pk, URL=self.game.URL)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        """
+        Read-only views should read from the replica until the client
+        writes, and then from the primary until the pin cookie expires.
+        """
+        path = '/games/{}/'.format(self.game.pk)
+        self.assertContains(self.client.get(path), 'Replica Quest')
+
+        self.client.login(username='player', password='password')
+        response = self.client.post('/games/save/', {'game': 'Primary Quest', 'state': '{}'},
+                                    **AJAX)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertContains(self.client.get(path), 'Primary Quest')
+        self.assertEqual(len(self.client.get('/api/search/', {'q': 'quest'}).json()['games']), 1)
+
+        del self.client.cookies[PIN_COOKIE]
+        self.assertContains(self.client.get(path), 'Replica Quest')
+        # Other views always read from the primary
+        self.assertEqual(self.client.get('/games/load/', {'game': 'Primary Quest'},
+                                         **AJAX).status_code, 200)
+
+    def test_without_replicas(self):
+        """
+        Without replicas every read should use the primary and writes should
+        not pin the client.
+        """
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertContains(self.client.get('/games/{}/'.format(self.game.pk)),
+                                'Primary Quest')
+            self.client.login(username='player', password='password')
+            response = self.client.post('/games/save/', {'game': 'Primary Quest', 'state': '{}'},
+                                        **AJAX)
+            self.assertNotIn(PIN_COOKIE, response.cookies)
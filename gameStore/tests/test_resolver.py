@@ -0,0 +1,76 @@
+from django.test import TestCase, Client, override_settings
+from gameStore.models import Game, GameCategory
+from gameStore import resolver, versions
+from django.contrib.auth.models import User
+
+@override_settings(GAME_RESOLVER_SIZE=2, GAME_RESOLVER_VERSION_CHECK=60)
+class ResolverTestCase(TestCase):
+
+    def setUp(self):
+
+        self.developer = User.objects.create_user('developer')
+        self.category = GameCategory.objects.create(name='action')
+        self.games = []
+        for name in ['Duke Nukem', 'Doom', 'Quake']:
+            game = Game.objects.create(name=name, price=25,
+            URL='http://example.com/{}.html'.format(name.lower().replace(' ', '')),
+            developer=self.developer)
+            self.games.append(game)
+        self.games[0].categories.add(self.category)
+
+        self.resolver = resolver.GameResolver()
+
+    def test_cached_lookups(self):
+        """
+        Repeated lookups should be answered from the cache.
+        """
+        game = self.resolver.by_name('Duke Nukem')
+        self.assertEqual(game.pk, self.games[0].pk)
+        self.assertEqual(game.categories, ('action',))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolver.by_name('Duke Nukem').pk, self.games[0].pk)
+        self.assertEqual(self.resolver.by_url('http://example.com/doom.html').pk, self.games[1].pk)
+        self.assertEqual(self.resolver.by_name('Missing'), None)
+        self.assertEqual((self.resolver.hits, self.resolver.misses), (1, 3))
+
+    def test_least_recently_used_is_evicted(self):
+        """
+        The cache should not grow beyond GAME_RESOLVER_SIZE entries.
+        """
+        self.resolver.by_name('Duke Nukem')
+        self.resolver.by_name('Doom')
+        self.resolver.by_name('Duke Nukem')
+        self.resolver.by_name('Quake')
+        self.assertEqual(self.resolver.stats()['size'], 2)
+        with self.assertNumQueries(0):
+            self.resolver.by_name('Duke Nukem')
+        with self.assertNumQueries(2):
+            self.resolver.by_name('Doom')
+
+    def test_edits_invalidate_other_processes(self):
+        """
+        Editing a game should bump the version so that caches of other
+        processes reload the game once they check the version.
+        """
+        self.resolver.by_name('Doom')
+        before = versions.get(resolver.VERSION_NAME)
+        self.games[1].name = 'Doom II'
+        self.games[1].save()
+        self.assertEqual(versions.get(resolver.VERSION_NAME), before + 1)
+
+        # Still within the check interval of the other process
+        self.assertEqual(self.resolver.by_name('Doom').name, 'Doom')
+        self.resolver._checked = 0
+        self.assertEqual(self.resolver.by_name('Doom'), None)
+        self.assertEqual(self.resolver.by_name('Doom II').pk, self.games[1].pk)
+
+    def test_score_for_unknown_game(self):
+        """
+        Gameplay messages for unknown games should not crash.
+        Should return HTTP 404 - Not Found.
+        """
+        client = Client()
+        client.force_login(User.objects.create_user('player'))
+        response = client.post('/highscores/newScore/', {'game': 'Missing', 'score': 1},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 404)
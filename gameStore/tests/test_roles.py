@@ -0,0 +1,48 @@
+from django.test import TestCase, Client, RequestFactory
+from django.contrib.auth.models import AnonymousUser, Group, User
+from gameStore.roles import Roles, RolesMiddleware
+
+class RolesTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer_group = Group.objects.create(name='Developer')
+        self.developer = User.objects.create_user('developer')
+        self.developer.groups.add(self.developer_group)
+        self.normal_user = User.objects.create_user('normal_user')
+
+    def roles_for(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        RolesMiddleware().process_request(request)
+        return request.roles
+
+    def test_roles_are_resolved_once(self):
+        """
+        The groups of a user should be queried only once per request.
+        """
+        roles = self.roles_for(self.developer)
+        with self.assertNumQueries(1):
+            self.assertTrue(roles.is_developer)
+            self.assertTrue('Developer' in roles)
+        self.assertFalse(self.roles_for(self.normal_user).is_developer)
+
+    def test_anonymous_users_have_no_roles(self):
+        """
+        Anonymous users should not cause any queries.
+        """
+        with self.assertNumQueries(0):
+            roles = self.roles_for(AnonymousUser())
+            self.assertFalse(roles.is_developer)
+            self.assertEqual(len(roles), 0)
+
+    def test_anonymous_index_without_queries(self):
+        """
+        The front page should not hit the database for anonymous users.
+        Should return HTTP 200 - OK.
+        """
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['roles'], Roles())
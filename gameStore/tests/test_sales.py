@@ -0,0 +1,77 @@
+from django.test import TestCase, Client
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.utils import timezone
+from gameStore.models import Game, SalesRollup, Transaction
+from gameStore import sales
+from hashlib import md5
+from io import StringIO
+
+class SalesTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        developer_group = Group.objects.create(name='Developer')
+        self.developer = User.objects.create_user('developer')
+        self.developer.groups.add(developer_group)
+        self.first_player = User.objects.create_user('first_player')
+        self.second_player = User.objects.create_user('second_player')
+
+        self.first_game = Game.objects.create(name='First', price=15,
+        URL='http://webcourse.cs.hut.fi/example_game.html', developer=self.developer)
+        self.second_game = Game.objects.create(name='Second', price=5,
+        URL='http://webcourse.cs.hut.fi/example_game.html', developer=self.developer)
+
+    def buy(self, player, game):
+        transaction = Transaction.objects.create(game=game, price=game.price,
+            payer=player, seller=self.developer)
+        checksum_string = "pid={}&ref={}&result={}&token={}".format(transaction.pk,
+            'ref', 'success', settings.PAYMENT_SERVICE_SECRET_KEY)
+        self.client.force_login(player)
+        response = self.client.get('/payment/', {'pid': transaction.pk, 'ref': 'ref',
+            'result': 'success', 'checksum': md5(checksum_string.encode("ascii")).hexdigest()})
+        self.assertEqual(response.status_code, 200)
+
+    def test_purchases_update_rollups(self):
+        """
+        Completed purchases should be summed into one row per game and day.
+        """
+        self.buy(self.first_player, self.first_game)
+        self.buy(self.second_player, self.first_game)
+        self.buy(self.first_player, self.second_game)
+
+        self.assertEqual(SalesRollup.objects.count(), 2)
+        self.assertEqual(sales.totals(self.developer), {'count': 3, 'revenue': 35})
+        self.assertEqual([(row['game_id'], row['count'], row['revenue'])
+                          for row in sales.by_game(self.developer)],
+                         [(self.first_game.pk, 2, 30), (self.second_game.pk, 1, 5)])
+        daily = sales.daily(self.developer, days=7)
+        self.assertEqual(len(daily), 7)
+        self.assertEqual(daily[-1]['day'], timezone.localtime(timezone.now()).date())
+        self.assertEqual((daily[-1]['count'], daily[-1]['revenue']), (3, 35))
+
+    def test_rebuild_counts_only_completed_purchases(self):
+        """
+        The backfill should skip transactions whose payment never completed.
+        """
+        self.buy(self.first_player, self.first_game)
+        Transaction.objects.create(game=self.second_game, price=5,
+            payer=self.second_player, seller=self.developer)
+        SalesRollup.objects.all().delete()
+
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(sales.totals(self.developer), {'count': 1, 'revenue': 15})
+
+    def test_dashboard_statistics(self):
+        """
+        The dashboard should show the totals from the rollups.
+        Should return HTTP 200 - OK.
+        """
+        self.buy(self.first_player, self.first_game)
+        self.client.force_login(self.developer)
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['totals'], {'count': 1, 'revenue': 15})
+        self.assertEqual(len(response.context['transactions']), 1)
@@ -0,0 +1,107 @@
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
+from gameStore.models import Game, Save, SaveSlot
+from gameStore import saves, state_storage
+from django.contrib.auth.models import User
+import datetime
+import json
+
+class SaveTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer = User.objects.create_user('developer')
+        self.player = User.objects.create_user('player')
+        self.other_player = User.objects.create_user('other_player')
+        self.game = Game.objects.create(name='Duke Nukem', price=25,
+        URL='http://webcourse.cs.hut.fi/example_game.html',
+        developer=self.developer)
+
+    def load(self):
+        response = self.client.get('/games/load/', {'game': self.game.name},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        if response.streaming:
+            return json.loads(b''.join(response.streaming_content).decode('utf-8'))
+        return json.loads(response.content.decode('utf-8'))
+
+    def stored_states(self, **filters):
+        return sorted(state_storage.decode(state) for state in
+                      Save.objects.filter(**filters).values_list('state', flat=True))
+
+    def test_load_latest_save(self):
+        """
+        Loading should return the state of the latest save.
+        """
+        self.client.force_login(self.player)
+        self.assertEqual(self.load(), {'found': 0})
+
+        for state in ['{"level": 1}', '{"level": 2}']:
+            self.client.post('/games/save/', {'game': self.game.name, 'state': state},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(self.load(), {'found': 1, 'state': '{"level": 2}'})
+        self.assertEqual(SaveSlot.objects.count(), 1)
+        self.assertEqual(Save.objects.count(), 2)
+
+    @override_settings(SAVE_RETENTION_KEEP_LAST=2, SAVE_RETENTION_DAYS=None)
+    def test_compact_keeps_last_saves(self):
+        """
+        Compaction should keep only the newest saves of each player.
+        """
+        saves.store([(self.game.pk, self.player.pk, str(i)) for i in range(5)])
+        saves.store([(self.game.pk, self.other_player.pk, 'a')])
+
+        self.assertEqual(saves.compact(batch_size=2), 3)
+        self.assertEqual(self.stored_states(user=self.player), ['3', '4'])
+        self.assertEqual(Save.objects.filter(user=self.other_player).count(), 1)
+
+    @override_settings(SAVE_RETENTION_KEEP_LAST=None, SAVE_RETENTION_DAYS=30)
+    def test_compact_drops_old_saves(self):
+        """
+        Compaction should drop saves older than the retention period but
+        keep the state in the slot.
+        """
+        saves.store([(self.game.pk, self.player.pk, 'old'), (self.game.pk, self.player.pk, 'new')])
+        Save.objects.filter(pk=Save.objects.order_by('pk').first().pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=31))
+
+        self.assertEqual(saves.compact(batch_size=10), 1)
+        self.assertEqual(self.stored_states(), ['new'])
+        self.assertEqual(saves.latest_state(self.player, self.game), 'new')
+
+    def test_large_state_roundtrip(self):
+        """
+        States larger than the old 255 character limit should be stored
+        compressed and loaded back unchanged.
+        """
+        state = json.dumps({'map': ['\u00e4' * 100 + str(i) for i in range(500)]})
+        self.client.force_login(self.player)
+        self.client.post('/games/save/', {'game': self.game.name, 'state': state},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertLess(len(Save.objects.get().state), len(state))
+        self.assertEqual(self.load(), {'found': 1, 'state': state})
+
+    @override_settings(SAVE_STATE_MAX_BYTES=10)
+    def test_too_large_state_is_rejected(self):
+        """
+        States over SAVE_STATE_MAX_BYTES should not be stored.
+        Should return HTTP 413 - Payload Too Large.
+        """
+        self.client.force_login(self.player)
+        response = self.client.post('/games/save/', {'game': self.game.name, 'state': 'x' * 11},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(Save.objects.count(), 0)
+
+    def test_state_storage_chunks(self):
+        """
+        Decoding in small chunks should not split multi-byte characters.
+        """
+        state = '\u00e4\u20ac' * 5000
+        for blob in [state_storage.encode(state), state_storage.encode('\u20ac')]:
+            chunks = list(state_storage.iter_decode(blob, chunk_size=7))
+            self.assertEqual(''.join(chunks), state_storage.decode(blob))
+        self.assertEqual(state_storage.decode(state_storage.encode(state)), state)
+        self.assertEqual(state_storage.encode('ab')[:1], state_storage.RAW)
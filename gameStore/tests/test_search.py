@@ -0,0 +1,69 @@
+from django.test import TestCase, Client
+from gameStore.models import Game, GameCategory
+from gameStore import search
+from django.contrib.auth.models import User
+import json
+
+class SearchTestCase(TestCase):
+
+    def setUp(self):
+
+        self.client = Client()
+        self.developer = User.objects.create_user('developer')
+        self.shooter = GameCategory.objects.create(name='shooter')
+        self.puzzle = GameCategory.objects.create(name='puzzle')
+
+        self.doom = Game.objects.create(name='Doom', price=15,
+        URL='http://webcourse.cs.hut.fi/example_game.html',
+        description='Demons from Mars', developer=self.developer)
+        self.doom.categories.add(self.shooter)
+        self.tetris = Game.objects.create(name='Tetris', price=5,
+        URL='http://webcourse.cs.hut.fi/example_game.html',
+        description='Falling blocks, not a doom clone', developer=self.developer)
+        self.tetris.categories.add(self.puzzle)
+
+    def names(self, query):
+        return [game.name for game in search.search(query)]
+
+    def test_ranked_prefix_search(self):
+        """
+        Prefix queries should match and name matches should rank first.
+        """
+        self.assertEqual(self.names('doo'), ['Doom', 'Tetris'])
+        self.assertEqual(self.names('fall bl'), ['Tetris'])
+        self.assertEqual(self.names('mars shooter'), ['Doom'])
+        self.assertEqual(self.names('quake'), [])
+        self.assertEqual(self.names(''), [])
+
+    def test_index_follows_edits(self):
+        """
+        Editing, recategorising and deleting games should update the index.
+        """
+        self.doom.name = 'Quake'
+        self.doom.save()
+        self.assertEqual(self.names('quake'), ['Quake'])
+
+        self.tetris.categories.add(self.shooter)
+        self.assertEqual(sorted(self.names('shoot')), ['Quake', 'Tetris'])
+        self.shooter.name = 'action'
+        self.shooter.save()
+        self.assertEqual(self.names('shoot'), [])
+        self.assertEqual(sorted(self.names('action')), ['Quake', 'Tetris'])
+
+        self.puzzle.delete()
+        self.assertEqual(self.names('puzzle'), [])
+        self.tetris.delete()
+        self.assertEqual(self.names('blocks'), [])
+
+    def test_search_endpoints(self):
+        """
+        Search should be available as a page and as JSON.
+        Should return HTTP 200 - OK.
+        """
+        response = self.client.get('/search/', {'q': 'tetr'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([game.pk for game in response.context['games']], [self.tetris.pk])
+
+        response = self.client.get('/api/search/', {'q': 'demons'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([game['id'] for game in data['games']], [self.doom.pk])
@@ -27,16 +27,28 @@ urlpatterns = [
     url(r'^games/create/$', views.create_game, name="create_game"),
     url(r'^games/save/$', views.save_game, name="save_game"),
     url(r'^games/load/$', views.load_game, name="load_game"),
+    url(r'^games/events/$', views.game_events, name="game_events"),
     url(r'^games/(?P<game_id>[0-9]+)/$', views.game, name="game"),
     url(r'^games/(?P<game_id>[0-9]+)/edit/$', views.edit_game, name="edit_game"),
     url(r'^games/(?P<game_id>[0-9]+)/delete/$', views.delete_game, name="delete_game"),
     url(r'^games/(?P<game_id>[0-9]+)/buy/$', views.payment_form, name="payment_form"),
     url(r'^games/(?P<game_id>[0-9]+)/r/$', views.payment_redirect, name="payment_redirect"),
     url(r'^games/(?P<category>[a-zA-Z]+)/$', views.browse_game_category, name='browse_game_category'),
+    url(r'^api/games/$', views.game_list, name="game_list"),
+    url(r'^api/search/$', views.search_api, name="search_api"),
+    url(r'^search/$', views.search_games, name="search_games"),
     url(r'^highscores/$', views.browse_high_scores, name="high_scores"),
     url(r'^highscores/(?P<game_id>[0-9]+)/$', views.high_scores_for_game, name="high_scores_for_game"),
+    url(r'^highscores/(?P<game_id>[0-9]+)/rank/$', views.rank_for_game, name="rank_for_game"),
+    url(r'^highscores/(?P<game_id>[0-9]+)/live/$', views.leaderboard_stream, name="leaderboard_stream"),
     url(r'^highscores/newScore/$', views.new_score, name="new_score"),
-    url(r'^dashboard/$', views.developer_dashboard),
+    url(r'^dashboard/$', views.developer_dashboard, name="developer_dashboard"),
+    url(r'^dashboard/transactions\.(?P<export_format>csv|jsonl)$', views.export_transactions, name="export_transactions"),
+    url(r'^metrics/$', views.metrics_view, name="metrics"),
     url(r'^payment/$', views.payment_result, name="payment_result"),
+    url(r'^cart/$', views.view_cart, name="cart"),
+    url(r'^cart/add/(?P<game_id>[0-9]+)/$', views.add_to_cart, name="add_to_cart"),
+    url(r'^cart/remove/(?P<game_id>[0-9]+)/$', views.remove_from_cart, name="remove_from_cart"),
+    url(r'^cart/checkout/$', views.cart_checkout, name="cart_checkout"),
     url(r'^', include('django.contrib.auth.urls')),
 ]
@@ -0,0 +1,46 @@
+"""
+Version stamps shared between worker processes.
+
+Processes that cache data in memory remember the version they loaded it at
+and reload once the stored version has moved on. Writers bump the version
+after changing the data.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import CacheVersion
+
+# Bumped whenever a Game or GameCategory changes
+CATALOG = 'catalog'
+# Bumped whenever a leaderboard changes
+LEADERBOARDS = 'leaderboards'
+
+
+def get(name):
+    """
+    Current version of the named data, 0 if it was never bumped.
+    """
+    version = CacheVersion.objects.filter(name=name).values_list('version', flat=True).first()
+    return version or 0
+
+
+def get_many(names):
+    """
+    Current versions of the named data as a tuple, in a single query.
+    """
+    found = dict(CacheVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    return tuple(found.get(name, 0) for name in names)
+
+
+def bump(name):
+    """
+    Move the named data to a new version.
+    """
+    if CacheVersion.objects.filter(name=name).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            CacheVersion.objects.create(name=name, version=1)
+    except IntegrityError:
+        # Created by another process in between
+        CacheVersion.objects.filter(name=name).update(version=F('version') + 1)
@@ -1,13 +1,22 @@
 
 from .models import Game, GameCategory, Transaction, HighScore, Save
 from .forms import PaymentForm, GameForm
+from . import cart, exports, ingest, leaderboard, live, metrics, ownership, pagination, payments, ranking, replicas, resolver, sales, saves, search, state_storage, versions
+from .page_cache import cache_anonymous_page
+from .replicas import replica_reads
 from django.shortcuts import get_object_or_404, render, redirect
+from django.db.transaction import atomic
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect, HttpResponseForbidden, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponseForbidden, HttpResponse, StreamingHttpResponse, Http404
 import json
 from django.conf import settings
+from django.utils.crypto import constant_time_compare
 import logging
 
+# Number of latest transactions listed on the developer dashboard
+RECENT_TRANSACTIONS = 20
+
+@replica_reads
 def game(request, game_id):
     """
     View for a specific game. Description is accessible to all users, but
@@ -19,47 +28,138 @@ def game(request, game_id):
     is_developer = False
     developed_game = False
     if request.user.is_authenticated():
-        bought_game = request.user.owned_games.filter(pk=game.pk).exists()
-        developed_game = request.user.developed_games.filter(pk=game.pk).exists()
-        is_developer = request.user.groups.filter(name='Developer').exists()
+        user_ownership = ownership.for_request(request)
+        bought_game = user_ownership.owns(game.pk)
+        developed_game = user_ownership.develops(game.pk)
+        is_developer = request.roles.is_developer
 
     return render(request, 'game.html', {'user': request.user, 'game': game,
     'developed_game': developed_game, 'bought_game': bought_game,
-    'is_developer': is_developer})
+    'is_developer': is_developer, 'live_updates': live.enabled(),
+    'max_events': getattr(settings, 'INGEST_MAX_EVENTS', 500)})
+
+
+def _resolve_game(name):
+    current_game = resolver.games.by_name(name)
+    if current_game is None:
+        raise Http404('No game named {}'.format(name))
+    return current_game
 
 
 @login_required
 def new_score(request):
-    current_user = request.user
-    current_game = Game.objects.get(name=request.POST.get('game'))
     if request.is_ajax():
-        score = HighScore.objects.create(score=request.POST.get('score'), user=current_user, game=current_game)
-        return HttpResponse("Success")
+        return record_new_score(request)
 
 
 @login_required
 def save_game(request):
-    current_user = request.user
-    current_game = Game.objects.get(name=request.POST.get('game'))
     if request.is_ajax():
-        save = Save.objects.create(game_state=request.POST.get('state'), user=current_user, game=current_game)
-        return HttpResponse("Success")
+        return store_save(request)
+
+
+def record_new_score(request):
+    """
+    Queues a score of the current user. The work of new_score once the
+    request is authenticated, shared with gameStore.asgi.
+    """
+    current_game = _resolve_game(request.POST.get('game'))
+    ingest.queue.put([(current_game.pk, request.user.pk, int(request.POST.get('score')))])
+    # Written in the background, but the player should see it
+    replicas.written()
+    return HttpResponse("Success")
+
+
+def store_save(request):
+    """
+    Stores a game state of the current user, see record_new_score.
+    """
+    current_game = _resolve_game(request.POST.get('game'))
+    game_state = request.POST.get('state')
+    if state_storage.too_large(game_state):
+        return HttpResponse(status=413)
+    ingest.write_saves([(current_game.pk, request.user.pk, game_state)])
+    return HttpResponse("Success")
+
+
+@login_required
+def game_events(request):
+    """
+    Batched version of new_score and save_game. Takes a JSON body of the form
+    {"game": name, "events": [{"type": "SCORE", "score": 1},
+    {"type": "SAVE", "state": "..."}, ...]} and returns the number of queued
+    events and the length of the score queue. Pages being closed send the
+    batch with navigator.sendBeacon instead, which cannot set headers, as
+    the form fields game and events, the latter holding the JSON list.
+    """
+    if request.method != 'POST':
+        return HttpResponse(status=400)
+
+    try:
+        if request.is_ajax():
+            body = json.loads(request.body.decode('utf-8'))
+        elif 'events' in request.POST:
+            body = {'game': request.POST.get('game'),
+                    'events': json.loads(request.POST['events'])}
+        else:
+            return HttpResponse(status=400)
+        current_game = resolver.games.by_name(body['game'])
+        if current_game is None:
+            raise KeyError(body['game'])
+        events = body['events']
+        if len(events) > getattr(settings, 'INGEST_MAX_EVENTS', 500):
+            return HttpResponse(status=413)
+        new_scores = []
+        new_saves = []
+        for event in events:
+            if event['type'] == 'SCORE':
+                new_scores.append((current_game.pk, request.user.pk, int(event['score'])))
+            elif event['type'] == 'SAVE':
+                if not isinstance(event['state'], str):
+                    raise TypeError('State must be a string')
+                new_saves.append((current_game.pk, request.user.pk, event['state']))
+    except (ValueError, KeyError, TypeError):
+        return HttpResponse(status=400)
+
+    if any(state_storage.too_large(game_state) for _, _, game_state in new_saves):
+        return HttpResponse(status=413)
+
+    if new_saves:
+        ingest.write_saves(new_saves)
+    pending = ingest.queue.put(new_scores) if new_scores else len(ingest.queue)
+
+    data = {'queued': len(new_scores) + len(new_saves), 'pending': pending}
+    return HttpResponse(json.dumps(data), content_type='application/json')
 
 
 @login_required
 def load_game(request):
-    current_user = request.user
-    current_game = Game.objects.get(name=request.GET['game'])
     if request.is_ajax():
-        saves = Save.objects.filter(user=current_user, game=current_game).order_by('-created_at')
-        if saves:
-            data = {'found': 1, 'state': saves.first().game_state}
-            json_data = json.dumps(data)
-            return HttpResponse(json_data)
-        else:
-            data = {'found': 0}
-            json_data = json.dumps(data)
-            return HttpResponse(json_data)
+        return load_save(request)
+
+
+def load_save(request):
+    """
+    The latest game state of the current user, see record_new_score.
+    """
+    current_game = _resolve_game(request.GET.get('game'))
+    blob = saves.latest_blob(request.user, current_game)
+    if blob is None:
+        return HttpResponse(json.dumps({'found': 0}))
+    # Decompressed while the response is written
+    return StreamingHttpResponse(_stream_state(blob))
+
+
+def _stream_state(blob):
+    """
+    Streams {"found": 1, "state": ...} without building the decompressed
+    state as one string.
+    """
+    yield '{"found": 1, "state": "'
+    for chunk in state_storage.iter_decode(blob):
+        # Dumping a chunk escapes it exactly like dumping the whole state
+        yield json.dumps(chunk)[1:-1]
+    yield '"}'
 
 
 @login_required
@@ -69,7 +169,7 @@ def create_game(request):
     a new game or processes a submitted one. Accessible only to users within
     the developer group.
     """
-    is_developer = request.user.groups.filter(name='Developer').exists()
+    is_developer = request.roles.is_developer
     # if this is a POST request we need to process the form data
     if is_developer:
         if request.method == 'POST':
@@ -77,7 +177,8 @@ def create_game(request):
             # check whether it's valid:
             form = GameForm(request.POST)
             if form.is_valid():
-                form.save()
+                new_game = form.save()
+                ownership.add_developed(request, new_game.pk)
                 return HttpResponseRedirect('/games/')
             else:
                 return HttpResponse(status=400)
@@ -137,38 +238,102 @@ def delete_game(request, game_id):
     else:
         return HttpResponseForbidden()
 
+@replica_reads
+@cache_anonymous_page(versions.CATALOG)
 def browse_games(request):
     """
     Listing of all available games. Accessible also to unauthenticated users.
     """
 
+    try:
+        page = _paginate(request, Game.objects.all())
+    except pagination.InvalidCursor:
+        return HttpResponse(status=400)
+
     categories = GameCategory.objects.all()
     cheapest = Game.objects.all().order_by('-price').first()
-    is_developer = request.user.groups.filter(name='Developer').exists()
-    games = Game.objects.all()
+    games = ownership.for_request(request).annotate(page.items)
     recent_games = Game.objects.all().order_by('-created')[:4]
 
-    return render(request, 'browse_games.html', {'games': games,
+    return render(request, 'browse_games.html', {'games': games, 'page': page,
                                                  'categories': categories, 'recent': recent_games, 'cheapest': cheapest})
 
 
+@replica_reads
+@cache_anonymous_page(versions.CATALOG)
 def browse_game_category(request, category):
     """
     Browse games in a given category. Accessible also to unauthenticated users.
     """
     category = get_object_or_404(GameCategory, name=category.lower())
-    games = Game.objects.filter(categories=category)
+    try:
+        page = _paginate(request, Game.objects.filter(categories=category))
+    except pagination.InvalidCursor:
+        return HttpResponse(status=400)
+    games = ownership.for_request(request).annotate(page.items)
 
-    return render(request, 'browse_game_category.html', {'games': games,
+    return render(request, 'browse_game_category.html', {'games': games, 'page': page,
     'category': category})
 
 
+@replica_reads
+def game_list(request):
+    """
+    JSON listing of games, optionally limited to a category, paginated like
+    browse_games. Accessible also to unauthenticated users.
+    """
+    games = Game.objects.all()
+    if request.GET.get('category'):
+        games = games.filter(categories__name=request.GET['category'].lower())
+    try:
+        page = _paginate(request, games)
+    except pagination.InvalidCursor:
+        return HttpResponse(status=400)
+
+    data = {'games': [{'id': game.pk, 'name': game.name, 'price': game.price,
+                       'image': game.image,
+                       'description': game.description,
+                       'created': game.created.isoformat(),
+                       'categories': [category.name for category in game.categories.all()]}
+                      for game in page.items],
+            'next': page.next_cursor}
+    return HttpResponse(json.dumps(data), content_type='application/json')
+
+
+@replica_reads
+def search_games(request):
+    """
+    Full-text search over game names, descriptions and categories.
+    Accessible also to unauthenticated users.
+    """
+    query = request.GET.get('q', '')
+    games = ownership.for_request(request).annotate(search.search(query))
+
+    return render(request, 'search.html', {'games': games, 'query': query})
+
+
+@replica_reads
+def search_api(request):
+    """
+    JSON version of search_games.
+    """
+    games = search.search(request.GET.get('q', ''))
+    data = {'games': [{'id': game.pk, 'name': game.name, 'price': game.price,
+                       'image': game.image, 'description': game.description}
+                      for game in games]}
+    return HttpResponse(json.dumps(data), content_type='application/json')
+
+
+def _paginate(request, games):
+    return pagination.paginate(games, request.GET.get('order'), request.GET.get('after'))
+
+
 @login_required
 def my_games(request):
     """
     List games bought by and accessible to a single user.
     """
-    is_developer = request.user.groups.filter(name='Developer').exists()
+    is_developer = request.roles.is_developer
     if is_developer:
         return redirect(developer_dashboard)
 
@@ -177,24 +342,77 @@ def my_games(request):
     return render(request, 'my_games.html', {'user': request.user, 'games': games})
 
 
+@replica_reads
+@cache_anonymous_page(versions.CATALOG, versions.LEADERBOARDS)
 def browse_high_scores(request):
     """
-    Listing of all high scores of all games. Accessible to all users.
+    Listing of the top high scores of all games. Accessible to all users.
     """
-    high_scores = HighScore.objects.all()
-    games = Game.objects.all()
+    boards = leaderboard.tops()
+    games = list(Game.objects.all())
+    for game in games:
+        game.top_scores = boards.get(game.pk, [])
 
-    return render(request, 'browse_high_scores.html', {'high_scores': high_scores,
-    'games': games})
+    return render(request, 'browse_high_scores.html', {'games': games})
 
+@replica_reads
 def high_scores_for_game(request, game_id):
     """
-    Listing of all high scores for a given game. Accessible to all users.
+    Listing of the top high scores for a given game. Accessible to all users.
+    """
+    current_game = get_object_or_404(Game, pk=game_id)
+    high_scores = leaderboard.top(current_game)
+
+    return render(request, 'high_scores_for_game.html', {'high_scores': high_scores, 'game': current_game,
+                                                         'live_updates': live.enabled()})
+
+
+def leaderboard_stream(request, game_id):
+    """
+    Server-Sent Events stream of a game's top high scores, pushing the new
+    list whenever it changes. Accessible to all users, when live updates
+    are enabled, as a stream holds a sync worker for its whole length.
     """
+    if not live.enabled():
+        raise Http404('Live updates are disabled')
     current_game = get_object_or_404(Game, pk=game_id)
-    high_scores = HighScore.objects.all().filter(game=current_game)
+    response = StreamingHttpResponse(live.stream(current_game.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keeps proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-    return render(request, 'high_scores_for_game.html', {'high_scores': high_scores, 'game': current_game})
+
+def rank_for_game(request, game_id):
+    """
+    JSON view of a player's rank in a game and the scores around it. Shows
+    the window around the given rank, or around the current user if no rank
+    is given. Accessible to all users.
+    """
+    current_game = get_object_or_404(Game, pk=game_id)
+    try:
+        radius = max(0, min(int(request.GET.get('radius', 5)), 50))
+        position = request.GET.get('rank')
+        position = int(position) if position else None
+    except ValueError:
+        return HttpResponse(status=400)
+
+    data = {'game': current_game.pk, 'rank': None, 'score': None}
+    if request.user.is_authenticated():
+        own_rank = ranking.rank(current_game, request.user)
+        if own_rank:
+            data['rank'], data['score'] = own_rank
+
+    if position is not None:
+        window = ranking.window_around_rank(current_game, position, radius)
+    elif request.user.is_authenticated():
+        window = ranking.window_around_user(current_game, request.user, radius)
+    else:
+        window = []
+
+    data['window'] = [{'rank': rank, 'user': best.user.username, 'score': best.score}
+                      for rank, best in window]
+    return HttpResponse(json.dumps(data), content_type='application/json')
 
 
 @login_required
@@ -218,8 +436,7 @@ def payment_redirect(request, game_id):
     if owns_game:
         return redirect('game', game_id)
     else:
-        transaction = Transaction.objects.create(game=game, price=game.price,
-            payer=request.user, seller=game.developer)
+        transaction = payments.checkout(request.user, game)
 
         checksum = transaction.calculate_payment_checksum()
 
@@ -232,6 +449,67 @@ def payment_redirect(request, game_id):
         return render(request, 'payment_redirect.html', {'form': form})
 
 
+@login_required
+def view_cart(request):
+    """
+    The games in the cart of the current user and their total price.
+    """
+    games = cart.games(request)
+
+    return render(request, 'cart.html', {'games': games,
+                                         'total': sum(game.price for game in games)})
+
+
+@login_required
+def add_to_cart(request, game_id):
+    """
+    Adds a game the user does not own yet to the cart.
+    """
+    game = get_object_or_404(Game, pk=game_id)
+    if request.method == 'POST' and not ownership.for_request(request).owns(game.pk):
+        cart.add(request, game.pk)
+
+    return redirect(view_cart)
+
+
+@login_required
+def remove_from_cart(request, game_id):
+    if request.method == 'POST':
+        cart.remove(request, int(game_id))
+
+    return redirect(view_cart)
+
+
+@login_required
+def cart_checkout(request):
+    """
+    Creates one transaction for all the games in the cart the user does not
+    own yet and passes it to the payment service.
+    """
+    games = cart.games(request)
+    if request.method == 'POST' and games:
+        # Checked against the database, as the ownership cached in the
+        # session misses games bought in other sessions
+        owned = set(request.user.owned_games.filter(pk__in=[game.pk for game in games])
+                    .values_list('pk', flat=True))
+        games = [game for game in games if game.pk not in owned]
+    if request.method != 'POST' or not games:
+        return redirect(view_cart)
+
+    transaction = payments.checkout_cart(request.user, games)
+    cart.clear(request)
+
+    checksum = transaction.calculate_payment_checksum()
+
+    form = PaymentForm(initial={'pid': transaction.pk, 'checksum': checksum,
+        'amount': transaction.price, 'sid': settings.PAYMENT_SERVICE_SELLER_ID,
+        'success_url': settings.PAYMENT_RESULT_URL,
+        'cancel_url': settings.PAYMENT_RESULT_URL,
+        'error_url': settings.PAYMENT_RESULT_URL})
+
+    return render(request, 'payment_redirect.html', {'form': form})
+
+
 def payment_result(request):
     """
     A view for handling user rights to a bought game after redirected from
@@ -249,19 +527,71 @@ def payment_result(request):
     from hashlib import md5
     calculated_checksum = md5(checksum_string.encode("ascii")).hexdigest()
 
-    if result == 'success' and calculated_checksum == request_checksum:
-        success = True
+    if calculated_checksum != request_checksum:
+        success = False
+    elif result == 'success':
         transaction = get_object_or_404(Transaction, pk=pid)
-        transaction.payer.owned_games.add(transaction.game)
+        purchases = payments.purchases(transaction)
+        game_ids = [purchase.game_id for purchase in purchases]
+        # Repeated results of the same payment are only handled once. The
+        # payment stays pending if granting the games fails, so a repeated
+        # result can retry.
+        with atomic():
+            if payments.complete(pid, Transaction.PAID):
+                payments.grant_games(transaction.payer_id, game_ids)
+                for purchase in purchases:
+                    sales.record_sale(purchase)
+                success = True
+            else:
+                success = Transaction.objects.filter(pk=pid, status=Transaction.PAID).exists()
+        if success and request.user.pk == transaction.payer_id:
+            ownership.grant(request, game_ids)
     else:
-        Transaction.objects.get(pk=pid).delete()
+        payments.complete(pid, Transaction.FAILED)
         success = False
 
     return render(request, 'payment_result.html', {'success': success})
 
 
+@login_required
+def export_transactions(request, export_format):
+    """
+    Streams the sales history of the developer as CSV or JSON lines.
+    Accepts since and until dates and the cursor of the last row of an
+    interrupted export. Accessible only to developers.
+    """
+    if not request.roles.is_developer:
+        return HttpResponseForbidden()
+
+    try:
+        rows = exports.rows(request.user, since=request.GET.get('since'),
+                            until=request.GET.get('until'), cursor=request.GET.get('cursor'))
+    except exports.InvalidExport:
+        return HttpResponse(status=400)
+
+    content_type, render_rows = exports.FORMATS[export_format]
+    response = StreamingHttpResponse(render_rows(rows), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="transactions.{}"'.format(export_format)
+    return response
+
+
+def metrics_view(request):
+    """
+    Request metrics and statistics of all workers in the Prometheus text
+    format.
+    Accessible to staff users and to scrapers sending METRICS_TOKEN.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (request.user.is_staff or
+            (token and constant_time_compare(authorization, 'Bearer {}'.format(token)))):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(metrics.collect()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def index(request):
-    is_developer = request.user.groups.filter(name='Developer').exists()
+    is_developer = request.roles.is_developer
     if is_developer:
         return redirect(developer_dashboard)
     elif request.user.is_authenticated():
@@ -275,10 +605,18 @@ def developer_dashboard(request):
     """
     Default view for developers to manage their games.
     """
-    is_developer = request.user.groups.filter(name='Developer').exists()
+    is_developer = request.roles.is_developer
 
     if is_developer:
+        daily_sales = sales.daily(request.user)
+        best_day = max(day['revenue'] for day in daily_sales)
+        transactions = (request.user.sold_transactions.filter(status=Transaction.PAID)
+                        .select_related('game')
+                        .order_by('-created_at')[:RECENT_TRANSACTIONS])
         return render(request, 'developer_dashboard.html', {'user': request.user,
-                                                            'transactions': request.user.sold_transactions, 'games': request.user.developed_games})
+                                                            'totals': sales.totals(request.user),
+                                                            'sales_by_game': sales.by_game(request.user),
+                                                            'daily_sales': daily_sales, 'best_day': best_day or 1,
+                                                            'transactions': transactions, 'games': request.user.developed_games})
     else:
         return HttpResponseForbidden()
@@ -10,14 +10,11 @@ https://docs.djangoproject.com/en/1.9/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
-from whitenoise.django import DjangoWhiteNoise
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gameStore.settings")
 
-if "DYNO" in os.environ:
-    from dj_static import Cling
-    application = Cling(get_wsgi_application())
-else:
-    application = get_wsgi_application()
+application = get_wsgi_application()
 
-application = DjangoWhiteNoise(application)
+# The only static file layer, see gameStore.assets
+from gameStore.assets import AssetWhiteNoise
+application = AssetWhiteNoise(application)